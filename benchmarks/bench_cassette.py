@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Record the calls of mxcloudshare's env-show-all and class-list (list the
+environments, then getextended for each; list the classes) against the
+local API stand-in, then replay the cassette without a server: as fast as
+possible, and with the recorded latencies.
+
+    python benchmarks/bench_cassette.py --scale 1000     # 20k environments
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cloudshare import Client  # noqa: E402
+from cloudshare.standin import StandIn, fixed  # noqa: E402
+
+
+def show_all(client):
+    count = 0
+    for env in client.iter_items("envs/"):
+        client.get("envs/actions/getextended", {"envId": env["id"]}).content["statusText"]
+        count += 1
+    count += len(client.get("class").content)
+    return count
+
+
+def run(label, client):
+    start = time.perf_counter()
+    objects = show_all(client)
+    elapsed = time.perf_counter() - start
+    print("%-22s %7d objects  %8.2f s" % (label, objects, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=50, help="20 environments and 5 classes per unit")
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    cassette = os.path.join(tempfile.mkdtemp(), "session.jsonl")
+    with StandIn(latency=fixed(args.latency_ms / 1000.0), seed=1, scale=args.scale) as standin:
+        run("live (recording)", Client(standin.url, "API_ID", "API_KEY", coalesce=False, record=cassette))
+    print("cassette: %s, %.1f MB" % (cassette, os.path.getsize(cassette) / 1e6))
+
+    start = time.perf_counter()
+    client = Client("use.cloudshare.com", "API_ID", "API_KEY", coalesce=False, replay=cassette)
+    print("%-22s %7d entries  %8.2f s" % ("load cassette", len(client.http), time.perf_counter() - start))
+    run("replay", client)
+    run("replay, real latency", Client("use.cloudshare.com", "API_ID", "API_KEY", coalesce=False,
+                                       replay=cassette, replay_latency=1.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Encode/decode timings of the JSON codecs in cloudshare.codec on typical
+payloads: a class creation request, class details, an extended environment and
+a /class listing.
+
+    python benchmarks/bench_codec.py --rounds 2000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from cloudshare.codec import PREFERRED_CODECS, get_codec  # noqa: E402
+
+
+def load(name):
+    with open(os.path.join(ROOT, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def extended_env(vms=12):
+    # Shape of envs/actions/getextended: an environment with its machines.
+    return {
+        "id": "ENxxxxxxxxxxxxxxxx", "name": "Clase de introducción - alumno 7", "statusText": "Ready",
+        "statusCode": 3, "regionId": "RExxxxxxxx", "owner": "zoë@example.com",
+        "vms": [{"id": "VMxxxxxxxxxxx%02d" % i, "name": "Ubuntu 22.04 node %d" % i, "statusText": "Running",
+                 "progress": 100, "fqdn": "vm%d.env.cloudshare.com" % i, "externalAddress": "203.0.113.%d" % i,
+                 "internalAddresses": ["10.160.0.%d" % i], "cpuCount": 4, "diskSizeGB": 120,
+                 "memorySizeMB": 8192, "webAccessUrl": "https://use.cloudshare.com/Ent/Vm/Wacc/%d" % i}
+                for i in range(vms)],
+    }
+
+
+def bench(fn, rounds):
+    return min(timeit.repeat(fn, number=rounds, repeat=3)) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    class_details = load("getClassDetails.json")
+    payloads = [
+        ("createClassRequest", load("createClassRequest.json")),
+        ("getClassDetails", class_details),
+        ("getextended", extended_env()),
+        ("class list x200", [class_details] * 200),
+    ]
+    codecs = []
+    for name in PREFERRED_CODECS:
+        try:
+            codecs.append(get_codec(name))
+        except ImportError:
+            print("%s: not installed" % name)
+
+    print("%-20s %-22s %12s %12s" % ("payload", "codec", "encode us", "decode us"))
+    for label, obj in payloads:
+        rounds = max(1, args.rounds // (200 if isinstance(obj, list) else 1))
+        wire = json.dumps(obj).encode("utf-8")
+        # What the request path did before: dumps to str, then encode to bytes.
+        enc = bench(lambda: json.dumps(obj).encode("utf-8"), rounds)
+        dec = bench(lambda: json.loads(wire), rounds)
+        print("%-20s %-22s %12.1f %12.1f" % (label, "json.dumps+encode", enc, dec))
+        for codec in codecs:
+            enc = bench(lambda: codec.dumps(obj), rounds)
+            dec = bench(lambda: codec.loads(wire), rounds)
+            print("%-20s %-22s %12.1f %12.1f" % (label, codec.name, enc, dec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Compare one-connection-per-request (the old urllib.request.urlopen path)
+against the keep-alive ConnectionPool used by cloudshare.http.Http, against a
+local HTTPS stand-in with a throw-away self-signed certificate.
+
+    python benchmarks/bench_connection_pool.py --requests 500
+"""
+import argparse
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cloudshare.connection_pool import ConnectionPool  # noqa: E402
+from cloudshare.http import Http  # noqa: E402
+
+BODY = b'[{"id": "ENxxxxxxxxxxxx", "name": "bench env", "statusText": "Running"}]'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.handshakes += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_cert(directory):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def start_server(cert, key):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.handshakes = 0
+    server.lock = threading.Lock()
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(label, server, fn, n):
+    server.handshakes = 0
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    print("%-22s %6d req  %8.3f s  %8.1f req/s  %5d TLS handshakes" % (
+        label, n, elapsed, n / elapsed, server.handshakes))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_cert(tmp)
+        server = start_server(cert, key)
+        url = "https://localhost:%d/api/v3/envs" % server.server_address[1]
+        client_ctx = ssl.create_default_context(cafile=cert)
+
+        def urlopen_per_call():
+            with urllib.request.urlopen(urllib.request.Request(url), context=client_ctx) as f:
+                f.read()
+
+        http = Http(ConnectionPool(ssl_context=client_ctx))
+
+        def pooled():
+            http.request("GET", url, {"Accept": "application/json"}, None)
+
+        before = run("urlopen per call", server, urlopen_per_call, args.requests)
+        after = run("Http + ConnectionPool", server, pooled, args.requests)
+        print("speedup: %.2fx" % (before / after))
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of `import cloudshare` and of the mxcloudshare.py CLI, from
+`python -X importtime`: median total over several fresh interpreters, the
+heaviest top-level imports, and whether any module kept off the startup path
+(pandas, rich, dotenv, attr, asyncio, sqlite3) got imported anyway. Exits 1
+when a budget is exceeded or such a module shows up, so it can guard against
+regressions.
+
+    python benchmarks/bench_import.py --runs 7 --budget-ms 150 --cli-budget-ms 400
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Imported only by the code paths that need them.
+LAZY_MODULES = {
+    "cloudshare": ("asyncio", "sqlite3"),
+    "mxcloudshare": ("pandas", "rich", "dotenv", "attr", "asyncio", "sqlite3"),
+}
+
+
+def import_times(module):
+    """
+    {module name: (self us, cumulative us)} for one fresh `import module`.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                          cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue  # the header line
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def run(module, runs, budget_ms, top):
+    totals = []
+    modules = {}
+    for _ in range(runs):
+        modules = import_times(module)
+        totals.append(modules[module][1])
+    median = statistics.median(totals) / 1000.0
+    print("import %-14s median %7.1f ms  min %7.1f ms  (%d modules)"
+          % (module, median, min(totals) / 1000.0, len(modules)))
+    for name, (own, cumulative) in sorted(modules.items(), key=lambda m: -m[1][1])[:top]:
+        print("    %-40s %7.1f ms" % (name, cumulative / 1000.0))
+    ok = True
+    leaked = [m for m in LAZY_MODULES.get(module, ()) if m in modules]
+    if leaked:
+        print("  FAIL: imported at startup: %s" % ", ".join(leaked))
+        ok = False
+    if budget_ms is not None and median > budget_ms:
+        print("  FAIL: over the %.0f ms budget" % budget_ms)
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="budget for import cloudshare")
+    parser.add_argument("--cli-budget-ms", type=float, default=None, help="budget for import mxcloudshare")
+    args = parser.parse_args()
+
+    ok = run("cloudshare", args.runs, args.budget_ms, args.top)
+    try:
+        ok = run("mxcloudshare", args.runs, args.cli_budget_ms, args.top) and ok
+    except RuntimeError as e:
+        print("import mxcloudshare: skipped (%s)" % e)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
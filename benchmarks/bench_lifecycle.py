@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Suspending many environments against the local stand-in: env-suspend run once
+per environment (each waiting on its own poll loop, as env-suspend.sh in a
+shell loop did) against one env-suspend for all of them, which starts the
+suspends --parallel at a time and waits on them with a single poller.
+Transitions and poll intervals are scaled down so the run takes seconds.
+
+    python benchmarks/bench_lifecycle.py --scale 2 --transition-ms 500 --parallel 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import mxcloudshare  # noqa: E402
+from cloudshare import Client  # noqa: E402
+from cloudshare.polling import POLICIES, PollPolicy  # noqa: E402
+from cloudshare.standin import StandIn  # noqa: E402
+
+SUSPENDED = [{"property": "statusText", "check_fn": lambda x: x == "Suspended"}]
+RUNNING = [{"property": "statusText", "check_fn": lambda x: x == "Running"}]
+
+
+def suspend(envId):
+    return {"method": "PUT", "path": "envs/actions/suspend", "queryParams": {"envId": envId}}
+
+
+def resume(envId):
+    return {"method": "PUT", "path": "envs/actions/resume", "queryParams": {"envId": envId}}
+
+
+def one_at_a_time(env_ids):
+    for envId in env_ids:
+        mxcloudshare.cs_put("envs/actions/suspend", {"envId": envId}, decode=False)
+        mxcloudshare.env_wait_condition(envId, SUSPENDED, "suspend")
+
+
+def all_at_once(env_ids):
+    mxcloudshare.env_lifecycle("suspend", dict((envId, None) for envId in env_ids), suspend, SUSPENDED)
+
+
+def run(label, suspend_all, env_ids, requests):
+    start_requests = requests()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        suspend_all(env_ids)
+    elapsed = time.perf_counter() - start
+    print("%-24s %5d envs  %5d requests  %7.2f s" % (label, len(env_ids), requests() - start_requests, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=2, help="20 environments per unit")
+    parser.add_argument("--transition-ms", type=float, default=500.0)
+    parser.add_argument("--parallel", type=int, default=8)
+    args = parser.parse_args()
+
+    cache = tempfile.mkdtemp()
+    os.environ["XDG_CACHE_HOME"] = cache
+    transition = args.transition_ms / 1000.0
+    for operation in ("suspend", "resume"):
+        POLICIES[operation] = PollPolicy(floor=transition / 5, ceiling=transition, deadline=60 * transition)
+    try:
+        with StandIn(seed=1, scale=args.scale, transition_time=transition) as standin:
+            mxcloudshare.globalconf.update(client=Client(standin.url, "API_ID", "API_KEY"), parallel=args.parallel,
+                                           outputformat=mxcloudshare.OutFormat.ndjson_fmt, wait_deadline=None,
+                                           limit=None)
+            time.sleep(transition)
+            env_ids = [e["id"] for e in mxcloudshare.cs_iter("envs/")]
+            run("one env-suspend per env", one_at_a_time, env_ids, lambda: standin.requests)
+            with contextlib.redirect_stdout(io.StringIO()):
+                mxcloudshare.env_lifecycle("resume", dict((envId, None) for envId in env_ids), resume, RUNNING)
+            run("env-suspend --parallel %d" % args.parallel, all_at_once, env_ids, lambda: standin.requests)
+    finally:
+        shutil.rmtree(cache)
+
+
+if __name__ == "__main__":
+    main()
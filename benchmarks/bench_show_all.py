@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+env-show-all against the local stand-in: the status of every environment
+looked up with getextended one at a time (as the command did), then --parallel
+at a time, then read from the detailed (brief=false) listing.
+
+    python benchmarks/bench_show_all.py --scale 20 --latency-ms 20 --parallel 4 16
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import mxcloudshare  # noqa: E402
+from cloudshare import Client  # noqa: E402
+from cloudshare.standin import StandIn, fixed  # noqa: E402
+
+
+def one_at_a_time():
+    envs = []
+    for i, e in enumerate(mxcloudshare.cs_iter("envs/"), start=1):
+        e["status"] = mxcloudshare.cs_get("envs/actions/getextended", {"envId": e["id"]})["statusText"]
+        e["index"] = i
+        envs.append(e)
+    return envs
+
+
+def concurrent(brief):
+    listing = enumerate(mxcloudshare.cs_iter("envs/", {"brief": "true" if brief else "false"}), start=1)
+    return list(mxcloudshare.with_status(listing))
+
+
+def run(label, show_all, requests):
+    start_requests = requests()
+    start = time.perf_counter()
+    envs = show_all()
+    elapsed = time.perf_counter() - start
+    print("%-28s %5d envs  %5d requests  %7.2f s" % (label, len(envs), requests() - start_requests, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=20, help="20 environments per unit")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--parallel", type=int, nargs="+", default=[4, 16])
+    args = parser.parse_args()
+
+    with StandIn(latency=fixed(args.latency_ms / 1000.0), seed=1, scale=args.scale) as standin:
+        # Every run starts cold: no coalescing or micro cache between runs.
+        mxcloudshare.globalconf["client"] = Client(standin.url, "API_ID", "API_KEY", coalesce=False,
+                                                   micro_cache_ttl=0)
+        run("getextended, one at a time", one_at_a_time, lambda: standin.requests)
+        for parallel in args.parallel:
+            mxcloudshare.globalconf["parallel"] = parallel
+            run("getextended, --parallel %d" % parallel, lambda: concurrent(True), lambda: standin.requests)
+        run("brief=false listing", lambda: concurrent(False), lambda: standin.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Signatures per second of the request signer (cloudshare.signer.Signer) against
+the original AuthenticationParameterProvider + random.choice tokens, single
+threaded and from several threads sharing one signer.
+
+    python benchmarks/bench_signing.py --count 200000 --threads 8
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cloudshare.authentication_parameter_provider import AuthenticationParameterProvider  # noqa: E402
+from cloudshare.hmacer import HMACer  # noqa: E402
+from cloudshare.signer import Signer  # noqa: E402
+
+API_ID = "ABCDEFGHIJKLMNOP"
+API_KEY = "abcdefghijklmnopqrstuvwxyz012345"
+URL = "https://use.cloudshare.com/api/v3/envs/actions/getextended?envId=ENa1b2c3d4e5f6a7b8"
+
+
+class RandomChoiceTokenGenerator(object):
+    # The token generator as it was: ten random.choice() calls per token.
+    alphabet = string.ascii_lowercase + string.ascii_uppercase + string.digits
+
+    def generate(self):
+        return ''.join(random.choice(self.alphabet) for _ in range(10))
+
+
+def run(label, signer, count, threads):
+    per_thread = count // threads
+
+    def work():
+        for _ in range(per_thread):
+            signer.get(apiId=API_ID, apiKey=API_KEY, url=URL)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    rate = per_thread * threads / elapsed
+    print("%-40s %2d thread(s) %10.0f signatures/s" % (label, threads, rate))
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    old = AuthenticationParameterProvider(RandomChoiceTokenGenerator(), HMACer())
+    new = Signer()
+    for threads in sorted(set([1, args.threads])):
+        before = run("AuthenticationParameterProvider", old, args.count, threads)
+        after = run("Signer", new, args.count, threads)
+        print("speedup: %.2fx" % (after / before))
+
+
+if __name__ == "__main__":
+    main()
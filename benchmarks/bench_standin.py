@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail latency of cloudshare.Client against the local API
+stand-in (cloudshare.standin), with a lognormal server latency and optional
+429/5xx injection, sequentially and through Client.request_many.
+
+    python benchmarks/bench_standin.py --requests 400 --latency-ms 20 --error-rate 0.02
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cloudshare import Client, RetryPolicy  # noqa: E402
+from cloudshare.batch import run_batch  # noqa: E402
+from cloudshare.standin import StandIn, lognormal  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(label, latencies, elapsed, failures):
+    print("%-14s %6d req  %7.2f s  %8.1f req/s  p50 %6.1f ms  p95 %6.1f ms  p99 %6.1f ms  %d failed" % (
+        label, len(latencies), elapsed, len(latencies) / elapsed, percentile(latencies, 0.5) * 1000,
+        percentile(latencies, 0.95) * 1000, percentile(latencies, 0.99) * 1000, failures))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with StandIn(latency=lognormal(args.latency_ms / 1000.0, args.sigma), throttle_rate=args.throttle_rate,
+                 error_rate=args.error_rate, retry_after=0, seed=1, scale=args.scale) as standin:
+        client = Client(standin.url, "API_ID", "API_KEY", coalesce=False,
+                        retry_policy=RetryPolicy(total=3, backoff_factor=0.01))
+        envs = [e["id"] for e in client.get("envs").content]
+        paths = [("envs/actions/getextended", {"envId": envs[i % len(envs)]}) for i in range(args.requests)]
+
+        latencies, failures = [], 0
+        start = time.perf_counter()
+        for path, query in paths:
+            t = time.perf_counter()
+            failures += client.get(path, query).status // 100 != 2
+            latencies.append(time.perf_counter() - t)
+        report("sequential", latencies, time.perf_counter() - start, failures)
+
+        latencies = []
+
+        def timed(path, query):
+            t = time.perf_counter()
+            try:
+                return client.get(path, query)
+            finally:
+                latencies.append(time.perf_counter() - t)
+
+        start = time.perf_counter()
+        results = list(run_batch(timed, [{"path": p, "query": q} for p, q in paths], max_workers=args.workers))
+        report("%d workers" % args.workers, latencies, time.perf_counter() - start,
+               sum(not r.ok for r in results))
+
+
+if __name__ == "__main__":
+    main()
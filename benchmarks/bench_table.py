@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Table output of mxcloudshare.py for large listings: one rich Table built from
+every record before printing (as show_results did) against stream_table,
+which fixes the columns from a sample and prints rows in chunks through one
+Console. Output goes to an in-memory file.
+
+    python benchmarks/bench_table.py --records 20000 --width 160
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rich import box  # noqa: E402
+from rich.console import Console  # noqa: E402
+from rich.table import Table  # noqa: E402
+
+import mxcloudshare  # noqa: E402
+
+
+def records(count):
+    for i in range(count):
+        yield {
+            "id": "EN%08d" % i,
+            "name": "Environment %d" % i,
+            "ownerEmail": "owner%d@example.com" % (i % 50),
+            "regionId": "RE6KLL5BRF",
+            "projectId": "PR%04d" % (i % 20),
+            "statusText": "Ready" if i % 3 else "Suspended",
+            "policy": {"id": "PO%04d" % (i % 7), "name": "Policy %d" % (i % 7)},
+            "index": i + 1,
+        }
+
+
+def whole_table(data, console):
+    # The whole result in one Table, every cell measured before the first line is printed.
+    rows = [mxcloudshare.flatten_record(r) for r in data]
+    columns = mxcloudshare.sample_columns(rows)
+    table = Table(show_header=True, header_style="bold", box=box.SIMPLE_HEAD, row_styles=["none", "dim"])
+    for column in columns:
+        table.add_column(column)
+    for r in rows:
+        table.add_row(*[mxcloudshare.cell_text(r.get(c)) for c in columns])
+    console.print(table)
+
+
+def streamed(data, console):
+    mxcloudshare.globalconf["console"] = console
+    mxcloudshare.stream_table(data)
+
+
+def run(label, render, count, width):
+    out = io.StringIO()
+    console = Console(file=out, width=width)
+    start = time.perf_counter()
+    render(records(count), console)
+    elapsed = time.perf_counter() - start
+    print("%-14s %7d rows  %8.2f s  %9.0f rows/s" % (label, count, elapsed, count / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--width", type=int, default=160)
+    args = parser.parse_args()
+
+    run("whole table", whole_table, args.records, args.width)
+    run("stream_table", streamed, args.records, args.width)
+
+
+if __name__ == "__main__":
+    main()
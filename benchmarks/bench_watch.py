@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Watching every environment against the local stand-in, on a simulated clock:
+env-show-all run in a `watch -n EVERY` loop (one listing plus a getextended per
+environment, all at once) against EnvWatcher, which spreads one poll per
+environment and interval over a time wheel. Reports the requests sent and the
+busiest second of each.
+
+    python benchmarks/bench_watch.py --scale 20 --every 10 --minutes 5
+"""
+import argparse
+import collections
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cloudshare import Client  # noqa: E402
+from cloudshare.standin import StandIn  # noqa: E402
+from cloudshare.watch import EnvWatcher  # noqa: E402
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def watch_loop(client, clock, every, seconds, per_second, requests):
+    while clock.now < seconds:
+        before = requests()
+        envs = list(client.iter_items("envs/"))
+        for env in envs:
+            client.get("envs/actions/getextended", {"envId": env["id"]})
+        per_second[int(clock.now)] += requests() - before
+        clock.sleep(every)
+
+
+def watcher(client, clock, every, seconds, per_second, requests):
+    with EnvWatcher(client, steady_interval=every, clock=clock, sleep=clock.sleep) as watcher:
+        watcher.refresh()
+        while clock.now < seconds:
+            before = requests()
+            watcher.step()
+            per_second[int(clock.now)] += requests() - before
+            clock.sleep(watcher.wheel.next_tick())
+
+
+def run(label, watch, standin, every, seconds):
+    client = Client(standin.url, "API_ID", "API_KEY", coalesce=False, micro_cache_ttl=0)
+    clock = Clock()
+    per_second = collections.Counter()
+    start = standin.requests
+    watch(client, clock, every, seconds, per_second, lambda: standin.requests)
+    print("%-22s %7d requests  %6.1f/s on average  %5d in the busiest second" % (
+        label, standin.requests - start, (standin.requests - start) / seconds, max(per_second.values())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=20, help="20 environments per unit")
+    parser.add_argument("--every", type=float, default=10.0, help="seconds between two looks at an environment")
+    parser.add_argument("--minutes", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with StandIn(seed=1, scale=args.scale) as standin:
+        seconds = args.minutes * 60
+        run("watch env-show-all", watch_loop, standin, args.every, seconds)
+        run("EnvWatcher", watcher, standin, args.every, seconds)
+
+
+if __name__ == "__main__":
+    main()
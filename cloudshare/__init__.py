@@ -11,18 +11,62 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from .batch import BatchResult
+from .cassette import CassetteMiss, RecordingHttp, ReplayHttp
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .client import Client
+from .events import LoggingListener, RequestEvent
+from .http_cache import HttpCache
+from .rate_limiter import FileTokenBucket, SqliteTokenBucket, TokenBucket, rate_limiter
+from .requester import DeadlineExceeded, ResponseError
+from .retry import RetryPolicy
 
 
-def req(hostname, method, apiId, apiKey, path="", queryParams=None, content=None):
+def req(hostname, method, apiId, apiKey, path="", queryParams=None, content=None, idempotent=None):
     return _get_requester().cs_request(hostname=hostname,
                                        method=method,
                                        apiId=apiId,
                                        apiKey=apiKey,
                                        path=path,
                                        queryParams=queryParams,
-                                       content=content)
+                                       content=content,
+                                       idempotent=idempotent)
+
+
+async def areq(hostname, method, apiId, apiKey, path="", queryParams=None, content=None, idempotent=None):
+    return await _get_async_client().cs_request(hostname=hostname,
+                                                method=method,
+                                                apiId=apiId,
+                                                apiKey=apiKey,
+                                                path=path,
+                                                queryParams=queryParams,
+                                                content=content,
+                                                idempotent=idempotent)
+
+
+def req_many(specs, max_workers=8, rate=None, ordered=True):
+    """
+    req() for many calls at once: each spec is a dict of req() arguments. Yields
+    a BatchResult per spec, in order or, with ordered=False, as they complete;
+    failed calls carry their exception in .error instead of raising.
+    """
+    from .batch import run_batch
+    return run_batch(_get_requester().cs_request, specs, max_workers=max_workers, rate=rate, ordered=ordered)
+
+
+def __getattr__(name):
+    # AsyncClient, and asyncio with it, is only imported when used.
+    if name == "AsyncClient":
+        from .async_client import AsyncClient
+        return AsyncClient
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 def _get_requester():
-    from .ioc import get_requester
-    return get_requester()
+    from .ioc import get_default_client
+    return get_default_client().requester
+
+
+def _get_async_client():
+    from .ioc import get_default_async_client
+    return get_default_async_client()
@@ -0,0 +1,120 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import weakref
+
+from . import ioc
+from .client import DEFAULT_HOSTNAME, DEFAULT_TIMEOUT
+
+
+class AsyncClient(object):
+    """
+    asyncio counterpart of Client. At most max_concurrency requests are in
+    flight at once; the rest wait for a slot, so callers can gather thousands
+    of calls from one event loop.
+
+    timeout and deadline work as for Client: a connect, write or read
+    outlasting timeout raises asyncio.TimeoutError (retried as the policy
+    allows), a call outlasting deadline raises cloudshare.DeadlineExceeded.
+    """
+
+    def __init__(self, hostname=None, api_id=None, api_key=None, max_concurrency=20,
+                 pool_size=None, idle_timeout=60.0, ssl_context=None, http=None, retry_policy=None,
+                 rate_limiter=None, codec=None, timeout=DEFAULT_TIMEOUT, deadline=None):
+        self.hostname = hostname or DEFAULT_HOSTNAME
+        self.api_id = api_id
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter
+        self.http = http if http is not None else ioc.get_async_http(
+            maxsize=pool_size or max_concurrency, idle_timeout=idle_timeout, ssl_context=ssl_context,
+            rate_limiter=rate_limiter)
+        self.pool = self.http.pool
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retry_policy = retry_policy if retry_policy is not None else ioc.get_retry_policy()
+        self.requester = ioc.get_async_requester(http=self.http, retryPolicy=self.retry_policy, codec=codec)
+        # One per event loop, made inside it: before Python 3.10 a Semaphore binds to the loop current when built.
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def request(self, method, path="", queryParams=None, content=None, idempotent=None, timeout=None,
+                      deadline=None, headers=None):
+        """
+        idempotent=True lets the retry policy repeat a POST that is safe to send twice.
+        headers are added to the signed ones, e.g. If-None-Match for a conditional GET.
+        """
+        return await self.cs_request(hostname=self.hostname,
+                                     method=method,
+                                     apiId=self.api_id,
+                                     apiKey=self.api_key,
+                                     path=path,
+                                     queryParams=queryParams,
+                                     content=content,
+                                     idempotent=idempotent,
+                                     timeout=timeout,
+                                     deadline=deadline,
+                                     headers=headers)
+
+    async def cs_request(self, hostname, method, apiId, apiKey, path="", queryParams=None, content=None, idempotent=None,
+                         timeout=None, deadline=None, headers=None):
+        async with self._semaphore():
+            return await self.requester.cs_request(hostname=hostname,
+                                                   method=method,
+                                                   apiId=apiId,
+                                                   apiKey=apiKey,
+                                                   path=path,
+                                                   queryParams=queryParams,
+                                                   content=content,
+                                                   idempotent=idempotent,
+                                                   timeout=timeout if timeout is not None else self.timeout,
+                                                   deadline=deadline if deadline is not None else self.deadline,
+                                                   headers=headers)
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def get(self, path, queryParams=None):
+        return await self.request('GET', path, queryParams=queryParams)
+
+    async def post(self, path, content=None, queryParams=None, idempotent=None):
+        return await self.request('POST', path, queryParams=queryParams, content=content, idempotent=idempotent)
+
+    async def put(self, path, queryParams=None, content=None):
+        return await self.request('PUT', path, queryParams=queryParams, content=content)
+
+    async def delete(self, path, queryParams=None):
+        return await self.request('DELETE', path, queryParams=queryParams)
+
+    def add_listener(self, listener):
+        """
+        listener(event) is called with a cloudshare.events.RequestEvent, carrying
+        the phase timings, status and byte counts, after every request attempt.
+        """
+        self.requester.listeners.add(listener)
+
+    def remove_listener(self, listener):
+        self.requester.listeners.remove(listener)
+
+    async def close(self):
+        self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,267 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import ssl
+import time
+import urllib.parse
+
+from .connection_pool import DEFAULT_PORTS
+from .http import ACCEPT_ENCODING, READ_CHUNK_SIZE, ContentDecoder, Http, Response
+
+_STALE_CONNECTION_ERRORS = (asyncio.IncompleteReadError, BrokenPipeError,
+                            ConnectionResetError, ConnectionAbortedError)
+
+
+class AsyncConnection(object):
+
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.loop = asyncio.get_running_loop()
+
+    def is_stale(self):
+        # A connection opened under an earlier asyncio.run() cannot be used from this loop.
+        return self.loop is not asyncio.get_running_loop() or self.reader.at_eof() or self.writer.is_closing()
+
+    def close(self):
+        try:
+            self.writer.close()
+        except RuntimeError:
+            # Its event loop is closed already, and the socket went with it.
+            pass
+
+
+class _TimedReader(object):
+    """
+    A StreamReader whose reads each give up after timeout seconds with
+    asyncio.TimeoutError, as a socket timeout bounds each recv of Http.
+    """
+
+    def __init__(self, reader, timeout):
+        self.reader = reader
+        self.timeout = timeout
+
+    def readline(self):
+        return asyncio.wait_for(self.reader.readline(), self.timeout)
+
+    def readexactly(self, n):
+        return asyncio.wait_for(self.reader.readexactly(n), self.timeout)
+
+    def read(self, n=-1):
+        return asyncio.wait_for(self.reader.read(n), self.timeout)
+
+
+class AsyncConnectionPool(object):
+    """
+    asyncio counterpart of ConnectionPool. Connections are bound to the event
+    loop they were opened on: under another loop they count as stale and a
+    new one is opened. timeout (seconds)
+    bounds connecting, and each read and write of AsyncHttp unless a request
+    sets its own.
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=60.0, ssl_context=None, timeout=None):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+
+    async def get(self, scheme, host, port=None, timings=None, timeout=None):
+        key = self._key(scheme, host, port)
+        now = time.monotonic()
+        idle = self._idle.get(key)
+        while idle:
+            conn, last_used = idle.pop()
+            if now - last_used > self.idle_timeout or conn.is_stale():
+                conn.close()
+                continue
+            self.reused += 1
+            return conn, True
+        return await self.new_connection(scheme, host, port, timings, timeout), False
+
+    def put(self, conn):
+        idle = self._idle.setdefault(conn.key, [])
+        if len(idle) >= self.maxsize:
+            conn.close()
+            return
+        idle.append((conn, time.monotonic()))
+
+    async def new_connection(self, scheme, host, port=None, timings=None, timeout=None):
+        key = self._key(scheme, host, port)
+        context = None
+        if key[0] == "https":
+            context = self.ssl_context or ssl.create_default_context()
+        start = time.perf_counter()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(key[1], key[2], ssl=context),
+                                                timeout if timeout is not None else self.timeout)
+        if timings is not None:
+            # asyncio resolves, connects and handshakes in one call: "connect" covers all three.
+            timings['connect'] = time.perf_counter() - start
+        self.created += 1
+        return AsyncConnection(key, reader, writer)
+
+    def idle_count(self):
+        return sum(len(idle) for idle in self._idle.values())
+
+    def close(self):
+        for idle in self._idle.values():
+            for conn, _ in idle:
+                conn.close()
+        self._idle.clear()
+
+    def _key(self, scheme, host, port):
+        scheme = scheme.lower()
+        return scheme, host, port or DEFAULT_PORTS[scheme]
+
+
+class AsyncHttp(Http):
+    """
+    Minimal HTTP/1.1 client over asyncio streams with the same request()
+    contract as Http, as a coroutine. A connect, write or read that outlasts
+    the timeout raises asyncio.TimeoutError.
+    """
+
+    def __init__(self, pool=None, rate_limiter=None):
+        self.pool = pool if pool is not None else AsyncConnectionPool()
+        self.rate_limiter = rate_limiter
+
+    async def request(self, method, url, headers, content, timings=None, timeout=None):
+        """
+        timeout (seconds) bounds every socket operation of this request, instead
+        of the pool's timeout.
+        """
+        if timeout is None:
+            timeout = getattr(self.pool, 'timeout', None)
+        parts = urllib.parse.urlsplit(url)
+        body = self._body(content)
+        headers = self._add_content_length_header_if_needed(method, headers, body)
+        headers.setdefault('Accept-Encoding', ACCEPT_ENCODING)
+        head = self._build_head(method, self._request_target(parts), parts, headers, body)
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        conn, reused = await self.pool.get(parts.scheme, parts.hostname, parts.port, timings, timeout)
+        try:
+            status, res_headers, data, will_close, decoder = await self._exchange(conn, head, body, timings, timeout)
+        except _STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            conn = await self.pool.new_connection(parts.scheme, parts.hostname, parts.port, timings, timeout)
+            status, res_headers, data, will_close, decoder = await self._exchange(conn, head, body, timings,
+                                                                                  timeout)
+        if will_close:
+            conn.close()
+        else:
+            self.pool.put(conn)
+        return Response(status=status,
+                        content=data,
+                        headers=res_headers,
+                        wire_bytes=decoder.wire_bytes,
+                        decoded_bytes=decoder.decoded_bytes)
+
+    async def _exchange(self, conn, head, body, timings=None, timeout=None):
+        try:
+            start = time.perf_counter()
+            conn.writer.write(head)
+            if body:
+                conn.writer.write(body)
+            await asyncio.wait_for(conn.writer.drain(), timeout)
+            if timings is not None:
+                timings['send'] = time.perf_counter() - start
+            reader = conn.reader if timeout is None else _TimedReader(conn.reader, timeout)
+            return await self._read_response(reader, timings)
+        except BaseException:
+            conn.close()
+            raise
+
+    def _build_head(self, method, target, parts, headers, body):
+        lines = ["%s %s HTTP/1.1" % (method, target), "Host: %s" % parts.netloc]
+        names = set(k.lower() for k in headers)
+        if body is not None and 'content-length' not in names:
+            lines.append("Content-Length: %d" % len(body))
+        lines.extend("%s: %s" % (k, v) for k, v in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+    async def _read_response(self, reader, timings=None):
+        start = time.perf_counter()
+        while True:
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("connection closed before a response was received")
+            version, status = status_line.split(None, 2)[:2]
+            status = int(status)
+            headers = await self._read_headers(reader)
+            # interim 1xx responses carry no body, the real one follows
+            if status >= 200 or status == 101:
+                break
+        headers_read = time.perf_counter()
+        will_close = (version == b"HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive") \
+            or headers.get("connection", "").lower() == "close"
+        decoder = ContentDecoder(headers.get("content-encoding"))
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = self._read_chunked(reader)
+        elif "content-length" in headers:
+            chunks = self._read_exactly(reader, int(headers["content-length"]))
+        elif status in (204, 304) or status < 200:
+            chunks = self._read_exactly(reader, 0)
+        else:
+            chunks = self._read_to_eof(reader)
+            will_close = True
+        parts = []
+        async for chunk in chunks:
+            data = decoder.decompress(chunk)
+            if data:
+                parts.append(data)
+        parts.append(decoder.flush())
+        if timings is not None:
+            timings['ttfb'] = headers_read - start
+            timings['download'] = time.perf_counter() - headers_read
+        return status, headers, b"".join(parts), will_close, decoder
+
+    async def _read_headers(self, reader):
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def _read_chunked(self, reader):
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                await self._read_headers(reader)
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+
+    async def _read_exactly(self, reader, length):
+        while length > 0:
+            chunk = await reader.readexactly(min(length, READ_CHUNK_SIZE))
+            length -= len(chunk)
+            yield chunk
+
+    async def _read_to_eof(self, reader):
+        while True:
+            chunk = await reader.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
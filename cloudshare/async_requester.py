@@ -0,0 +1,61 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+
+from .events import RequestEvent
+from .requester import Requester
+
+ASYNC_RETRYABLE_ERRORS = (OSError, EOFError, asyncio.TimeoutError)
+
+
+class AsyncRequester(Requester):
+    """
+    Coroutine version of Requester.cs_request. URL building, signing, retry
+    decisions (Requester._retry_after_error/_retry_after_response) and
+    response parsing are inherited; only the transport and the backoff sleep
+    are awaited.
+    """
+
+    def __init__(self, http, authenticationParameterProvider, retryPolicy=None, sleep=asyncio.sleep, codec=None):
+        super(AsyncRequester, self).__init__(http, authenticationParameterProvider, retryPolicy, sleep, codec)
+
+    async def cs_request(self, hostname, method, apiId, apiKey, path="", queryParams=None, content=None, idempotent=None,
+                         timeout=None, deadline=None, headers=None):
+        """
+        timeout and deadline as for Requester.cs_request.
+        """
+        url = self._build_url(hostname, path, queryParams)
+        json_content = self._encode_content(content)
+        retries = 0
+        expires = self.clock() + deadline if deadline is not None else None
+        while True:
+            attempt_headers = self._build_headers(apiId, apiKey, url, headers)
+            event = RequestEvent(method, url, retries) if self.listeners else None
+            kwargs = {}
+            attempt_timeout = self._attempt_timeout(timeout, expires, method, url)
+            if attempt_timeout is not None:
+                kwargs['timeout'] = attempt_timeout
+            if event is not None:
+                event.request_bytes = len(json_content) if json_content else 0
+                kwargs['timings'] = event.timings
+            try:
+                res = await self.http.request(method, url, attempt_headers, json_content, **kwargs)
+            except ASYNC_RETRYABLE_ERRORS as e:
+                delay = self._retry_after_error(method, idempotent, url, retries, e, event, expires, deadline)
+            else:
+                delay = self._retry_after_response(method, idempotent, url, retries, res, event, expires)
+                if delay is None:
+                    return self._final_response(res, retries, event)
+            retries += 1
+            await self.sleep(delay)
@@ -0,0 +1,248 @@
+#!/usr/bin/python
+import os
+import re
+import copy
+from .async_client import AsyncClient
+from .requester import ResponseError
+
+
+def async_memoize(f):
+    memo = {}
+
+    async def helper(*args):
+        if args not in memo:
+            memo[args] = await f(*args)
+        return memo[args]
+
+    return helper
+
+
+class AsyncWrapper(object):
+    '''
+        asyncio version of wrapper_cls.Wrapper, every operation is a coroutine:
+
+            wrapper = AsyncWrapper(None, None, None)
+            envs = await asyncio.gather(*[wrapper.env_get_extended(e) for e in env_ids])
+    '''
+    def __init__(self, hostname, api_id, api_key, client=None, max_concurrency=20):
+        self.hostname = hostname or os.environ.get('CLOUDSHARE_HOSTNAME', "use.cloudshare.com")
+        self.api_id = api_id or os.environ.get('CLOUDSHARE_API_ID')
+        self.api_key = api_key or os.environ.get('CLOUDSHARE_API_KEY')
+        self.client = client or AsyncClient(self.hostname, self.api_id, self.api_key,
+                                            max_concurrency=max_concurrency)
+
+    @async_memoize
+    async def get_obj_id(self, url, obj_name):
+        for obj in await self.get(url):
+            if obj['name'] == obj_name:
+                return obj['id']
+        else:
+            raise Exception('{} not found in {}'.format(obj_name, url))
+
+    async def get_obj_ids_by_pat(self, url, obj_name_pat):
+        res = []
+
+        for obj in await self.get(url):
+            if re.search(obj_name_pat, obj['name']):
+                res.append(obj['id'])
+
+        return res
+
+    async def get_env_ids_by_pat(self, name_pat):
+        return await self.get_obj_ids_by_pat('/envs/?criteria=0', name_pat)
+
+    async def get_proj_id(self, name):
+        return await self.get_obj_id('/projects/', name)
+
+    async def get_bp_id(self, proj_id, name):
+        return await self.get_obj_id('/projects/{}/blueprints'.format(proj_id), name)
+
+    async def get_snapshot_id(self, project_name, bp_name, snapshot_name):
+        snap = await self.get_bp_snapshot(project_name, bp_name, snapshot_name)
+        return snap['id']
+
+    async def get_policy_id(self, proj_id, name):
+        return await self.get_obj_id('/projects/{}/policies'.format(proj_id), name)
+
+    async def get_region_id(self, name):
+        return await self.get_obj_id('/regions/', name)
+
+    async def get_template_id(self, name, region_id):
+        return await self.get_obj_id('/templates?templateType=1&regionId={}'.format(region_id), name)
+
+    async def create_env_from_bp_using_names(self, dct):
+        '''
+            same dct as Wrapper.create_env_from_bp_using_names
+        '''
+        new_dct = copy.deepcopy(dct)
+
+        new_dct['environment']['projectId'] = await self.get_proj_id(new_dct['environment']['projectId'])
+        new_dct['environment']['policyId'] = await self.get_policy_id(new_dct['environment']['projectId'],
+                                                                      dct['environment']['policyId'])
+        new_dct['environment']['regionId'] = await self.get_region_id(new_dct['environment']['regionId'])
+
+        new_dct['itemsCart'][0]['blueprintId'] = await self.get_bp_id(new_dct['environment']['projectId'],
+                                                                      new_dct['itemsCart'][0]['blueprintId'])
+
+        if dct['itemsCart'][0].get('snapshotId'):
+            new_dct['itemsCart'][0]['snapshotId'] = await self.get_snapshot_id(
+                dct['environment']['projectId'],
+                dct['itemsCart'][0]['blueprintId'],
+                dct['itemsCart'][0]['snapshotId'])
+
+        return await self.post('/envs', new_dct)
+
+    async def create_env_from_tempalte_cart_using_names(self, dct):
+        '''
+            same dct as Wrapper.create_env_from_tempalte_cart_using_names
+        '''
+        dct['environment']['projectId'] = await self.get_proj_id(dct['environment']['projectId'])
+        dct['environment']['policyId'] = await self.get_policy_id(dct['environment']['projectId'],
+                                                                  dct['environment']['policyId'])
+        dct['environment']['regionId'] = await self.get_region_id(dct['environment']['regionId'])
+
+        for item in dct['itemsCart']:
+            item['name'] = item['templateVmId']
+            item['description'] = item['templateVmId']
+            item['templateVmId'] = await self.get_template_id(item['templateVmId'],
+                                                              dct['environment']['regionId'])
+
+        return await self.post('/envs', dct)
+
+    def with_env_prefix(self, env_token):
+        if not env_token.startswith('EN'):
+            return 'EN' + env_token
+        else:
+            return env_token
+
+    async def suspend(self, env_token):
+        return await self.put('/envs/actions/suspend?envId={}&immediate=true'.format(self.with_env_prefix(env_token)))
+
+    async def resume(self, env_token):
+        return await self.put('/envs/actions/resume?envId={}'.format(self.with_env_prefix(env_token)))
+
+    async def revert(self, env_token):
+        return await self.put('/envs/actions/revert?envId={}'.format(self.with_env_prefix(env_token)))
+
+    async def env_get_extended(self, env_token):
+        return await self.get('/envs/actions/getextended?envId={}'.format(self.with_env_prefix(env_token)))
+
+    async def env_get_short(self, env_token):
+        return await self.get('/envs/{}'.format(self.with_env_prefix(env_token)))
+
+    async def get_envs(self):
+        return await self.get('envs/?brief=false')
+
+    async def del_env(self, env_token):
+        return await self.request('DELETE', '/envs/{}'.format(self.with_env_prefix(env_token)))
+
+    async def get_project_bps(self, project_name):
+        return await self.get('/Projects/{project_id}/blueprints'.format(
+            project_id=await self.get_proj_id(project_name)
+        ))
+
+    async def remove_bp_from_project(self, project_name, bp_name):
+        if bp_name.startswith('BP') and bp_name.find(' ') == -1:
+            bp_id = bp_name
+        else:
+            bp_id = await self.get_bp_id(await self.get_proj_id(project_name), bp_name)
+
+        return await self.put('/Projects/{project_id}/blueprints/{bp_id}/removeFromProject'.format(
+            project_id=await self.get_proj_id(project_name),
+            bp_id=bp_id
+        ))
+
+    async def add_bp_to_project(self, dest_project_name, bp_id):
+        return await self.post('/Projects/{dest_project_id}/blueprints/{bp_id}/Post'.format(
+            dest_project_id=await self.get_proj_id(dest_project_name),
+            bp_id=bp_id
+        ))
+
+    async def execute_path(self, vm_id, command):
+        content = {
+            "vmId": vm_id,
+            "path": command
+        }
+        return await self.post('/vms/actions/executepath', content)
+
+    async def check_execution_status(self, vm_id, execution_id):
+        return await self.get('/vms/actions/checkexecutionstatus?vmId={}&executionId={}'.format(vm_id, execution_id))
+
+    async def take_snapshot(self, env_id, new_snapshot_name, set_as_default, new_bp_name=None):
+        content = {
+            "envId": env_id,
+            "name": new_snapshot_name,
+            "description": "This Snapshot's description",
+            "newBlueprintName": new_bp_name,
+            "otherBlueprintId": None,
+            "setAsDefault": set_as_default
+        }
+
+        return await self.post('/snapshots/actions/takesnapshot', content)
+
+    async def get_bp(self, project_name, bp_name):
+        project_id = await self.get_proj_id(project_name)
+        bp_id = await self.get_bp_id(project_id, bp_name)
+        return await self.get('/projects/{project_id}/blueprints/{bp_id}'.format(project_id=project_id, bp_id=bp_id))
+
+    async def get_bp_by_id(self, bp_id):
+        return await self.get('/blueprints/{bp_id}'.format(bp_id=bp_id))
+
+    async def get_bp_snapshots(self, project_name, bp_name):
+        bp = await self.get_bp(project_name, bp_name)
+        return bp['createFromVersions']
+
+    async def get_bp_snapshot(self, project_name, bp_name, snapshot_name):
+        bp = await self.get_bp(project_name, bp_name)
+        matches = list(filter(lambda x: x['name'] == snapshot_name, bp['createFromVersions']))
+        if len(matches) == 0:
+            raise Exception('snapshot not found {} {} {}'.format(project_name, bp_name, snapshot_name))
+        else:
+            return matches[0]
+
+    async def change_bp_ownership(self, proj_name, bp_name, node_id):
+        proj_id = await self.get_proj_id(proj_name)
+        bp_id = await self.get_bp_id(proj_id, bp_name)
+        return await self.put('/backendadmin/Actions/changeBlueprintOwner?blueprintId={bp_id}&nodeId={node_id}'.format(
+            bp_id=bp_id,
+            node_id=node_id
+        ))
+
+    async def get_external_id(self, internal_id, entity_type='EN'):
+        return await self.get('/admin/Actions/TranslateInternalIdToExternalId?internalId={}&entityType={}'.format(
+            internal_id, entity_type))
+
+    async def get_internal_id(self, external_id):
+        return await self.get('/admin/Actions/TranslateExternalIdToInternalId?externalId={}'.format(
+            external_id))
+
+    async def validate_vix(self, machine_token):
+        return await self.post('/vms/actions/validateVix?vmId={}'.format(machine_token))
+
+    async def get_vm_list(self, env_token):
+        return await self.get('/viewer/actions/vmList?envId={}'.format(env_token))
+
+    async def delete_bp(self, proj_name, bp_name):
+        proj_id = await self.get_proj_id(proj_name)
+        bp_id = await self.get_bp_id(proj_id, bp_name)
+        return await self.delete('/blueprints/actions/Delete?blueprintId={}'.format(bp_id))
+
+    async def post(self, path, content=None):
+        return await self.request('POST', path, content=content)
+
+    async def get(self, path, queryParams=None):
+        return await self.request('GET', path, queryParams=queryParams)
+
+    async def put(self, path, queryParams=None):
+        return await self.request('PUT', path)
+
+    async def delete(self, path, queryParams=None):
+        return await self.request('DELETE', path)
+
+    async def request(self, method, path, queryParams=None, content=None):
+        res = await self.client.request(method, path, queryParams=queryParams, content=content)
+
+        if res.status // 100 != 2:
+            raise ResponseError(res.status, res.content)
+
+        return res.content
@@ -0,0 +1,110 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import collections
+import concurrent.futures
+
+from .rate_limiter import TokenBucket
+
+
+class BatchResult(object):
+    """
+    Outcome of one request of a batch: index is the position of its spec in
+    the input. Either response (any status) or error (the exception raised)
+    is set.
+    """
+
+    __slots__ = ("index", "spec", "response", "error")
+
+    def __init__(self, index, spec, response=None, error=None):
+        self.index = index
+        self.spec = spec
+        self.response = response
+        self.error = error
+
+    @property
+    def status(self):
+        return self.response.status if self.response is not None else None
+
+    @property
+    def content(self):
+        return self.response.content if self.response is not None else None
+
+    @property
+    def ok(self):
+        return self.error is None and self.response.status // 100 == 2
+
+    def __repr__(self):
+        return "<BatchResult #%d %s>" % (self.index, self.status if self.error is None else repr(self.error))
+
+
+def run_batch(send, specs, max_workers=8, rate=None, burst=None, ordered=True, executor=None):
+    """
+    Calls send(**spec) for every spec on up to max_workers threads and yields
+    a BatchResult per spec, in input order or, with ordered=False, as they
+    complete. Failures are reported in the results, never raised. Specs are
+    read lazily and at most a few per worker are queued at any time; rate
+    caps the batch at that many requests per second. Closing the generator
+    early cancels the requests not started yet. executor, when given, runs
+    the calls instead of threads started for this batch, and is left running.
+    """
+    limiter = TokenBucket(rate, burst) if rate else None
+    window = max_workers * 4
+    specs = enumerate(specs)
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="cloudshare-batch")
+
+    def submit():
+        for index, spec in specs:
+            return executor.submit(_call, send, index, spec, limiter)
+        return None
+
+    pending = collections.deque() if ordered else set()
+    try:
+        if ordered:
+            while True:
+                while len(pending) < window:
+                    future = submit()
+                    if future is None:
+                        break
+                    pending.append(future)
+                if not pending:
+                    return
+                yield pending.popleft().result()
+        else:
+            while True:
+                while len(pending) < window:
+                    future = submit()
+                    if future is None:
+                        break
+                    pending.add(future)
+                if not pending:
+                    return
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def _call(send, index, spec, limiter):
+    if limiter is not None:
+        limiter.acquire()
+    try:
+        return BatchResult(index, spec, response=send(**spec))
+    except Exception as e:
+        return BatchResult(index, spec, error=e)
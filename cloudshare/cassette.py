@@ -0,0 +1,212 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import base64
+import json
+import threading
+import time
+import urllib.parse
+
+from .http import Response
+
+REDACTED = "<redacted>"
+
+# Request headers never written to a cassette.
+_SECRET_HEADERS = frozenset(["authorization", "cookie"])
+
+
+class CassetteMiss(LookupError):
+    """
+    Raised by ReplayHttp for a request the cassette has no response for.
+    """
+
+
+class RecordingHttp(object):
+    """
+    Transport wrapper appending every request and its response to a JSON
+    Lines cassette at path, with the Authorization header redacted. Streamed
+    responses are read in full to be recorded, then replayed to the caller.
+    """
+
+    def __init__(self, http, path, clock=time.perf_counter):
+        self.http = http
+        self.path = path
+        self.clock = clock
+        self.pool = getattr(http, 'pool', None)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers, content, **kwargs):
+        start = self.clock()
+        res = self.http.request(method, url, headers, content, **kwargs)
+        self._write(method, url, headers, content, res.status, res.headers, res.body,
+                    getattr(res, 'wire_bytes', None), self.clock() - start)
+        return res
+
+    def stream(self, method, url, headers, content, **kwargs):
+        start = self.clock()
+        with self.http.stream(method, url, headers, content, **kwargs) as res:
+            body = res.read()
+        self._write(method, url, headers, content, res.status, res.headers, body, res.wire_bytes, self.clock() - start)
+        return CassetteStream(res.status, res.headers, body, res.wire_bytes)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _write(self, method, url, headers, content, status, response_headers, body, wire_bytes, elapsed):
+        entry = {
+            "method": method,
+            "url": url,
+            "request": {
+                "headers": dict((k, REDACTED if k.lower() in _SECRET_HEADERS else v) for k, v in headers.items()),
+                "body": _text(content),
+            },
+            "response": {
+                "status": status,
+                "headers": response_headers or {},
+                "body": _text(body),
+                "wire_bytes": wire_bytes,
+            },
+            "elapsed": round(elapsed, 6),
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+class ReplayHttp(object):
+    """
+    Transport serving the responses of a cassette written by RecordingHttp,
+    without network access. Requests are matched on method, path, query
+    parameters (in any order) and JSON body (keys in any order), whatever the
+    host. A request recorded several times gets its responses in recorded
+    order, starting over after the last one. latency replays the recorded
+    durations scaled by that factor (1.0: as recorded; 0: none).
+    """
+
+    def __init__(self, path, latency=0.0, sleep=time.sleep):
+        self.path = path
+        self.latency = latency
+        self.sleep = sleep
+        self.pool = None
+        self.replayed = 0
+        self._index = {}
+        self._next = {}
+        self._lock = threading.Lock()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._add(json.loads(line))
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._index.values())
+
+    def request(self, method, url, headers, content, **kwargs):
+        status, response_headers, body, wire_bytes = self._replay(method, url, content)
+        return Response(status, body, dict(response_headers), wire_bytes=wire_bytes, decoded_bytes=len(body))
+
+    def stream(self, method, url, headers, content, **kwargs):
+        return CassetteStream(*self._replay(method, url, content))
+
+    def _add(self, entry):
+        res = entry["response"]
+        body = _bytes(res["body"])
+        key = request_key(entry["method"], entry["url"], _bytes(entry["request"]["body"]))
+        self._index.setdefault(key, []).append(
+            (res["status"], res["headers"], body, res.get("wire_bytes"), entry.get("elapsed", 0.0)))
+
+    def _replay(self, method, url, content):
+        key = request_key(method, url, content)
+        with self._lock:
+            entries = self._index.get(key)
+            if not entries:
+                raise CassetteMiss("%s %s is not in %s" % (method, url, self.path))
+            position = self._next.get(key, 0)
+            self._next[key] = (position + 1) % len(entries)
+            self.replayed += 1
+        status, headers, body, wire_bytes, elapsed = entries[position]
+        if self.latency and elapsed:
+            self.sleep(elapsed * self.latency)
+        return status, headers, body, wire_bytes
+
+
+class CassetteStream(object):
+    """
+    Streamed response over a body already in memory, for recorded and replayed streams.
+    """
+
+    def __init__(self, status, headers, body, wire_bytes=None):
+        self.status = status
+        self.headers = dict(headers)
+        self.wire_bytes = wire_bytes
+        self.decoded_bytes = len(body)
+        self._body = body
+
+    def iter_content(self, chunk_size=64 * 1024):
+        for i in range(0, len(self._body), chunk_size):
+            yield self._body[i:i + chunk_size]
+
+    def read(self):
+        return self._body
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def request_key(method, url, content):
+    """
+    What a recorded request is matched on: method, path, sorted query
+    parameters and the body, canonicalized when it is JSON.
+    """
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, True)))
+    return method.upper(), parts.path.rstrip("/"), query, _canonical_body(content)
+
+
+def _canonical_body(content):
+    if not content:
+        return None
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    try:
+        return json.dumps(json.loads(content), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return content
+
+
+def _text(data):
+    # Bodies are kept readable in the cassette; non UTF-8 ones are base64 encoded.
+    if data is None:
+        return None
+    if isinstance(data, str):
+        return data
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(data).decode("ascii")}
+
+
+def _bytes(text):
+    if text is None:
+        return b""
+    if isinstance(text, dict):
+        return base64.b64decode(text["base64"])
+    return text.encode("utf-8")
@@ -0,0 +1,175 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import collections
+import threading
+import time
+
+from .events import path_template
+from .requester import RETRYABLE_ERRORS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request to an endpoint whose circuit is open.
+    Not retried: retry_in is the number of seconds until the next probe.
+    """
+
+    def __init__(self, endpoint, retry_in):
+        super(CircuitOpenError, self).__init__("circuit open for %s, next probe in %.1fs" % (endpoint, retry_in))
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class _Circuit(object):
+
+    def __init__(self, window):
+        self.state = CLOSED
+        self.outcomes = collections.deque(maxlen=window)
+        self.failures = 0
+        self.opened_at = None
+        self.opened = 0
+        self.rejected = 0
+        self.probing = 0
+
+
+class CircuitBreaker(object):
+    """
+    One circuit per endpoint template (see events.path_template). A circuit
+    opens when, over its last `window` calls (at least min_calls of them), the
+    fraction of failures reaches error_rate. Failures are transport errors,
+    5xx responses and, with slow_call set, calls slower than that many
+    seconds. An open circuit fails calls at once with CircuitOpenError; after
+    open_for seconds it lets `probes` calls through (half-open): the circuit
+    closes again if they succeed and reopens if one fails.
+    """
+
+    def __init__(self, error_rate=0.5, min_calls=10, window=50, slow_call=None, open_for=30.0, probes=1,
+                 clock=time.monotonic):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call = slow_call
+        self.open_for = open_for
+        self.probes = probes
+        self.clock = clock
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def before(self, endpoint):
+        """
+        Called before sending to endpoint: raises CircuitOpenError, or returns
+        whether the call is a half-open probe.
+        """
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit.state == CLOSED:
+                return False
+            if circuit.state == OPEN:
+                retry_in = circuit.opened_at + self.open_for - self.clock()
+                if retry_in > 0:
+                    circuit.rejected += 1
+                    raise CircuitOpenError(endpoint, retry_in)
+                circuit.state = HALF_OPEN
+            if circuit.probing >= self.probes:
+                circuit.rejected += 1
+                raise CircuitOpenError(endpoint, 0.0)
+            circuit.probing += 1
+            return True
+
+    def record(self, endpoint, failed, probe=False):
+        """
+        Reports the outcome of a call; failed=None when it says nothing about
+        the endpoint's health (the call was interrupted, say).
+        """
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None:
+                circuit = self._circuits[endpoint] = _Circuit(self.window)
+            if probe:
+                circuit.probing -= 1
+                if failed is None:
+                    return
+                if failed:
+                    self._open(circuit)
+                elif circuit.state == HALF_OPEN and circuit.probing == 0:
+                    circuit.state = CLOSED
+                    circuit.outcomes.clear()
+                    circuit.failures = 0
+                return
+            if circuit.state != CLOSED or failed is None:
+                # Calls let through before the circuit opened, or without an outcome, do not count.
+                return
+            if len(circuit.outcomes) == circuit.outcomes.maxlen and circuit.outcomes[0]:
+                circuit.failures -= 1
+            circuit.outcomes.append(failed)
+            circuit.failures += failed
+            if len(circuit.outcomes) >= self.min_calls and circuit.failures >= self.error_rate * len(circuit.outcomes):
+                self._open(circuit)
+
+    def state(self, endpoint):
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            return circuit.state if circuit is not None else CLOSED
+
+    def states(self):
+        """
+        {endpoint: {"state", "calls", "failures", "opened", "rejected"}} for every endpoint called so far.
+        """
+        with self._lock:
+            return dict((endpoint, {"state": c.state, "calls": len(c.outcomes), "failures": c.failures,
+                                    "opened": c.opened, "rejected": c.rejected})
+                        for endpoint, c in self._circuits.items())
+
+    def _open(self, circuit):
+        circuit.state = OPEN
+        circuit.opened_at = self.clock()
+        circuit.opened += 1
+
+
+class CircuitBreakingHttp(object):
+    """
+    Transport wrapper guarding every request with a CircuitBreaker.
+    """
+
+    def __init__(self, http, breaker, clock=time.perf_counter):
+        self.http = http
+        self.breaker = breaker
+        self.clock = clock
+        self.pool = getattr(http, 'pool', None)
+
+    def request(self, method, url, headers, content, **kwargs):
+        return self._guarded(self.http.request, method, url, headers, content, kwargs)
+
+    def stream(self, method, url, headers, content, **kwargs):
+        return self._guarded(self.http.stream, method, url, headers, content, kwargs)
+
+    def _guarded(self, send, method, url, headers, content, kwargs):
+        endpoint = path_template(url)
+        probe = self.breaker.before(endpoint)
+        start = self.clock()
+        try:
+            res = send(method, url, headers, content, **kwargs)
+        except RETRYABLE_ERRORS:
+            self.breaker.record(endpoint, True, probe)
+            raise
+        except BaseException:
+            self.breaker.record(endpoint, None, probe)
+            raise
+        slow = self.breaker.slow_call is not None and self.clock() - start > self.breaker.slow_call
+        self.breaker.record(endpoint, res.status >= 500 or slow, probe)
+        return res
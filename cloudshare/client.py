@@ -0,0 +1,189 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from . import ioc
+
+DEFAULT_HOSTNAME = "use.cloudshare.com"
+
+# Seconds any single socket operation may take before the attempt fails (and is retried).
+DEFAULT_TIMEOUT = 60.0
+
+
+class Client(object):
+    """
+    Long-lived entry point to the API. The requester, transport, signer and
+    connection pool are built once here and shared by every call, from any thread.
+
+    rate_limiter (see cloudshare.rate_limiter) throttles every request sent on
+    the wire, retries included. codec (see cloudshare.codec) defaults to the
+    fastest JSON library installed. http_cache (a cloudshare.http_cache.HttpCache)
+    keeps GET responses on disk between runs. Concurrent identical GETs share one
+    request unless coalesce=False; micro_cache_ttl (seconds) also lets repeats
+    within that window reuse the response. GETs that act (envs/actions/create,
+    see coalescing.CHANGING_ACTIONS) or are sent with idempotent=False are
+    never shared. hostname may carry a scheme, e.g. the url of a local
+    cloudshare.standin.StandIn.
+
+    record appends the traffic sent on the wire to that cassette file;
+    replay serves the responses of such a cassette instead of sending
+    anything, sleeping replay_latency times the recorded durations (see
+    cloudshare.cassette).
+
+    timeout (seconds) bounds every socket operation of a request; deadline
+    (seconds, none by default) bounds whole calls, retries included, raising
+    cloudshare.DeadlineExceeded. Both can be overridden per request. With
+    hedge=True, a GET still unanswered after the p95 latency this client
+    measured for its endpoint is sent a second time and the first answer
+    wins (see cloudshare.hedging). circuit_breaker (a
+    cloudshare.circuit_breaker.CircuitBreaker) fails calls to an endpoint at
+    once while it keeps failing. metrics() reports what was measured.
+    """
+
+    def __init__(self, hostname=None, api_id=None, api_key=None, pool=None,
+                 pool_size=10, idle_timeout=60.0, ssl_context=None, http=None, retry_policy=None,
+                 rate_limiter=None, codec=None, http_cache=None, coalesce=True, micro_cache_ttl=0.0,
+                 record=None, replay=None, replay_latency=0.0, timeout=DEFAULT_TIMEOUT, deadline=None,
+                 hedge=False, circuit_breaker=None):
+        self.hostname = hostname or DEFAULT_HOSTNAME
+        self.api_id = api_id
+        self.api_key = api_key
+        if pool is None:
+            pool = ioc.get_connection_pool(maxsize=pool_size, idle_timeout=idle_timeout,
+                                           ssl_context=ssl_context, shared=False)
+        self.pool = pool
+        self.rate_limiter = rate_limiter
+        if replay is not None:
+            http = ioc.get_replay_http(replay, latency=replay_latency)
+        self.http = http if http is not None else ioc.get_http(pool=self.pool, rate_limiter=rate_limiter)
+        # The wrappers below are this client's own, the transport may not be: close() stops at it.
+        self._transport = self.http
+        if record is not None:
+            self.http = ioc.get_recording_http(self.http, record)
+        self.circuit_breaker = circuit_breaker
+        if circuit_breaker is not None:
+            self.http = ioc.get_circuit_breaking_http(self.http, circuit_breaker)
+        self.http_cache = http_cache
+        if http_cache is not None:
+            self.http = ioc.get_caching_http(self.http, http_cache)
+        self.coalescing = None
+        if coalesce:
+            self.http = self.coalescing = ioc.get_coalescing_http(self.http, micro_cache_ttl)
+        self.timeout = timeout
+        self.deadline = deadline
+        self.hedger = ioc.get_hedger(enabled=hedge)
+        self.retry_policy = retry_policy if retry_policy is not None else ioc.get_retry_policy()
+        self.requester = ioc.get_requester(http=self.http, retryPolicy=self.retry_policy, codec=codec,
+                                           hedger=self.hedger)
+
+    def request(self, method, path="", queryParams=None, content=None, idempotent=None, timeout=None, deadline=None,
+                headers=None):
+        """
+        idempotent=True lets the retry policy repeat a POST that is safe to send twice.
+        headers are added to the signed ones, e.g. If-None-Match for a conditional GET.
+        """
+        return self.requester.cs_request(hostname=self.hostname,
+                                         method=method,
+                                         apiId=self.api_id,
+                                         apiKey=self.api_key,
+                                         path=path,
+                                         queryParams=queryParams,
+                                         content=content,
+                                         idempotent=idempotent,
+                                         timeout=timeout if timeout is not None else self.timeout,
+                                         deadline=deadline if deadline is not None else self.deadline,
+                                         headers=headers)
+
+    def iter_items(self, path, queryParams=None, timeout=None, deadline=None):
+        """
+        Yields the elements of a JSON array endpoint (envs/, class, blueprints...)
+        one at a time while the body is still downloading. Raises ResponseError
+        on a non-2xx status.
+        """
+        return self.requester.iter_items(hostname=self.hostname,
+                                         apiId=self.api_id,
+                                         apiKey=self.api_key,
+                                         path=path,
+                                         queryParams=queryParams,
+                                         timeout=timeout if timeout is not None else self.timeout,
+                                         deadline=deadline if deadline is not None else self.deadline)
+
+    def request_many(self, specs, max_workers=8, rate=None, ordered=True):
+        """
+        Runs request(**spec) for every spec, e.g. {'method': 'POST', 'path': 'class',
+        'content': {...}}, on max_workers threads sharing this client's connections.
+        Yields a cloudshare.batch.BatchResult per spec (see run_batch).
+        """
+        from .batch import run_batch
+        return run_batch(self.request, specs, max_workers=max_workers, rate=rate, ordered=ordered)
+
+    def get(self, path, queryParams=None):
+        return self.request('GET', path, queryParams=queryParams)
+
+    def post(self, path, content=None, queryParams=None, idempotent=None):
+        return self.request('POST', path, queryParams=queryParams, content=content, idempotent=idempotent)
+
+    def put(self, path, queryParams=None, content=None):
+        return self.request('PUT', path, queryParams=queryParams, content=content)
+
+    def delete(self, path, queryParams=None):
+        return self.request('DELETE', path, queryParams=queryParams)
+
+    def add_listener(self, listener):
+        """
+        listener(event) is called with a cloudshare.events.RequestEvent, carrying
+        the phase timings, status and byte counts, after every request attempt.
+        """
+        self.requester.listeners.add(listener)
+
+    def remove_listener(self, listener):
+        self.requester.listeners.remove(listener)
+
+    def metrics(self):
+        """
+        What this client measured so far: per endpoint template (see
+        cloudshare.events.path_template) the number of calls and their p50,
+        p95 and p99 durations in seconds, hedges sent and won, connections
+        opened and reused, GETs answered by coalescing or the micro-cache, and
+        the state of each endpoint's circuit.
+        """
+        metrics = {
+            "endpoints": self.hedger.histogram.summary(),
+            "hedged": self.hedger.hedged,
+            "hedge_wins": self.hedger.hedge_wins,
+            "connections_created": getattr(self.pool, 'created', None),
+            "connections_reused": getattr(self.pool, 'reused', None),
+        }
+        if self.coalescing is not None:
+            metrics["coalesced"] = self.coalescing.coalesced
+            metrics["micro_cache_hits"] = self.coalescing.hits
+        if self.circuit_breaker is not None:
+            metrics["circuits"] = self.circuit_breaker.states()
+        return metrics
+
+    def close(self):
+        """
+        Closes the wrappers this client put around its transport, outermost
+        first (ending a recorded cassette, say), then its connections.
+        """
+        http = self.http
+        while http is not self._transport:
+            if hasattr(http, 'close'):
+                http.close()
+            http = http.http
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
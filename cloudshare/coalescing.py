@@ -0,0 +1,168 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+import time
+import urllib.parse
+
+from .events import resource_ids
+from .http_cache import cache_key
+
+# Expired micro-cache entries are swept once it holds this many.
+_SWEEP_AT = 1024
+
+# Actions the API takes as GETs although they change something (lower case).
+CHANGING_ACTIONS = frozenset(["create", "suspend", "resume", "delete", "revert", "reboot", "extend", "postpone",
+                              "executepath", "takesnapshot", "revertvm", "rebootvm"])
+
+
+class _Flight(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        # Cleared when a change to the same resource lands while in flight.
+        self.cacheable = True
+
+
+class CoalescingHttp(object):
+    """
+    Transport wrapper collapsing concurrent identical GETs (same URL and API
+    id) into one request: the first caller sends it, the others wait and get
+    a copy of its response, or its exception. With ttl > 0 (seconds; meant to
+    be a fraction of one), successful responses are also reused by identical
+    GETs issued within ttl. POST/PUT/DELETE drop the cached responses that
+    name the same ids, or whose path contains or lies under theirs.
+
+    GETs of CHANGING_ACTIONS (envs/actions/create...) are changes: two
+    identical ones must act twice. Read-only actions (envs/actions/getextended)
+    are shared like any GET. request_change() sends any other GET as a change.
+    """
+
+    def __init__(self, http, ttl=0.0, clock=time.monotonic):
+        self.http = http
+        self.ttl = ttl
+        self.clock = clock
+        self.pool = getattr(http, 'pool', None)
+        self.coalesced = 0
+        self.hits = 0
+        self._inflight = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers, content, **kwargs):
+        if is_change(method, url):
+            return self.request_change(method, url, headers, content, **kwargs)
+        if headers and ('If-None-Match' in headers or 'If-Modified-Since' in headers):
+            # The answer to a conditional GET depends on what its caller already has.
+            return self.http.request(method, url, headers, content, **kwargs)
+        key = cache_key(url, headers)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > self.clock():
+                self.hits += 1
+                return cached[1].copy()
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight(url)
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response.copy()
+        try:
+            flight.response = self.http.request(method, url, headers, content, **kwargs)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if self.ttl > 0 and flight.cacheable and flight.error is None \
+                        and flight.response.status // 100 == 2:
+                    self._store(key, url, flight.response)
+            flight.done.set()
+        # The original stays untouched for followers and the micro-cache.
+        return flight.response.copy()
+
+    def request_change(self, method, url, headers, content, **kwargs):
+        """
+        Sends a request that changes something whatever its method (a GET
+        marked idempotent=False, say): never shared nor cached, and it
+        invalidates the cached responses it affects.
+        """
+        try:
+            return self.http.request(method, url, headers, content, **kwargs)
+        finally:
+            self.invalidate(url)
+
+    def request_alone(self, method, url, headers, content, **kwargs):
+        """
+        Sends a GET that must not join an identical one in flight nor come
+        from the micro-cache: a hedge of that very request, say.
+        """
+        return self.http.request(method, url, headers, content, **kwargs)
+
+    def stream(self, method, url, headers, content, **kwargs):
+        return self.http.stream(method, url, headers, content, **kwargs)
+
+    def invalidate(self, url=None):
+        """
+        Forgets cached responses for the resource `url` changes (all of them
+        by default), and keeps GETs already in flight for it from being cached.
+        """
+        with self._lock:
+            if url is None:
+                self._cache.clear()
+                return
+            ids = resource_ids(url)
+            path = _path(url)
+            for key, (_, _, cached_url) in list(self._cache.items()):
+                if self._affected(cached_url, ids, path):
+                    del self._cache[key]
+            for flight in self._inflight.values():
+                if self._affected(flight.url, ids, path):
+                    flight.cacheable = False
+
+    def _affected(self, url, ids, path):
+        # Same ids, or one path inside the other: a change to class/CL1 affects the class list too.
+        other = _path(url)
+        return bool(ids & resource_ids(url)) or other.startswith(path) or path.startswith(other)
+
+    def _store(self, key, url, res):
+        now = self.clock()
+        if len(self._cache) >= _SWEEP_AT:
+            for k, entry in list(self._cache.items()):
+                if entry[0] <= now:
+                    del self._cache[k]
+        self._cache[key] = (now + self.ttl, res, url)
+
+
+def is_change(method, url):
+    """
+    Whether a request changes something: any method but GET, and GETs of
+    CHANGING_ACTIONS (envs/actions/create, vms/actions/reboot...).
+    """
+    if method != 'GET':
+        return True
+    segments = urllib.parse.urlsplit(url).path.rstrip("/").split("/")
+    return len(segments) > 1 and segments[-2] == "actions" and segments[-1].lower() in CHANGING_ACTIONS
+
+
+def _path(url):
+    return urllib.parse.urlsplit(url).path.rstrip("/") + "/"
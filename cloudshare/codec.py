@@ -0,0 +1,98 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+# Preferred first; the first one that imports becomes the default.
+PREFERRED_CODECS = ("orjson", "ujson", "json")
+
+
+class JsonCodec(object):
+    """
+    Standard library codec. dumps() returns compact UTF-8 bytes, ready to go
+    on the wire; loads() accepts bytes or str.
+    """
+
+    name = "json"
+
+    def __init__(self):
+        # json.dumps() builds a new encoder per call when given any options.
+        # Non-ASCII is \u-escaped: escaping is cheaper than a non-ASCII str encode.
+        self._encoder = json.JSONEncoder(separators=(",", ":"))
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(object):
+    """
+    orjson, with non-str keys turned into strings as json does. Whatever
+    orjson still refuses (ints beyond 64 bits, say) goes through JsonCodec.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._fallback = JsonCodec()
+        self.loads = orjson.loads
+
+    def dumps(self, obj):
+        try:
+            return self._orjson.dumps(obj, option=self._orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return self._fallback.dumps(obj)
+
+
+class UjsonCodec(object):
+
+    name = "ujson"
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+        self._fallback = JsonCodec()
+        self.loads = ujson.loads
+
+    def dumps(self, obj):
+        try:
+            return self._ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+        except (OverflowError, TypeError):
+            # Ints ujson cannot hold in 64 bits.
+            return self._fallback.dumps(obj)
+
+
+_CODECS = {"json": JsonCodec, "orjson": OrjsonCodec, "ujson": UjsonCodec}
+_default = None
+
+
+def get_codec(name=None):
+    """
+    The codec called `name`, or the fastest one installed. Raises ImportError
+    when the named library is missing.
+    """
+    global _default
+    if name is not None:
+        return _CODECS[name]()
+    if _default is None:
+        for candidate in PREFERRED_CODECS:
+            try:
+                _default = _CODECS[candidate]()
+                break
+            except ImportError:
+                continue
+    return _default
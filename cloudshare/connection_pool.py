@@ -0,0 +1,116 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import http.client
+import select
+import threading
+import time
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class ConnectionPool(object):
+    """
+    Keeps idle persistent HTTP/1.1 connections per (scheme, host, port), so
+    consecutive requests to the same host skip the TCP connect and TLS handshake.
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=60.0, ssl_context=None, timeout=None):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme, host, port=None):
+        """
+        Returns a (connection, reused) tuple. Idle connections that expired or
+        were closed by the server are discarded on the way out.
+        """
+        key = self._key(scheme, host, port)
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used > self.idle_timeout or self._is_stale(conn):
+                    conn.close()
+                    continue
+                self.reused += 1
+                return conn, True
+        return self.new_connection(scheme, host, port), False
+
+    def put(self, conn):
+        key = conn._cs_pool_key
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            idle = self._idle.setdefault(key, [])
+            if len(idle) >= self.maxsize:
+                conn.close()
+                return
+            idle.append((conn, now))
+
+    def new_connection(self, scheme, host, port=None):
+        key = self._key(scheme, host, port)
+        if key[0] == "https":
+            conn = http.client.HTTPSConnection(key[1], key[2], timeout=self.timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(key[1], key[2], timeout=self.timeout)
+        conn._cs_pool_key = key
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def idle_count(self, scheme=None, host=None, port=None):
+        with self._lock:
+            if scheme is None:
+                return sum(len(idle) for idle in self._idle.values())
+            return len(self._idle.get(self._key(scheme, host, port), ()))
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def _evict_expired(self, now):
+        for key, idle in list(self._idle.items()):
+            fresh = [(c, t) for c, t in idle if now - t <= self.idle_timeout]
+            for conn, last_used in idle:
+                if now - last_used > self.idle_timeout:
+                    conn.close()
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+
+    def _is_stale(self, conn):
+        # An idle keep-alive socket must not be readable: readable means the
+        # server either closed it (EOF) or sent something we never asked for.
+        sock = conn.sock
+        if sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _key(self, scheme, host, port):
+        scheme = scheme.lower()
+        return scheme, host, port or DEFAULT_PORTS[scheme]
@@ -0,0 +1,130 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import re
+import threading
+import time
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+# Phases reported in RequestEvent.timings, in the order they happen. dns,
+# connect and tls are only there when the attempt opened a new connection.
+PHASES = ("dns", "connect", "tls", "send", "ttfb", "download", "parse")
+
+# CloudShare ids (ENxxxx, VMxxxx, CLxxxx...), GUIDs and plain numbers.
+_ID_SEGMENT = re.compile(r"^(?:[A-Z]{2}[0-9A-Za-z]{6,}|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|\d+)$")
+
+clock = time.perf_counter
+
+
+def path_template(url):
+    """
+    The endpoint a URL belongs to, with ids replaced by {id} and only the
+    names of query parameters kept: "envs/{id}", "envs/actions/getextended?envId".
+    """
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path
+    if path.startswith("/api/v3/"):
+        path = path[len("/api/v3/"):]
+    path = "/".join("{id}" if _ID_SEGMENT.match(s) else s for s in path.strip("/").split("/"))
+    if parts.query:
+        path += "?" + "&".join(sorted(name for name, _ in urllib.parse.parse_qsl(parts.query, True)))
+    return path
+
+
+def resource_ids(url):
+    """
+    The ids a URL refers to, in its path or its query string.
+    """
+    parts = urllib.parse.urlsplit(url)
+    ids = set(s for s in parts.path.split("/") if _ID_SEGMENT.match(s))
+    ids.update(v for _, v in urllib.parse.parse_qsl(parts.query) if _ID_SEGMENT.match(v))
+    return ids
+
+
+class RequestEvent(object):
+    """
+    One attempt of one request. timings maps phase names (see PHASES) to
+    seconds, plus "total". retries is 0 for the first attempt; error is the
+    exception the transport raised, if any.
+    """
+
+    def __init__(self, method, url, retries=0):
+        self.method = method
+        self.url = url
+        self.path = path_template(url)
+        self.retries = retries
+        self.status = None
+        self.error = None
+        self.request_bytes = 0
+        self.wire_bytes = None
+        self.decoded_bytes = None
+        self.timings = {}
+        self.started = clock()
+
+    def finish(self):
+        self.timings["total"] = clock() - self.started
+
+    def __repr__(self):
+        return "<RequestEvent %s %s %s retries=%d %s>" % (
+            self.method, self.path, self.status, self.retries,
+            " ".join("%s=%.1fms" % (k, v * 1000) for k, v in self.timings.items()))
+
+
+class RequestListeners(object):
+    """
+    Callables notified with a RequestEvent after every attempt. With none
+    registered, requests skip timing and event creation altogether.
+    """
+
+    def __init__(self):
+        self._listeners = ()
+        self._lock = threading.Lock()
+
+    def add(self, listener):
+        with self._lock:
+            self._listeners = self._listeners + (listener,)
+
+    def remove(self, listener):
+        with self._lock:
+            self._listeners = tuple(l for l in self._listeners if l is not listener)
+
+    def __bool__(self):
+        return bool(self._listeners)
+
+    def emit(self, event):
+        event.finish()
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("request listener %r failed", listener)
+
+
+class LoggingListener(object):
+    """
+    Logs one line per attempt with its phase timings.
+    """
+
+    def __init__(self, logger=logger, level=logging.INFO):
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, event):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s %s -> %s (retry %d, %s bytes) %s",
+                            event.method, event.path, event.status if event.error is None else event.error,
+                            event.retries, event.wire_bytes,
+                            " ".join("%s=%.1fms" % (k, v * 1000) for k, v in event.timings.items()))
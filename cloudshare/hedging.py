@@ -0,0 +1,180 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import collections
+import concurrent.futures
+import threading
+import time
+
+from .coalescing import is_change
+from .events import path_template
+
+# A cached quantile is recomputed once its endpoint has this many new samples.
+_REFRESH_EVERY = 16
+
+
+class LatencyHistogram(object):
+    """
+    Durations (seconds) of the last `window` calls of each endpoint template
+    (see events.path_template), and how many calls each endpoint had.
+    """
+
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._quantiles = {}
+        self._lock = threading.Lock()
+
+    def add(self, template, seconds):
+        with self._lock:
+            samples = self._samples.get(template)
+            if samples is None:
+                samples = self._samples[template] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+            self._counts[template] = self._counts.get(template, 0) + 1
+
+    def quantile(self, template, q, min_samples=1):
+        """
+        The q quantile of the endpoint's recent durations, or None with fewer
+        than min_samples of them.
+        """
+        with self._lock:
+            samples = self._samples.get(template)
+            if samples is None or len(samples) < min_samples:
+                return None
+            count = self._counts[template]
+            cached = self._quantiles.get((template, q))
+            if cached is None or count - cached[0] >= _REFRESH_EVERY:
+                cached = self._quantiles[(template, q)] = (count, _quantile(sorted(samples), q))
+            return cached[1]
+
+    def summary(self):
+        with self._lock:
+            snapshot = [(t, self._counts[t], sorted(s)) for t, s in self._samples.items()]
+        return dict((t, {"count": count, "p50": _quantile(s, 0.5), "p95": _quantile(s, 0.95), "p99": _quantile(s, 0.99)})
+                    for t, count, s in snapshot)
+
+
+class Hedger(object):
+    """
+    Times every call into a LatencyHistogram. With enabled=True, a GET (not
+    one of coalescing.CHANGING_ACTIONS) still unanswered after the `quantile` latency of its endpoint gets a second,
+    freshly signed, identical request, and whichever answers first is used.
+    Hedging starts once an endpoint has min_samples durations, and at most
+    max_hedges hedges are in flight at once, so a slow server does not see
+    its load doubled.
+    """
+
+    def __init__(self, histogram=None, enabled=False, quantile=0.95, min_samples=20, max_hedges=4,
+                 max_workers=64, clock=time.perf_counter):
+        self.histogram = histogram if histogram is not None else LatencyHistogram()
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.max_workers = max_workers
+        self.clock = clock
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._in_flight = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def send(self, transport, method, url, headers, sign, body, hedge_transport=None, **kwargs):
+        """
+        transport(method, url, headers, body, **kwargs), hedged if worth it;
+        sign() returns the headers of a hedge, sent with hedge_transport
+        (transport by default). Pass one that cannot join the primary's
+        request, e.g. the layer beneath a coalescing.CoalescingHttp.
+        """
+        template = path_template(url)
+        threshold = None
+        if self.enabled and not is_change(method, url):
+            threshold = self.histogram.quantile(template, self.quantile, self.min_samples)
+        start = self.clock()
+        if threshold is None:
+            res = transport(method, url, headers, body, **kwargs)
+        else:
+            res = self._hedged(transport, hedge_transport or transport, method, url, headers, sign, body, threshold,
+                               kwargs)
+        self.histogram.add(template, self.clock() - start)
+        return res
+
+    def _hedged(self, transport, hedge_transport, method, url, headers, sign, body, threshold, kwargs):
+        timings = kwargs.pop('timings', None)
+
+        def attempt(transport, headers):
+            attempt_timings = {} if timings is not None else None
+            if attempt_timings is None:
+                return transport(method, url, headers, body, **kwargs), None
+            return transport(method, url, headers, body, timings=attempt_timings, **kwargs), attempt_timings
+
+        primary = self._submit(attempt, transport, headers)
+        try:
+            return self._result(primary, timings, threshold)
+        except concurrent.futures.TimeoutError:
+            pass
+        with self._lock:
+            capped = self._in_flight >= self.max_hedges
+            if not capped:
+                self._in_flight += 1
+                self.hedged += 1
+        if capped:
+            return self._result(primary, timings)
+        hedge = self._submit(attempt, hedge_transport, sign())
+        hedge.add_done_callback(self._hedge_done)
+        pending = set([primary, hedge])
+        first_error = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    first_error = first_error or future.exception()
+                    continue
+                for loser in pending:
+                    loser.add_done_callback(_close_result)
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return self._result(future, timings)
+        raise first_error
+
+    def _hedge_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _result(self, future, timings, timeout=None):
+        res, attempt_timings = future.result(timeout)
+        if timings is not None:
+            timings.update(attempt_timings)
+        return res
+
+    def _submit(self, fn, transport, headers):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers,
+                                                                       thread_name_prefix="cloudshare-hedge")
+        return self._executor.submit(fn, transport, headers)
+
+
+def _close_result(future):
+    # The slower of a hedged pair: its connection is not needed any more.
+    if future.exception() is None:
+        res = future.result()[0]
+        if hasattr(res, 'close'):
+            res.close()
+
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
@@ -11,38 +11,325 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import urllib.request, urllib.error, urllib.parse
+import copy
+import http.client
+import socket
+import time
+import urllib.parse
+import zlib
+
+from .connection_pool import ConnectionPool
+
+# Errors raised when the server dropped a kept-alive connection behind our back.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                            BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+ACCEPT_ENCODING = "gzip, deflate"
+READ_CHUNK_SIZE = 64 * 1024
 
 
 class Http(object):
 
-    def request(self, method, url, headers, content):
-        req = self._build_request(method, url, headers, content)
+    def __init__(self, pool=None, rate_limiter=None):
+        self.pool = pool if pool is not None else ConnectionPool()
+        self.rate_limiter = rate_limiter
+
+    def request(self, method, url, headers, content, timings=None, timeout=None):
+        """
+        timings: optional dict that receives the duration in seconds of the dns,
+        connect, tls (new connections only), send, ttfb and download phases.
+        timeout (seconds) bounds every socket operation of this request, instead
+        of the pool's timeout.
+        """
+        conn, res = self._open(method, url, headers, content, timings, timeout)
+        decoder = ContentDecoder(res.getheader('Content-Encoding'))
+        start = time.perf_counter()
+        try:
+            data = b"".join(self._iter_body(res, decoder))
+        except BaseException:
+            conn.close()
+            raise
+        if timings is not None:
+            timings['download'] = time.perf_counter() - start
+        self._release(conn, res)
+        return Response(status=res.status,
+                        content=data,
+                        headers=self._headers(res),
+                        wire_bytes=decoder.wire_bytes,
+                        decoded_bytes=decoder.decoded_bytes)
+
+    def stream(self, method, url, headers, content, timings=None, timeout=None):
+        conn, res = self._open(method, url, headers, content, timings, timeout)
+        return StreamedResponse(self, conn, res)
+
+    def _open(self, method, url, headers, content, timings=None, timeout=None):
+        parts = urllib.parse.urlsplit(url)
+        target = self._request_target(parts)
+        body = self._body(content)
+        headers = self._add_content_length_header_if_needed(method, headers, body)
+        headers.setdefault('Accept-Encoding', ACCEPT_ENCODING)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        conn, reused = self.pool.get(parts.scheme, parts.hostname, parts.port)
+        try:
+            return conn, self._send(conn, method, target, headers, body, timings, timeout)
+        except _STALE_CONNECTION_ERRORS:
+            if not reused:
+                raise
+        conn = self.pool.new_connection(parts.scheme, parts.hostname, parts.port)
+        return conn, self._send(conn, method, target, headers, body, timings, timeout)
+
+    def _send(self, conn, method, target, headers, body, timings=None, timeout=None):
+        try:
+            self._set_timeout(conn, timeout)
+            if timings is None:
+                conn.request(method, target, body=body, headers=headers)
+                return conn.getresponse()
+            if conn.sock is None:
+                self._connect(conn, timings)
+            start = time.perf_counter()
+            conn.request(method, target, body=body, headers=headers)
+            sent = time.perf_counter()
+            res = conn.getresponse()
+            timings['send'] = sent - start
+            timings['ttfb'] = time.perf_counter() - sent
+            return res
+        except BaseException:
+            conn.close()
+            raise
+
+    def _set_timeout(self, conn, timeout):
+        # Pooled connections outlive the request: each one sets its own.
+        if timeout is None:
+            timeout = getattr(self.pool, 'timeout', None)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+
+    def _connect(self, conn, timings):
+        # Connect up front rather than inside request(), so DNS, TCP and TLS can be told apart.
+        conn._create_connection = _timed_create_connection(timings)
+        start = time.perf_counter()
         try:
-            f = urllib.request.urlopen(req)
-            return Response(status=f.getcode(), content=f.read())
-        except urllib.error.HTTPError as e:
-            return Response(status=e.getcode(), content=e.read())
-
-    def _build_request(self, method, url, headers, content):
-        headers = self._add_content_length_header_if_needed(
-            method, headers, content)
-        req = urllib.request.Request(url=url,
-                              data=content.encode('utf-8') if content is not None else None,
-                              headers=headers)
-        req.get_method = lambda: method
-        return req
-
-    def _add_content_length_header_if_needed(self, method, headers, content):
+            conn.connect()
+        finally:
+            conn._create_connection = socket.create_connection
+        if isinstance(conn, http.client.HTTPSConnection):
+            timings['tls'] = time.perf_counter() - start - timings.get('dns', 0) - timings.get('connect', 0)
+
+    def _iter_body(self, res, decoder):
+        # Decompress as the body arrives instead of buffering the compressed
+        # payload first; peak memory is the decoded body plus one chunk.
+        while True:
+            chunk = res.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            data = decoder.decompress(chunk)
+            if data:
+                yield data
+        data = decoder.flush()
+        if data:
+            yield data
+
+    def _release(self, conn, res):
+        if res.will_close:
+            conn.close()
+        else:
+            self.pool.put(conn)
+
+    def _headers(self, res):
+        return dict((name.lower(), value) for name, value in res.getheaders())
+
+    def _request_target(self, parts):
+        path = parts.path or "/"
+        return "%s?%s" % (path, parts.query) if parts.query else path
+
+    def _body(self, content):
+        # Requester hands over bytes already; str is still accepted from other callers.
+        if isinstance(content, str):
+            return content.encode('utf-8')
+        return content
+
+    def _add_content_length_header_if_needed(self, method, headers, body):
         if headers is None:
             headers = {}
         if method == 'PUT' or method == 'POST':
-            headers['Content-Length'] = len(content) if content is not None else 0
+            headers['Content-Length'] = len(body) if body is not None else 0
         return headers
 
 
-class Response:
+def _timed_create_connection(timings):
+    # socket.create_connection, with name resolution and the TCP handshake timed separately.
+    def create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+        host, port = address
+        start = time.perf_counter()
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        timings['dns'] = resolved - start
+        error = None
+        for _, _, _, _, sockaddr in addresses:
+            try:
+                sock = socket.create_connection(sockaddr[:2], timeout, source_address)
+            except OSError as e:
+                error = e
+                continue
+            timings['connect'] = time.perf_counter() - resolved
+            return sock
+        raise error
+    return create_connection
 
-    def __init__(self, status, content):
+
+class ContentDecoder(object):
+    """
+    Incremental gzip/deflate decoder that also counts the bytes received on
+    the wire and the bytes they decoded to.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = (encoding or "identity").strip().lower()
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        if self.encoding == "gzip" or self.encoding == "x-gzip":
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "deflate":
+            self._zlib = zlib.decompressobj(zlib.MAX_WBITS)
+        else:
+            self._zlib = None
+        self._first = True
+
+    def decompress(self, chunk):
+        self.wire_bytes += len(chunk)
+        if self._zlib is None:
+            data = chunk
+        else:
+            data = self._decompress(chunk)
+        self.decoded_bytes += len(data)
+        return data
+
+    def flush(self):
+        if self._zlib is None:
+            return b""
+        data = self._zlib.flush()
+        self.decoded_bytes += len(data)
+        return data
+
+    def _decompress(self, chunk):
+        try:
+            data = self._zlib.decompress(chunk)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header.
+            if not (self._first and self.encoding == "deflate"):
+                raise
+            self._zlib = zlib.decompressobj(-zlib.MAX_WBITS)
+            data = self._zlib.decompress(chunk)
+        self._first = False
+        return data
+
+
+class StreamedResponse(object):
+    """
+    A response whose body is consumed incrementally with iter_content(). The
+    connection goes back to the pool once the body has been read to the end,
+    and is closed if the caller stops early.
+    """
+
+    def __init__(self, http, conn, res):
+        self.status = res.status
+        self.headers = http._headers(res)
+        self._http = http
+        self._conn = conn
+        self._res = res
+        self._decoder = ContentDecoder(res.getheader('Content-Encoding'))
+
+    @property
+    def wire_bytes(self):
+        return self._decoder.wire_bytes
+
+    @property
+    def decoded_bytes(self):
+        return self._decoder.decoded_bytes
+
+    def iter_content(self):
+        try:
+            for data in self._http._iter_body(self._res, self._decoder):
+                yield data
+        except BaseException:
+            self.close()
+            raise
+        if self._conn is not None:
+            self._http._release(self._conn, self._res)
+            self._conn = None
+
+    def read(self):
+        return b"".join(self.iter_content())
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_UNDECODED = object()
+
+
+class Response(object):
+    """
+    body holds the payload bytes as received (after decompression). Once a
+    codec is attached (Requester does it), content is the JSON they decode to,
+    or None if they are not JSON, parsed on first access only. Without a
+    codec, content is the bytes.
+    """
+
+    __slots__ = ("status", "body", "headers", "wire_bytes", "decoded_bytes", "retries", "codec", "_content")
+
+    def __init__(self, status, content, headers=None, wire_bytes=None, decoded_bytes=None, retries=0, codec=None):
         self.status = status
-        self.content = content
+        self.body = content
+        self.headers = headers if headers is not None else {}
+        self.wire_bytes = wire_bytes
+        self.decoded_bytes = decoded_bytes
+        self.retries = retries
+        self.codec = codec
+        self._content = _UNDECODED
+
+    @property
+    def content(self):
+        if self._content is _UNDECODED:
+            if self.codec is None:
+                return self.body
+            self._content = self._decode()
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+    @property
+    def parsed(self):
+        """
+        True once content has been parsed (or set).
+        """
+        return self._content is not _UNDECODED
+
+    def copy(self):
+        """
+        A Response sharing this one's body bytes, with its own headers and
+        decoded content, so callers can change either without affecting this one.
+        """
+        other = Response(self.status, self.body, dict(self.headers), self.wire_bytes, self.decoded_bytes,
+                         self.retries, self.codec)
+        if self._content is not _UNDECODED:
+            other._content = copy.deepcopy(self._content)
+        return other
+
+    def _decode(self):
+        try:
+            return self.codec.loads(self.body)
+        except (ValueError, TypeError):
+            return None
@@ -0,0 +1,241 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+
+from .events import path_template
+from .http import Response
+
+# Seconds a response stays fresh when the server sends no Cache-Control max-age,
+# by endpoint template (query parameter names are ignored). Reference data only.
+DEFAULT_TTLS = {
+    "regions": 24 * 3600,
+    "projects": 3600,
+    "projects/{id}/policies": 3600,
+    "projects/{id}/blueprints": 3600,
+    "templates": 3600,
+}
+
+# Header on responses served by the cache: "hit" (no round trip) or "revalidated" (304).
+CACHE_HEADER = "x-cloudshare-cache"
+
+_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+_API_ID = re.compile(r"userapiid:([^;]*)")
+
+
+def default_cache_path():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "cloudshare", "http-cache.db")
+
+
+class HttpCache(object):
+    """
+    On-disk store of GET responses in a SQLite database, shared by the
+    processes using the same path. Entries are kept until evicted, least
+    recently used first, when the bodies exceed max_bytes, or until
+    invalidated; stale ones are revalidated when the server gave an ETag or
+    Last-Modified.
+    """
+
+    def __init__(self, path=None, max_bytes=64 * 1024 * 1024, ttls=None, default_ttl=0, clock=time.time):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._db = None
+
+    def ttl(self, url):
+        template = path_template(url).split("?", 1)[0]
+        return self.ttls.get(template, self.default_ttl)
+
+    def get(self, key):
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT status, headers, body, etag, last_modified, expires FROM entries WHERE key = ?",
+                             (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (self.clock(), key))
+        return CacheEntry(row[0], json.loads(row[1]), row[2], row[3], row[4], row[5])
+
+    def store(self, key, url, res, ttl):
+        headers = json.dumps(res.headers)
+        body = res.body
+        now = self.clock()
+        with self._lock:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO entries (key, path, status, headers, body, etag, last_modified, "
+                       "expires, accessed, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (key, _path(url), res.status, headers, body, res.headers.get("etag"),
+                        res.headers.get("last-modified"), now + ttl, now, len(body) + len(headers)))
+            self._evict(db)
+
+    def refresh(self, key, ttl):
+        now = self.clock()
+        with self._lock:
+            self._connect().execute("UPDATE entries SET expires = ?, accessed = ? WHERE key = ?",
+                                    (now + ttl, now, key))
+
+    def invalidate(self, path=""):
+        """
+        Drops the entries whose path starts with `path` ("projects/" drops
+        projects, their blueprints and policies); everything by default.
+        Returns how many were dropped.
+        """
+        path = path.strip("/ ")
+        with self._lock:
+            db = self._connect()
+            if not path:
+                return db.execute("DELETE FROM entries").rowcount
+            return db.execute("DELETE FROM entries WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                              (path, _escape_like(path) + "/%")).rowcount
+
+    def clear(self):
+        return self.invalidate()
+
+    def size(self):
+        with self._lock:
+            return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _connect(self):
+        import sqlite3
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, path TEXT NOT NULL, "
+                             "status INTEGER, headers TEXT, body BLOB, etag TEXT, last_modified TEXT, "
+                             "expires REAL, accessed REAL, size INTEGER)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        return self._db
+
+
+class CacheEntry(object):
+
+    __slots__ = ("status", "headers", "body", "etag", "last_modified", "expires")
+
+    def __init__(self, status, headers, body, etag, last_modified, expires):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    def response(self, source):
+        headers = dict(self.headers)
+        headers[CACHE_HEADER] = source
+        return Response(self.status, self.body, headers, wire_bytes=0, decoded_bytes=len(self.body))
+
+
+class CachingHttp(object):
+    """
+    Transport wrapper answering GETs from an HttpCache: fresh entries come
+    back without a round trip, stale ones are revalidated with If-None-Match /
+    If-Modified-Since. Only the endpoints the cache has a TTL for (reference
+    data, see DEFAULT_TTLS) and responses with a Cache-Control max-age are
+    stored. Other methods go straight through and invalidate the cached
+    entries under the same top-level path.
+    """
+
+    def __init__(self, http, cache):
+        self.http = http
+        self.cache = cache
+        self.pool = getattr(http, 'pool', None)
+
+    def request(self, method, url, headers, content, **kwargs):
+        if method != 'GET':
+            res = self.http.request(method, url, headers, content, **kwargs)
+            self.cache.invalidate(_path(url).split("/", 1)[0])
+            return res
+        key = cache_key(url, headers)
+        entry = self.cache.get(key)
+        if entry is not None and entry.expires > self.cache.clock():
+            return entry.response("hit")
+        if entry is not None:
+            headers = dict(headers or {})
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        res = self.http.request(method, url, headers, content, **kwargs)
+        if res.status == 304 and entry is not None:
+            self.cache.refresh(key, self._ttl(url, res.headers))
+            return entry.response("revalidated")
+        if res.status == 200 and self._storable(url, res.headers):
+            ttl = self._ttl(url, res.headers)
+            if ttl > 0 or res.headers.get("etag") or res.headers.get("last-modified"):
+                self.cache.store(key, url, res, ttl)
+        return res
+
+    def stream(self, method, url, headers, content, **kwargs):
+        return self.http.stream(method, url, headers, content, **kwargs)
+
+    def _ttl(self, url, headers):
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-cache" in cache_control:
+            return 0
+        match = _MAX_AGE.search(cache_control)
+        return int(match.group(1)) if match else self.cache.ttl(url)
+
+    def _storable(self, url, headers):
+        # A per-user cache on the caller's disk: "private" responses are fine, "no-store" ones are not.
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control:
+            return False
+        # A validator alone is no reason to write every environment listing to disk.
+        match = _MAX_AGE.search(cache_control)
+        return self.cache.ttl(url) > 0 or (match is not None and int(match.group(1)) > 0)
+
+
+def cache_key(url, headers):
+    # Responses depend on who asks: one entry per API id and URL.
+    match = _API_ID.search((headers or {}).get('Authorization', ""))
+    return "%s %s" % (match.group(1) if match else "", url)
+
+
+def _path(url):
+    path = urllib.parse.urlsplit(url).path
+    if path.startswith("/api/v3/"):
+        path = path[len("/api/v3/"):]
+    return path.strip("/")
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -11,16 +11,67 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import threading
+import weakref
 
+_shared = {}
+_async_clients = weakref.WeakKeyDictionary()
+_shared_lock = threading.Lock()
 
-def get_requester():
+
+def get_requester(http=None, authParamProvider=None, retryPolicy=None, codec=None, hedger=None):
     from .requester import Requester
-    return Requester(get_http(), get_auth_param_provider())
+    return Requester(http if http is not None else get_http(),
+                     authParamProvider if authParamProvider is not None else get_auth_param_provider(),
+                     retryPolicy,
+                     codec=codec,
+                     hedger=hedger)
+
+
+def get_default_client():
+    # The client behind cloudshare.req(): built once per process, credentials
+    # are passed on each call.
+    with _shared_lock:
+        if 'client' not in _shared:
+            from .client import Client
+            _shared['client'] = Client(pool=_get_shared_pool())
+        return _shared['client']
+
+
+def get_async_requester(http=None, authParamProvider=None, retryPolicy=None, codec=None):
+    from .async_requester import AsyncRequester
+    return AsyncRequester(http if http is not None else get_async_http(),
+                          authParamProvider if authParamProvider is not None else get_auth_param_provider(),
+                          retryPolicy,
+                          codec=codec)
+
+
+def get_codec(name=None):
+    from .codec import get_codec
+    return get_codec(name)
+
+
+def get_retry_policy(**kwargs):
+    from .retry import RetryPolicy
+    return RetryPolicy(**kwargs)
+
+
+def get_default_async_client():
+    # Async connections belong to the loop that opened them, so cloudshare.areq()
+    # keeps one default client per running event loop.
+    import asyncio
+    loop = asyncio.get_running_loop()
+    with _shared_lock:
+        if loop not in _async_clients:
+            from .async_client import AsyncClient
+            _async_clients[loop] = AsyncClient()
+        return _async_clients[loop]
 
 
 def get_auth_param_provider():
-    from .authentication_parameter_provider import AuthenticationParameterProvider
-    return AuthenticationParameterProvider(get_token_generator(), get_hmacer())
+    # Same parameter as AuthenticationParameterProvider(get_token_generator(), get_hmacer()), computed faster.
+    from .signer import Signer
+    return Signer(get_token_generator())
 
 
 def get_token_generator():
@@ -28,9 +79,71 @@ def get_token_generator():
     return TokenGenerator()
 
 
-def get_http():
+def get_http(pool=None, rate_limiter=None):
     from .http import Http
-    return Http()
+    return Http(pool if pool is not None else get_connection_pool(), rate_limiter=rate_limiter)
+
+
+def get_async_http(pool=None, rate_limiter=None, **kwargs):
+    from .async_http import AsyncHttp, AsyncConnectionPool
+    return AsyncHttp(pool if pool is not None else AsyncConnectionPool(**kwargs), rate_limiter=rate_limiter)
+
+
+def get_http_cache(**kwargs):
+    from .http_cache import HttpCache
+    return HttpCache(**kwargs)
+
+
+def get_caching_http(http, cache):
+    from .http_cache import CachingHttp
+    return CachingHttp(http, cache)
+
+
+def get_recording_http(http, path):
+    from .cassette import RecordingHttp
+    return RecordingHttp(http, path)
+
+
+def get_replay_http(path, latency=0.0):
+    from .cassette import ReplayHttp
+    return ReplayHttp(path, latency=latency)
+
+
+def get_coalescing_http(http, ttl=0.0):
+    from .coalescing import CoalescingHttp
+    return CoalescingHttp(http, ttl)
+
+
+def get_circuit_breaking_http(http, breaker):
+    from .circuit_breaker import CircuitBreakingHttp
+    return CircuitBreakingHttp(http, breaker)
+
+
+def get_hedger(enabled=False, **kwargs):
+    from .hedging import Hedger
+    return Hedger(enabled=enabled, **kwargs)
+
+
+def get_rate_limiter(rate, burst=None, path=None):
+    from .rate_limiter import rate_limiter
+    return rate_limiter(rate, burst, path)
+
+
+def get_connection_pool(shared=True, **kwargs):
+    # One pool per process by default, so even the per-call object graph built
+    # by get_requester() keeps reusing warm connections.
+    if not shared:
+        from .connection_pool import ConnectionPool
+        return ConnectionPool(**kwargs)
+    with _shared_lock:
+        return _get_shared_pool()
+
+
+def _get_shared_pool():
+    if 'pool' not in _shared:
+        from .connection_pool import ConnectionPool
+        _shared['pool'] = ConnectionPool()
+    return _shared['pool']
 
 
 def get_hmacer():
@@ -0,0 +1,95 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+_VALUE_END = _WHITESPACE + ",]"
+# Drop the consumed prefix of the buffer once it grows past this many characters.
+_COMPACT_AT = 64 * 1024
+
+
+def iter_array(chunks):
+    """
+    Yields the elements of a top-level JSON array read from an iterable of
+    byte chunks, holding at most one element plus one chunk in memory. A
+    top-level value that is not an array is yielded whole, as a single item.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = ""
+    pos = 0
+    eof = False
+    in_array = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                break
+            buf, pos, eof = _feed(buf, pos, chunks, utf8)
+            continue
+
+        if not in_array:
+            if buf[pos] != "[":
+                # Not an array: nothing to stream, hand back the whole document.
+                yield json.loads(_drain(buf[pos:], chunks, utf8))
+                return
+            in_array = True
+            pos += 1
+            continue
+
+        if buf[pos] == "]":
+            return
+        if buf[pos] == ",":
+            pos += 1
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buf, pos, eof = _feed(buf, pos, chunks, utf8)
+            continue
+        # A number or literal is only complete once a delimiter follows it:
+        # "-0.5" at the end of a chunk may still become "-0.5e3".
+        if not eof and not isinstance(item, (dict, list, str)) and (end == len(buf) or buf[end] not in _VALUE_END):
+            buf, pos, eof = _feed(buf, pos, chunks, utf8)
+            continue
+        yield item
+        pos = end
+
+    if in_array:
+        raise json.JSONDecodeError("Unterminated array", buf, len(buf))
+    raise json.JSONDecodeError("Expecting value", buf, pos)
+
+
+def _feed(buf, pos, chunks, utf8):
+    if pos > _COMPACT_AT:
+        buf, pos = buf[pos:], 0
+    for chunk in chunks:
+        text = utf8.decode(chunk)
+        if text:
+            return buf + text, pos, False
+    return buf + utf8.decode(b"", final=True), pos, True
+
+
+def _drain(text, chunks, utf8):
+    parts = [text]
+    parts.extend(utf8.decode(chunk) for chunk in chunks)
+    parts.append(utf8.decode(b"", final=True))
+    return "".join(parts)
@@ -0,0 +1,249 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+from .batch import run_batch
+from .requester import ResponseError
+
+
+class PollPolicy(object):
+    """
+    How often, and for how long, to poll while an operation completes.
+
+    The n-th wait is floor * factor ** n seconds, at most ceiling, scaled by
+    a random factor in [1 - jitter, 1 + jitter] and kept within
+    [floor, ceiling]. When the expected completion is nearer than that, the
+    wait stops there instead. deadline is the number of seconds after which
+    polling gives up.
+    """
+
+    def __init__(self, floor=2.0, ceiling=30.0, factor=1.5, jitter=0.2, deadline=900.0):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.factor = factor
+        self.jitter = jitter
+        self.deadline = deadline
+
+    def delay(self, polls, eta=None, rng=random):
+        delay = min(self.ceiling, self.floor * self.factor ** polls)
+        if eta is not None and eta > 0:
+            delay = min(delay, eta)
+        if self.jitter:
+            delay *= rng.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(self.ceiling, max(self.floor, delay))
+
+
+# Suspending is quick; resuming boots every VM; deleting tears down the
+# environment's network as well.
+POLICIES = {
+    "suspend": PollPolicy(floor=2.0, ceiling=15.0, deadline=900.0),
+    "resume": PollPolicy(floor=3.0, ceiling=30.0, deadline=1200.0),
+    "delete": PollPolicy(floor=3.0, ceiling=30.0, deadline=1800.0),
+}
+
+
+def default_history_path():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "cloudshare", "transitions.json")
+
+
+class TransitionHistory(object):
+    """
+    How long each operation took the last `keep` times, in a JSON file shared
+    across runs. eta() is the median of them, None before the first one.
+    A file that cannot be read or written only costs the estimate.
+    """
+
+    def __init__(self, path=None, keep=20):
+        self.path = path or default_history_path()
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def eta(self, operation):
+        durations = self._load().get(operation)
+        return statistics.median(durations) if durations else None
+
+    def record(self, operation, seconds):
+        with self._lock:
+            history = self._load()
+            durations = history.setdefault(operation, [])
+            durations.append(round(seconds, 1))
+            del durations[:-self.keep]
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                temp = "%s.%d.tmp" % (self.path, os.getpid())
+                with open(temp, "w", encoding="utf-8") as f:
+                    json.dump(history, f)
+                os.replace(temp, self.path)
+            except OSError:
+                pass
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return history if isinstance(history, dict) else {}
+
+
+class PollStatus(object):
+    """
+    Where polling stands: done, polls made so far, seconds elapsed, the
+    names of what is still pending, the estimated seconds left (None without
+    history) and the content of the last poll.
+    """
+
+    __slots__ = ("done", "polls", "elapsed", "pending", "eta", "content")
+
+    def __init__(self, done, polls, elapsed, pending, eta, content):
+        self.done = done
+        self.polls = polls
+        self.elapsed = elapsed
+        self.pending = pending
+        self.eta = eta
+        self.content = content
+
+    def __repr__(self):
+        return "<PollStatus %s after %d polls, %.1fs, %d pending>" % (
+            "done" if self.done else "not done", self.polls, self.elapsed, len(self.pending))
+
+
+def poll(fetch, pending, operation, policy=None, deadline=None, history=None, report=None,
+         clock=time.monotonic, sleep=time.sleep, rng=random):
+    """
+    Calls fetch() until pending(content) returns an empty list, waiting
+    between polls as the PollPolicy of operation ("suspend", "resume",
+    "delete") says, and gives up once deadline seconds (the policy's by
+    default) have elapsed. report(status), when given, gets a PollStatus
+    after every poll that is not the last. Returns the final PollStatus;
+    with a TransitionHistory, completed operations are recorded to it and
+    estimate how long the next ones take.
+    """
+    policy = policy or POLICIES[operation]
+    deadline = deadline if deadline is not None else policy.deadline
+    expected = history.eta(operation) if history is not None else None
+    start = clock()
+    polls = 0
+    while True:
+        content = fetch()
+        polls += 1
+        still = pending(content)
+        elapsed = clock() - start
+        if not still:
+            if history is not None:
+                history.record(operation, elapsed)
+            return PollStatus(True, polls, elapsed, [], 0.0, content)
+        eta = max(0.0, expected - elapsed) if expected is not None else None
+        status = PollStatus(False, polls, elapsed, still, eta, content)
+        remaining = deadline - elapsed
+        if remaining <= 0:
+            return status
+        if report is not None:
+            report(status)
+        sleep(min(policy.delay(polls - 1, eta, rng), remaining))
+
+
+def poll_many(fetches, pending, operation, policy=None, deadline=None, history=None, report=None, max_workers=8,
+              clock=time.monotonic, sleep=time.sleep, rng=random):
+    """
+    poll() for many operations of the same kind in one loop: fetches maps
+    keys (environment ids...) to their fetch(). Each round calls the fetch of
+    every key not done yet, max_workers at a time, then waits once for all
+    of them. A fetch (or pending) that raises leaves its key pending, with
+    the exception as content and its message as pending. report(statuses),
+    when given, gets the PollStatus of every key after every round but the
+    last. history gets one sample for the whole batch, the median time its
+    keys took to finish, so a batch does not push the other runs out of it.
+    Returns the final PollStatus of every key, in a dict.
+    """
+    policy = policy or POLICIES[operation]
+    deadline = deadline if deadline is not None else policy.deadline
+    expected = history.eta(operation) if history is not None else None
+    start = clock()
+    statuses = dict((key, PollStatus(False, 0, 0.0, [], expected, None)) for key in fetches)
+    rounds = 0
+    while True:
+        waiting = [key for key, status in statuses.items() if not status.done]
+        specs = [{"fetch": fetches[key], "pending": pending, "key": key} for key in waiting]
+        for result in run_batch(_check, specs, max_workers=max_workers, ordered=False):
+            key = result.spec["key"]
+            polls = statuses[key].polls + 1
+            elapsed = clock() - start
+            if result.error is not None:
+                content, still = result.error, [str(result.error)]
+            else:
+                content, still = result.response
+            if not still:
+                statuses[key] = PollStatus(True, polls, elapsed, [], 0.0, content)
+            else:
+                eta = max(0.0, expected - elapsed) if expected is not None else None
+                statuses[key] = PollStatus(False, polls, elapsed, still, eta, content)
+        rounds += 1
+        etas = [status.eta for status in statuses.values() if not status.done and status.eta is not None]
+        remaining = deadline - (clock() - start)
+        if all(status.done for status in statuses.values()) or remaining <= 0:
+            done = [status.elapsed for status in statuses.values() if status.done]
+            if history is not None and done:
+                history.record(operation, statistics.median(done))
+            return statuses
+        if report is not None:
+            report(statuses)
+        sleep(min(policy.delay(rounds - 1, min(etas) if etas else None, rng), remaining))
+
+
+def _check(fetch, pending, key):
+    content = fetch()
+    return content, pending(content)
+
+
+class ConditionalGet(object):
+    """
+    fetch() for poll(): GETs path with If-None-Match/If-Modified-Since once
+    the server has sent an ETag or Last-Modified, so an unchanged resource
+    comes back as a bodiless 304 and the previous content is reused.
+    Raises ResponseError on other non-2xx answers.
+    """
+
+    def __init__(self, client, path, queryParams=None):
+        self.client = client
+        self.path = path
+        self.queryParams = queryParams
+        self.not_modified = 0
+        self._validators = None
+        self._content = None
+
+    def __call__(self):
+        res = self.client.request("GET", self.path, queryParams=self.queryParams, headers=self._validators)
+        if res.status == 304 and self._validators:
+            self.not_modified += 1
+            return self._content
+        if res.status // 100 != 2:
+            raise ResponseError(res.status, res.content)
+        headers = res.headers or {}
+        validators = {}
+        if headers.get("etag"):
+            validators["If-None-Match"] = headers["etag"]
+        if headers.get("last-modified"):
+            validators["If-Modified-Since"] = headers["last-modified"]
+        self._validators = validators or None
+        self._content = res.content
+        return self._content
@@ -0,0 +1,167 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Token bucket shared by the threads of one process: `rate` requests per
+    second on average, with bursts of up to `burst` back-to-back requests.
+
+    reserve() takes a token right away and returns how long the caller has to
+    wait before using it; acquire() does the waiting.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = None
+
+    def reserve(self, tokens=1):
+        with self._lock:
+            return self._reserve(tokens)
+
+    def acquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def _reserve(self, tokens):
+        now = self.clock()
+        available, updated = self._load(now)
+        available = min(self.burst, available + max(0.0, now - updated) * self.rate) - tokens
+        self._store(available, now)
+        # A negative balance is a debt: it is paid off at `rate` tokens per second.
+        return -available / self.rate if available < 0 else 0.0
+
+    def _load(self, now):
+        if self._updated is None:
+            return self.burst, now
+        return self._tokens, self._updated
+
+    def _store(self, tokens, now):
+        self._tokens = tokens
+        self._updated = now
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in a small file guarded by an exclusive
+    flock(), so every process pointing at the same path shares one budget.
+    POSIX only; SqliteTokenBucket works everywhere.
+    """
+
+    def __init__(self, path, rate, burst=None, clock=time.time, sleep=time.sleep):
+        super(FileTokenBucket, self).__init__(rate, burst, clock, sleep)
+        self.path = path
+        self._fd = None
+
+    def reserve(self, tokens=1):
+        import fcntl
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                return self._reserve(tokens)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _load(self, now):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        try:
+            tokens, updated = os.read(self._fd, 64).split()
+            return float(tokens), float(updated)
+        except ValueError:
+            return self.burst, now
+
+    def _store(self, tokens, now):
+        data = b"%r %r\n" % (tokens, now)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, data.ljust(64))
+
+
+class SqliteTokenBucket(TokenBucket):
+    """
+    Token bucket stored in a SQLite database, shared by every process (and
+    every named `key`) using the same file. Updates run in BEGIN IMMEDIATE
+    transactions, so concurrent writers queue on the database lock.
+    """
+
+    def __init__(self, path, rate, burst=None, key="default", clock=time.time, sleep=time.sleep):
+        super(SqliteTokenBucket, self).__init__(rate, burst, clock, sleep)
+        self.path = path
+        self.key = key
+        self._db = None
+
+    def reserve(self, tokens=1):
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                wait = self._reserve(tokens)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return wait
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connect(self):
+        import sqlite3
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS token_buckets "
+                             "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        return self._db
+
+    def _load(self, now):
+        row = self._db.execute("SELECT tokens, updated FROM token_buckets WHERE key = ?", (self.key,)).fetchone()
+        return row if row is not None else (self.burst, now)
+
+    def _store(self, tokens, now):
+        self._db.execute("INSERT OR REPLACE INTO token_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (self.key, tokens, now))
+
+
+def rate_limiter(rate, burst=None, path=None):
+    """
+    In-process bucket when path is None; otherwise a bucket shared through
+    `path`, SQLite for *.db/*.sqlite files and an flock()ed file for the rest.
+    """
+    if path is None:
+        return TokenBucket(rate, burst)
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        return SqliteTokenBucket(path, rate, burst)
+    return FileTokenBucket(path, rate, burst)
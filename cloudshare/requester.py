@@ -11,44 +11,233 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import json
+import http.client
 import logging
+import time
 import urllib.error
 import urllib.parse
 import urllib.request
 
+from .codec import get_codec
+from .events import RequestEvent, RequestListeners, clock
 from .http import Response
+from .json_stream import iter_array
 
 logger = logging.getLogger(__name__)
 
+# Transport failures worth another attempt (refused/reset connections, timeouts...).
+RETRYABLE_ERRORS = (OSError, http.client.HTTPException)
+
+
+class ResponseError(Exception):
+
+    def __init__(self, status, content):
+        super(ResponseError, self).__init__(status, content)
+        self.status = status
+        self.content = content
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    A call ran out of its deadline before getting a response, retries included.
+    """
+
 
 class Requester(object):
 
-    def __init__(self, http, authenticationParameterProvider):
+    def __init__(self, http, authenticationParameterProvider, retryPolicy=None, sleep=time.sleep, codec=None,
+                 clock=time.monotonic, hedger=None):
         self.http = http
         self.authenticationParameterProvider = authenticationParameterProvider
+        self.retryPolicy = retryPolicy
+        self.sleep = sleep
+        self.codec = codec if codec is not None else get_codec()
+        self.clock = clock
+        self.hedger = hedger
+        self.listeners = RequestListeners()
+
+    def cs_request(self, hostname, method, apiId, apiKey, path="", queryParams=None, content=None, idempotent=None,
+                   timeout=None, deadline=None, headers=None):
+        """
+        timeout (seconds) bounds each socket operation of each attempt; deadline
+        (seconds) bounds the whole call, retries and backoff included, and
+        raises DeadlineExceeded when it runs out before any response. headers
+        are sent on top of the signed ones (If-None-Match, say). A GET with
+        idempotent=False is sent as a change: never shared, cached nor hedged.
+        """
+        url = self._build_url(hostname, path, queryParams)
+        json_content = self._encode_content(content)
+        transport = self.http.request
+        if idempotent is False:
+            transport = getattr(self.http, 'request_change', transport)
+        res, retries, event = self._with_retries(method, idempotent, apiId, apiKey, url, json_content,
+                                                 transport, timeout, deadline, headers,
+                                                 getattr(self.http, 'request_alone', None))
+        return self._final_response(res, retries, event)
 
-    def cs_request(self, hostname, method, apiId, apiKey, path="", queryParams=None, content=None):
+    def iter_items(self, hostname, apiId, apiKey, path="", queryParams=None, timeout=None, deadline=None):
         url = self._build_url(hostname, path, queryParams)
-        json_content = json.dumps(content) if content is not None else None
-        headers = self._build_headers(apiId, apiKey, url)
-        res = self.http.request(method, url, headers, json_content)
-        logger.debug(f"request: {method} {url} {headers} {json_content}")
-        return Response(status=res.status, content=self._try_to_parse_json(res.content))
+        res, _, event = self._with_retries('GET', None, apiId, apiKey, url, None, self.http.stream, timeout, deadline)
+        try:
+            with res:
+                if res.status // 100 != 2:
+                    raise ResponseError(res.status, self._try_to_parse_json(res.read()))
+                start = clock()
+                for item in iter_array(res.iter_content()):
+                    yield item
+                if event is not None:
+                    # Parsing runs while the body downloads: "download" covers both.
+                    event.timings['download'] = clock() - start
+        finally:
+            if event is not None:
+                self._record(event, res)
+                self.listeners.emit(event)
+
+    def _with_retries(self, method, idempotent, apiId, apiKey, url, body, transport, timeout=None, deadline=None,
+                      extra_headers=None, hedge_transport=None):
+        """
+        Sends with transport(method, url, headers, body) until the response is
+        final; hedges (see hedging.Hedger) go through hedge_transport if
+        given. Returns (response, retries, event), event being the not yet
+        emitted RequestEvent of the last attempt, or None without listeners.
+        """
+        # Each attempt is signed again: the signature embeds a timestamp and a one-time token.
+        retries = 0
+        expires = self.clock() + deadline if deadline is not None else None
+        while True:
+            headers = self._build_headers(apiId, apiKey, url, extra_headers)
+            event = RequestEvent(method, url, retries) if self.listeners else None
+            kwargs = {}
+            attempt_timeout = self._attempt_timeout(timeout, expires, method, url)
+            if attempt_timeout is not None:
+                kwargs['timeout'] = attempt_timeout
+            if event is not None:
+                event.request_bytes = len(body) if body else 0
+                kwargs['timings'] = event.timings
+            try:
+                if self.hedger is None or idempotent is False:
+                    res = transport(method, url, headers, body, **kwargs)
+                else:
+                    # A hedge is signed on its own: tokens are single use.
+                    res = self.hedger.send(transport, method, url, headers,
+                                           lambda: self._build_headers(apiId, apiKey, url, extra_headers), body,
+                                           hedge_transport=hedge_transport, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                delay = self._retry_after_error(method, idempotent, url, retries, e, event, expires, deadline)
+            else:
+                delay = self._retry_after_response(method, idempotent, url, retries, res, event, expires)
+                if delay is None:
+                    return res, retries, event
+            retries += 1
+            self.sleep(delay)
+
+    def _retry_after_error(self, method, idempotent, url, retries, error, event, expires=None, deadline=None):
+        """
+        Seconds to wait before retrying an attempt that raised error; raises
+        it (or DeadlineExceeded once the deadline is too near) when the call
+        is over. Shared by the sync and asyncio requesters, as is
+        _retry_after_response().
+        """
+        if event is not None:
+            event.error = error
+            self.listeners.emit(event)
+        delay = self._retry_delay(method, idempotent, retries)
+        if expires is not None and self.clock() + (delay or 0) >= expires:
+            raise DeadlineExceeded("%s %s: no response within %.1fs (%s)" % (method, url, deadline, error)) from error
+        if delay is None:
+            raise error
+        logger.info("%s %s failed (%s), retry %d in %.1fs", method, url, error, retries + 1, delay)
+        return delay
+
+    def _retry_after_response(self, method, idempotent, url, retries, res, event, expires=None):
+        """
+        Seconds to wait before retrying an attempt answered with res, or None
+        when res is the caller's.
+        """
+        if event is not None:
+            self._record(event, res)
+        delay = self._retry_delay(method, idempotent, retries, res.status, getattr(res, 'headers', None))
+        if delay is not None and expires is not None and self.clock() + delay >= expires:
+            # No time left for another attempt: the caller gets this response.
+            delay = None
+        if delay is None:
+            return None
+        if hasattr(res, 'close'):
+            res.close()
+        if event is not None:
+            self.listeners.emit(event)
+        logger.info("%s %s returned %s, retry %d in %.1fs", method, url, res.status, retries + 1, delay)
+        return delay
+
+    def _final_response(self, res, retries, event):
+        response = self._build_response(res)
+        if event is not None:
+            # Listeners get a parse time, so the body is decoded now rather than on first use.
+            start = clock()
+            response.content
+            event.timings['parse'] = clock() - start
+            self.listeners.emit(event)
+        response.retries = retries
+        return response
+
+    def _attempt_timeout(self, timeout, expires, method, url):
+        if expires is None:
+            return timeout
+        remaining = expires - self.clock()
+        if remaining <= 0:
+            raise DeadlineExceeded("%s %s: deadline exceeded" % (method, url))
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def _record(self, event, res):
+        event.status = res.status
+        event.wire_bytes = getattr(res, 'wire_bytes', None)
+        event.decoded_bytes = getattr(res, 'decoded_bytes', None)
+
+    def _retry_delay(self, method, idempotent, retries, status=None, headers=None):
+        # None means "do not retry"; status is None when the transport raised.
+        policy = self.retryPolicy
+        if policy is None or not policy.allows(method, idempotent, retries):
+            return None
+        if status is None:
+            return policy.backoff(retries)
+        if not policy.retries_status(status):
+            return None
+        return policy.backoff(retries, headers.get('retry-after') if isinstance(headers, dict) else None)
+
+    def _encode_content(self, content):
+        # Encoded once, straight to bytes: the transport sends them as they are.
+        return self.codec.dumps(content) if content is not None else None
+
+    def _build_response(self, res):
+        # The transport's Response is handed back as is; its body is only
+        # parsed when the caller reads .content.
+        if isinstance(res, Response):
+            res.codec = self.codec
+            return res
+        return Response(status=res.status,
+                        content=res.content,
+                        headers=getattr(res, 'headers', None),
+                        wire_bytes=getattr(res, 'wire_bytes', None),
+                        decoded_bytes=getattr(res, 'decoded_bytes', None),
+                        codec=self.codec)
 
-    def _build_headers(self, apiId, apiKey, url):
+    def _build_headers(self, apiId, apiKey, url, extra=None):
+        # Not logged: the Authorization header is a valid credential until it expires.
         headers = {"Content-Type": "application/json", "Accept": "application/json", "Authorization": "cs_sha1 %s" % self.authenticationParameterProvider.get(apiId=apiId, apiKey=apiKey, url=url)}
-        logger.debug(f"headers: {headers}")
+        if extra:
+            headers.update(extra)
         return headers
 
     def _build_url(self, hostname, path, queryParams):
-        base = "https://%s/api/v3/%s" % (hostname, self._condition_path_string(path))
+        # A hostname with a scheme ("http://127.0.0.1:8080") is taken as is, for local stand-ins.
+        root = hostname if "://" in hostname else "https://" + hostname
+        base = "%s/api/v3/%s" % (root.rstrip("/"), self._condition_path_string(path))
         if queryParams:
             outurl = "%s?%s" % (base, urllib.parse.urlencode(queryParams))
-            logger.debug(f"url: {outurl}")
+            logger.debug("url: %s", outurl)
             return outurl
         else:
-            logger.debug(f"url: {base}")
+            logger.debug("url: %s", base)
             return base
 
     def _condition_path_string(self, path):
@@ -56,6 +245,6 @@ class Requester(object):
 
     def _try_to_parse_json(self, string):
         try:
-            return json.loads(string)
-        except json.JSONDecodeError:
+            return self.codec.loads(string)
+        except (ValueError, TypeError):
             return None
\ No newline at end of file
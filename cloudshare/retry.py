@@ -0,0 +1,72 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import email.utils
+import random
+import time
+
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before repeating a request.
+
+    total: attempts after the first one (0 disables retries).
+    backoff_factor, max_backoff: the n-th retry waits up to
+        min(max_backoff, backoff_factor * 2 ** n) seconds, with full jitter.
+    retry_post: also repeat POST, which is not idempotent. Callers can opt in
+        per request instead with cs_request(..., idempotent=True).
+    Retry-After headers on 429/503 are honoured up to max_retry_after seconds.
+    """
+
+    def __init__(self, total=3, backoff_factor=0.5, max_backoff=30.0, jitter=True,
+                 statuses=RETRY_STATUSES, retry_post=False, max_retry_after=120.0):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.retry_post = retry_post
+        self.max_retry_after = max_retry_after
+
+    def allows(self, method, idempotent, retries):
+        if retries >= self.total:
+            return False
+        if idempotent is not None:
+            return idempotent
+        return method.upper() in IDEMPOTENT_METHODS or self.retry_post
+
+    def retries_status(self, status):
+        return status in self.statuses
+
+    def backoff(self, retries, retry_after=None):
+        delay = self.parse_retry_after(retry_after)
+        if delay is not None:
+            return min(delay, self.max_retry_after)
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** retries))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    @staticmethod
+    def parse_retry_after(value):
+        if not isinstance(value, str) or not value.strip():
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, when.timestamp() - time.time())
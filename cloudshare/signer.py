@@ -0,0 +1,49 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import time
+
+from .token_generator import TokenGenerator
+
+
+class Signer(object):
+    """
+    Drop-in replacement for AuthenticationParameterProvider producing the same
+    "userapiid:...;hmac:..." parameter. The sha1 state after the API key is
+    computed once per key and copied for each request, instead of hashing the
+    whole apiKey+url+timestamp+token string from scratch. Safe to share
+    between threads.
+    """
+
+    def __init__(self, tokenGenerator=None, clock=time.time, max_keys=64):
+        self.tokenGenerator = tokenGenerator if tokenGenerator is not None else TokenGenerator()
+        self.clock = clock
+        self.max_keys = max_keys
+        self._seeded = {}
+
+    def get(self, apiId, apiKey, url):
+        timestamp = int(self.clock())
+        token = self.tokenGenerator.generate()
+        hmac = self._seed(apiKey).copy()
+        hmac.update(("%s%d%s" % (url, timestamp, token)).encode('utf-8'))
+        return "userapiid:%s;timestamp:%d;token:%s;hmac:%s" % (apiId, timestamp, token, hmac.hexdigest())
+
+    def _seed(self, apiKey):
+        seeded = self._seeded.get(apiKey)
+        if seeded is None:
+            if len(self._seeded) >= self.max_keys:
+                self._seeded.clear()
+            # Never updated after this point, only copied, so threads can share it.
+            seeded = self._seeded.setdefault(apiKey, hashlib.sha1(apiKey.encode('utf-8')))
+        return seeded
@@ -0,0 +1,594 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import copy
+import gzip
+import hashlib
+import http.server
+import json
+import logging
+import math
+import os
+import random
+import re
+import ssl
+import threading
+import time
+import urllib.parse
+
+from .events import path_template
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+DEFAULT_COLLECTION = os.path.join(_ROOT, "postman", "CloudShare v3 Production API.postman_collection.json")
+DEFAULT_CLASS_SAMPLE = os.path.join(_ROOT, "getClassDetails.json")
+
+# Bodies at least this long are gzipped when the client accepts it, like the real API.
+GZIP_MIN_BYTES = 1024
+
+
+def fixed(seconds):
+    return lambda rng: seconds
+
+
+def uniform(low, high):
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median, sigma):
+    """
+    Right-skewed latency: half the requests under median, a long tail above.
+    """
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def pareto(minimum, alpha, cap=None):
+    """
+    Heavy tail: the smaller alpha, the slower the slowest requests. cap bounds it.
+    """
+    def sample(rng):
+        seconds = minimum * rng.paretovariate(alpha)
+        return min(seconds, cap) if cap is not None else seconds
+    return sample
+
+
+class StandInState(object):
+    """
+    In-memory CloudShare account served by StandIn: projects, blueprints,
+    policies, regions, templates, environments with their VMs, and classes.
+    scale multiplies the number of records seeded; padding adds that many
+    bytes to every record, to grow payloads without adding records. Routes
+    listed in the postman collection that are not modelled answer 200 with an
+    empty object (GET on a list route: an empty list).
+    """
+
+    def __init__(self, scale=1, padding=0, seed=None, transition_time=0.0,
+                 collection=DEFAULT_COLLECTION, class_sample=DEFAULT_CLASS_SAMPLE, clock=time.monotonic):
+        self.rng = random.Random(seed)
+        self.padding = "x" * padding
+        self.transition_time = transition_time
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.known_routes = _load_routes(collection)
+        self._class_sample = _load_json(class_sample) or {}
+        self._seed(max(1, int(scale)))
+
+    def handle(self, method, path, query, body):
+        """
+        Returns (status, payload) for a request; path is relative to /api/v3/.
+        """
+        path = path.strip("/")
+        with self.lock:
+            for route_method, pattern, action in _ROUTES:
+                if route_method != method:
+                    continue
+                match = pattern.match(path)
+                if match:
+                    return action(self, query, body, *match.groups())
+            if _route_key(method, path) in self.known_routes:
+                return 200, [] if method == "GET" and not any(_looks_like_id(s) for s in path.split("/")) else {}
+        return 404, {"message": "No HTTP resource was found that matches the request URI '%s'." % path}
+
+    # Seeding
+
+    def _seed(self, scale):
+        self.regions = [self._record("RE", name=name) for name in ("Miami", "Amsterdam", "Singapore")]
+        self.timezones = [{"id": "UTC", "name": "(UTC) Coordinated Universal Time"}]
+        self.templates = [self._record("VM", name="Template %d" % i, os="Linux", numCpus=2, memorySizeMBs=4096)
+                          for i in range(5 * scale)]
+        self.projects = [self._record("PR", name="Project %d" % i) for i in range(2)]
+        self.blueprints = {}
+        self.policies = {}
+        for project in self.projects:
+            self.blueprints[project["id"]] = [self._record("BP", name="Blueprint %d" % i, projectId=project["id"])
+                                              for i in range(5 * scale)]
+            self.policies[project["id"]] = [self._record("PO", name="Policy %d" % i, projectId=project["id"])
+                                            for i in range(2)]
+        self.envs = {}
+        for i in range(20 * scale):
+            project = self.projects[i % len(self.projects)]
+            self._new_env({"name": "Environment %d" % i,
+                           "projectId": project["id"],
+                           "blueprintId": self.blueprints[project["id"]][i % len(self.blueprints[project["id"]])]["id"],
+                           "policyId": self.policies[project["id"]][0]["id"]})
+        self.classes = {}
+        for i in range(5 * scale):
+            self._new_class({"name": "Class %d" % i, "projectId": self.projects[0]["id"],
+                             "blueprintId": self.blueprints[self.projects[0]["id"]][0]["id"]})
+        self.students = dict((cls, []) for cls in self.classes)
+        self.executions = {}
+
+    def _next_id(self, prefix):
+        return "%s%s" % (prefix, "".join(self.rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(8)))
+
+    def _record(self, prefix, **fields):
+        record = {"id": self._next_id(prefix)}
+        record.update(fields)
+        if self.padding:
+            record["padding"] = self.padding
+        return record
+
+    def _new_env(self, fields):
+        env = self._record("EN", description="", ownerEmail="owner@example.com", regionId=self.regions[0]["id"],
+                           creationTime=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        env.update(dict((k, v) for k, v in fields.items() if k in ("name", "description", "projectId",
+                                                                    "blueprintId", "policyId")))
+        env.setdefault("name", env["id"])
+        env["vms"] = [self._record("MC", name="vm%d" % (i + 1), fqdn="vm%d.example.com" % (i + 1),
+                                   internalIp="10.0.0.%d" % (i + 1)) for i in range(3)]
+        self.envs[env["id"]] = env
+        self._transition(env, "Ready", "Running", "Preparing", "Starting")
+        return env
+
+    def _new_class(self, fields):
+        cls = copy.deepcopy(self._class_sample)
+        cls.update(fields)
+        cls.update(self._record("CL"))
+        cls["status"] = "active"
+        self.classes[cls["id"]] = cls
+        return cls
+
+    def _transition(self, env, status, vm_status, pending=None, vm_pending=None):
+        # With transition_time, the env shows the pending status until it elapses.
+        env["_status"] = (status, vm_status, pending or status, vm_pending or vm_status,
+                          self.clock() + self.transition_time)
+
+    def _env_view(self, env, extended):
+        status, vm_status, pending, vm_pending, until = env["_status"]
+        done = self.clock() >= until
+        view = dict((k, v) for k, v in env.items() if not k.startswith("_") and (extended or k != "vms"))
+        view["statusText"] = status if done else pending
+        if extended:
+            view["vms"] = []
+            for vm in env["vms"]:
+                vm = dict(vm, statusText=vm_status if done else vm_pending)
+                if status == "Deleted" and done:
+                    vm["internalIp"] = None
+                view["vms"].append(vm)
+        return view
+
+    # Actions
+
+    def _get(self, collection, key, kind):
+        item = collection.get(key)
+        if item is None:
+            raise _NotFound("%s %s not found" % (kind, key))
+        return item
+
+    def _list_envs(self, query, body):
+        envs = [self._env_view(e, False) for e in self.envs.values()]
+        if query.get("brief", "true").lower() != "false":
+            # The brief listing leaves statusText to getextended.
+            for env in envs:
+                del env["statusText"]
+        return 200, envs
+
+    def _get_env(self, query, body, env_id):
+        return 200, self._env_view(self._get(self.envs, env_id, "Environment"), False)
+
+    def _get_extended(self, query, body):
+        return 200, self._env_view(self._get(self.envs, query.get("envId"), "Environment"), True)
+
+    def _env_resources(self, query, body):
+        env = self._get(self.envs, query.get("envId"), "Environment")
+        return 200, [{"vmId": vm["id"], "name": vm["name"], "cpu": 2, "memoryMb": 4096} for vm in env["vms"]]
+
+    def _create_env(self, query, body):
+        fields = dict(query)
+        if isinstance(body, dict):
+            fields.update(body.get("environment", body))
+        env = self._new_env(fields)
+        return 200, {"environmentId": env["id"], "resources": [{"id": vm["id"]} for vm in env["vms"]]}
+
+    def _env_action(self, query, body, action):
+        env = self._get(self.envs, query.get("envId"), "Environment")
+        action = action.lower()
+        if action == "suspend":
+            self._transition(env, "Suspended", "Suspended", "Suspending", "Suspending")
+        elif action in ("resume", "revert"):
+            self._transition(env, "Ready", "Running", "Resuming", "Starting")
+        return 204, None
+
+    def _delete_env(self, query, body, env_id):
+        env = self._get(self.envs, env_id, "Environment")
+        self._transition(env, "Deleted", "Deleted", "Deleting", "Deleting")
+        return 204, None
+
+    def _vm_action(self, query, body, action):
+        vm_id = query.get("vmId") or (body or {}).get("vmId")
+        action = action.lower()
+        for env in self.envs.values():
+            for vm in env["vms"]:
+                if vm["id"] == vm_id:
+                    if action == "executepath":
+                        execution = self._next_id("EX")
+                        self.executions[execution] = vm_id
+                        return 200, {"executionId": execution}
+                    if action == "checkexecutionstatus":
+                        return 200, {"success": True, "exitCode": 0, "standardOutput": "", "standardError": ""}
+                    return 204, None
+        raise _NotFound("VM %s not found" % vm_id)
+
+    def _delete_vm(self, query, body, vm_id):
+        for env in self.envs.values():
+            env["vms"] = [vm for vm in env["vms"] if vm["id"] != vm_id]
+        return 204, None
+
+    def _list_classes(self, query, body):
+        return 200, [dict((k, c.get(k)) for k in ("id", "name", "projectId", "blueprintId", "status"))
+                     for c in self.classes.values()]
+
+    def _get_class(self, query, body, class_id=None):
+        return 200, self._get(self.classes, class_id or query.get("classId"), "Class")
+
+    def _create_class(self, query, body):
+        cls = self._new_class(dict((k, v) for k, v in (body or {}).items() if k != "id"))
+        self.students[cls["id"]] = []
+        return 200, {"id": cls["id"]}
+
+    def _update_class(self, query, body, class_id):
+        cls = self._get(self.classes, class_id, "Class")
+        cls.update(dict((k, v) for k, v in (body or {}).items() if k != "id"))
+        return 204, None
+
+    def _delete_class(self, query, body, class_id):
+        self._get(self.classes, class_id, "Class")
+        del self.classes[class_id]
+        self.students.pop(class_id, None)
+        return 204, None
+
+    def _list_students(self, query, body, class_id):
+        self._get(self.classes, class_id, "Class")
+        return 200, self.students.get(class_id, [])
+
+    def _add_student(self, query, body, class_id):
+        self._get(self.classes, class_id, "Class")
+        student = self._record("ST", **dict((k, v) for k, v in (body or {}).items() if k != "id"))
+        self.students.setdefault(class_id, []).append(student)
+        return 200, {"id": student["id"]}
+
+    def _projects(self, query, body, project_id=None):
+        if project_id is None:
+            return 200, self.projects
+        for project in self.projects:
+            if project["id"] == project_id:
+                return 200, project
+        raise _NotFound("Project %s not found" % project_id)
+
+    def _blueprints(self, query, body, project_id=None, blueprint_id=None):
+        if project_id is None:
+            return 200, [b for bs in self.blueprints.values() for b in bs]
+        blueprints = self._get(self.blueprints, project_id, "Project")
+        if blueprint_id is None:
+            return 200, blueprints
+        for blueprint in blueprints:
+            if blueprint["id"] == blueprint_id:
+                return 200, dict(blueprint, createFromVersions=[{"id": self._next_id("SN"), "name": "Latest"}])
+        raise _NotFound("Blueprint %s not found" % blueprint_id)
+
+    def _policies(self, query, body, project_id=None):
+        if project_id is None:
+            return 200, [p for ps in self.policies.values() for p in ps]
+        return 200, self._get(self.policies, project_id, "Project")
+
+
+class _NotFound(Exception):
+    pass
+
+
+_ID = r"([^/]+)"
+_ROUTES = [(method, re.compile("^" + pattern + "$", re.IGNORECASE), action) for method, pattern, action in (
+    ("GET", "ping", lambda self, q, b: (200, {"result": "Pong"})),
+    ("GET", "regions", lambda self, q, b: (200, self.regions)),
+    ("GET", "timezones", lambda self, q, b: (200, self.timezones)),
+    ("GET", "templates", lambda self, q, b: (200, self.templates)),
+    ("GET", "projects", StandInState._projects),
+    ("GET", "projects/" + _ID, StandInState._projects),
+    ("GET", "blueprints", StandInState._blueprints),
+    ("GET", "projects/" + _ID + "/blueprints", StandInState._blueprints),
+    ("GET", "projects/" + _ID + "/blueprints/" + _ID, StandInState._blueprints),
+    ("GET", "policies", StandInState._policies),
+    ("GET", "projects/" + _ID + "/policies", StandInState._policies),
+    ("GET", "envs", StandInState._list_envs),
+    ("POST", "envs", StandInState._create_env),
+    ("GET", "envs/actions/create", StandInState._create_env),
+    ("POST", "envs/actions/create", StandInState._create_env),
+    ("GET", "envs/actions/getextended", StandInState._get_extended),
+    ("GET", "envs/actions/getenvresources", StandInState._env_resources),
+    ("PUT", "envs/actions/(suspend|resume|revert|extend|postponeinactivity)", StandInState._env_action),
+    ("GET", "envs/" + _ID, StandInState._get_env),
+    ("DELETE", "envs/" + _ID, StandInState._delete_env),
+    ("PUT", "vms/actions/(reboot|revert|editvmhardware)", StandInState._vm_action),
+    ("POST", "vms/actions/(executepath)", StandInState._vm_action),
+    ("GET", "vms/actions/(checkexecutionstatus)", StandInState._vm_action),
+    ("DELETE", "vms/" + _ID, StandInState._delete_vm),
+    ("GET", "class", StandInState._list_classes),
+    ("POST", "class", StandInState._create_class),
+    ("GET", "class/actions/getdetailed", StandInState._get_class),
+    ("GET", "class/" + _ID + "/students", StandInState._list_students),
+    ("POST", "class/" + _ID + "/students", StandInState._add_student),
+    ("GET", "class/" + _ID, StandInState._get_class),
+    ("PUT", "class/" + _ID, StandInState._update_class),
+    ("DELETE", "class/" + _ID, StandInState._delete_class),
+)]
+
+
+class StandIn(object):
+    """
+    Local stand-in for the CloudShare v3 API, for load tests and offline
+    regression tests. Serves a StandInState over HTTP (HTTPS with certfile
+    and keyfile) on a background thread; point a client at it with
+    Client(standin.url, "any id", "any key").
+
+    latency: seconds, or a distribution such as lognormal(0.08, 0.5) (see the
+    functions above), or a dict mapping endpoint templates ("envs",
+    "envs/actions/getextended?envId", see events.path_template) to either,
+    with "*" as the fallback. throttle_rate and error_rate are the fractions of
+    requests answered 429 (with Retry-After: retry_after) and one of
+    error_statuses; drop_rate closes the connection without answering.
+    With etags=True, GET responses carry an ETag and If-None-Match gets a
+    bodiless 304 while the resource is unchanged.
+    fail_next() queues deterministic failures for tests.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, throttle_rate=0.0, error_rate=0.0,
+                 error_statuses=(500, 502, 503), retry_after=1, drop_rate=0.0, seed=None,
+                 certfile=None, keyfile=None, state=None, sleep=time.sleep, etags=False, **state_options):
+        self.state = state if state is not None else StandInState(seed=seed, **state_options)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.retry_after = retry_after
+        self.drop_rate = drop_rate
+        self.sleep = sleep
+        self.etags = etags
+        self.requests = 0
+        self.injected = 0
+        self.rng = random.Random(seed)
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self.scheme = "http"
+        if certfile is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+            self.scheme = "https"
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "%s://%s:%d" % (self.scheme, host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,),
+                                        name="cloudshare-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail_next(self, status, count=1, path=None):
+        """
+        Answers the next count requests (to the endpoint template path only,
+        if given) with status; status None drops the connection instead.
+        """
+        with self._lock:
+            self._failures.extend([(status, path)] * count)
+
+    def _delay(self, template):
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(template, latency.get("*", 0.0))
+        if callable(latency):
+            with self._lock:
+                latency = latency(self.rng)
+        if latency > 0:
+            self.sleep(latency)
+
+    def _fault(self, template):
+        # Returns a status to answer with, None to answer normally, or False to drop the connection.
+        with self._lock:
+            self.requests += 1
+            for i, (status, path) in enumerate(self._failures):
+                if path is None or path == template:
+                    del self._failures[i]
+                    self.injected += 1
+                    return status if status is not None else False
+            roll = self.rng.random()
+            if roll < self.drop_rate:
+                self.injected += 1
+                return False
+            roll -= self.drop_rate
+            if roll < self.throttle_rate:
+                self.injected += 1
+                return 429
+            roll -= self.throttle_rate
+            if roll < self.error_rate:
+                self.injected += 1
+                return self.rng.choice(self.error_statuses)
+        return None
+
+
+def _handler(standin):
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self._serve()
+
+        do_POST = do_PUT = do_DELETE = do_OPTIONS = do_GET
+
+        def log_message(self, format, *args):
+            logger.debug("%s %s", self.address_string(), format % args)
+
+        def _serve(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            parts = urllib.parse.urlsplit(self.path)
+            template = path_template(self.path)
+            standin._delay(template)
+            fault = standin._fault(template)
+            if fault is False:
+                self.close_connection = True
+                return
+            if fault is not None:
+                headers = {"Retry-After": str(standin.retry_after)} if fault == 429 else {}
+                return self._reply(fault, {"message": "Injected failure"}, headers)
+            if not self.headers.get("Authorization", "").startswith("cs_sha1 userapiid:"):
+                return self._reply(401, {"message": "Authorization has been denied for this request."})
+            if not parts.path.startswith("/api/v3/"):
+                return self._reply(404, {"message": "Not found"})
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                return self._reply(400, {"message": "The request is invalid."})
+            query = dict(urllib.parse.parse_qsl(parts.query))
+            try:
+                status, payload = standin.state.handle(self.command, parts.path[len("/api/v3/"):], query, body)
+            except _NotFound as e:
+                status, payload = 404, {"message": str(e)}
+            self._reply(status, payload, etag=standin.etags and self.command == "GET")
+
+        def _reply(self, status, payload, headers=None, etag=False):
+            data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+            if etag and status == 200:
+                tag = '"%s"' % hashlib.sha1(data).hexdigest()[:20]
+                headers = dict(headers or {}, ETag=tag)
+                if self.headers.get("If-None-Match") == tag:
+                    status, data = 304, b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            if len(data) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+                data = gzip.compress(data, 5)
+                self.send_header("Content-Encoding", "gzip")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            try:
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up first (timeout, hedged request...).
+                self.close_connection = True
+
+    return Handler
+
+
+def _load_json(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_routes(collection):
+    # (METHOD, path with ids replaced) of every request in the postman collection.
+    routes = set()
+    stack = list((_load_json(collection) or {}).get("item", []))
+    while stack:
+        item = stack.pop()
+        if "item" in item:
+            stack.extend(item["item"])
+            continue
+        url = item["request"]["url"]
+        raw = url if isinstance(url, str) else url.get("raw", "")
+        if not raw.startswith("{{BaseURL}}/"):
+            continue
+        path = raw[len("{{BaseURL}}/"):].split("?")[0]
+        routes.add(_route_key(item["request"]["method"], path))
+    return routes
+
+
+def _route_key(method, path):
+    return method, "/".join("{}" if _looks_like_id(s) else s.lower() for s in path.strip("/").split("/"))
+
+
+def _looks_like_id(segment):
+    return segment.startswith("{{") or path_template("/" + segment) == "{id}"
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m cloudshare.standin",
+                                     description="Serve a local stand-in of the CloudShare v3 API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="median server latency")
+    parser.add_argument("--sigma", type=float, default=0.0, help="lognormal spread of the latency (0: fixed)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 5xx")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of connections dropped")
+    parser.add_argument("--scale", type=int, default=1, help="multiplies the number of seeded records")
+    parser.add_argument("--padding", type=int, default=0, help="extra bytes per record")
+    parser.add_argument("--transition-time", type=float, default=0.0, help="seconds an env spends suspending/resuming")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--etags", action="store_true", help="answer unchanged GETs with 304 to If-None-Match")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args(argv)
+    latency = args.latency_ms / 1000.0
+    if args.sigma and latency:
+        latency = lognormal(latency, args.sigma)
+    standin = StandIn(args.host, args.port, latency=latency, throttle_rate=args.throttle_rate,
+                      error_rate=args.error_rate, drop_rate=args.drop_rate, seed=args.seed,
+                      certfile=args.certfile, keyfile=args.keyfile, scale=args.scale, padding=args.padding,
+                      transition_time=args.transition_time, etags=args.etags)
+    print("Serving the CloudShare API stand-in on %s" % standin.url)
+    try:
+        standin._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import asyncio
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .. import AsyncClient, DeadlineExceeded
+from ..async_http import AsyncConnectionPool, AsyncHttp
+from ..async_wrapper_cls import AsyncWrapper
+from ..http import Response
+from ..retry import RetryPolicy
+from ..standin import StandIn
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.ports.add(self.client_address[1])
+        if self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for part in (b'[{"id": ', b'"EN1"}]'):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        body = b'{"path": "%s"}' % self.path.encode()
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        length = int(self.headers["Content-Length"])
+        body = self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _SlowHttp(object):
+
+    def __init__(self):
+        self.pool = AsyncConnectionPool()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def request(self, method, url, headers, content, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return Response(status=200, content=b'{"url": "%s"}' % url.encode())
+
+
+class _FlakyHttp(object):
+
+    def __init__(self, statuses):
+        self.pool = AsyncConnectionPool()
+        self.statuses = list(statuses)
+        self.headers = []
+
+    async def request(self, method, url, headers, content, **kwargs):
+        self.headers.append(headers)
+        return Response(status=self.statuses.pop(0), content=b"{}")
+
+
+class TestAsyncHttp(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.ports = set()
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_reuse_a_keep_alive_connection(self):
+        async def run():
+            http = AsyncHttp()
+            results = [await http.request("GET", self.url + "/envs", {}, None) for _ in range(5)]
+            http.pool.close()
+            return http, results
+
+        http, results = asyncio.run(run())
+
+        self.assertEqual(b'{"path": "/envs"}', results[-1].content)
+        self.assertEqual(1, http.pool.created)
+        self.assertEqual(1, len(self.server.ports))
+
+    def test_chunked_bodies_are_reassembled(self):
+        res = asyncio.run(AsyncHttp().request("GET", self.url + "/chunked", {}, None))
+
+        self.assertEqual(b'[{"id": "EN1"}]', res.content)
+
+    def test_error_statuses_are_returned_not_raised(self):
+        res = asyncio.run(AsyncHttp().request("GET", self.url + "/missing", {}, None))
+
+        self.assertEqual(404, res.status)
+
+    def test_request_body_is_sent_with_its_length(self):
+        res = asyncio.run(AsyncHttp().request("PUT", self.url + "/class/1", {}, '{"name": "x"}'))
+
+        self.assertEqual(b'{"name": "x"}', res.content)
+
+
+class TestAsyncClient(unittest.TestCase):
+
+    def test_concurrency_is_limited_per_client(self):
+        http = _SlowHttp()
+
+        async def run():
+            client = AsyncClient("some.hostname.com", "API_ID", "API_KEY", max_concurrency=4, http=http)
+            return await asyncio.gather(*[client.get("envs/EN%d" % i) for i in range(40)])
+
+        results = asyncio.run(run())
+
+        self.assertEqual(40, len(results))
+        self.assertEqual(4, http.max_in_flight)
+        self.assertEqual({"url": "https://some.hostname.com/api/v3/envs/EN7"}, results[7].content)
+
+    def test_retries_follow_the_same_policy_as_the_sync_client(self):
+        http = _FlakyHttp([503, 429, 200])
+
+        async def run():
+            client = AsyncClient("some.hostname.com", "API_ID", "API_KEY", http=http,
+                                 retry_policy=RetryPolicy(backoff_factor=0))
+            return await client.request("GET", "envs", headers={"If-None-Match": '"v1"'})
+
+        res = asyncio.run(run())
+
+        self.assertEqual((200, 2), (res.status, res.retries))
+        self.assertEqual(['"v1"'] * 3, [h["If-None-Match"] for h in http.headers])
+        self.assertEqual(3, len(set(h["Authorization"] for h in http.headers)))
+
+    def test_one_client_serves_several_event_loops(self):
+        with StandIn() as standin:
+            client = AsyncClient(standin.url, "API_ID", "API_KEY", max_concurrency=2)
+
+            async def run():
+                return await asyncio.gather(*[client.get("envs") for _ in range(4)])
+
+            for _ in range(2):
+                self.assertEqual([200] * 4, [res.status for res in asyncio.run(run())])
+            # The connections of the first loop are not reused by the second.
+            self.assertEqual(4, client.pool.created)
+
+    def test_a_stalled_server_times_out_instead_of_hanging(self):
+        async def run():
+            client = AsyncClient(standin.url, "API_ID", "API_KEY", timeout=0.05, retry_policy=RetryPolicy(total=0))
+            return await client.get("envs")
+
+        with StandIn(latency=0.5) as standin:
+            self.assertRaises(asyncio.TimeoutError, asyncio.run, run())
+
+    def test_the_deadline_bounds_retries_of_a_stalled_server(self):
+        async def run():
+            client = AsyncClient(standin.url, "API_ID", "API_KEY", timeout=0.05, deadline=0.2,
+                                 retry_policy=RetryPolicy(total=100, backoff_factor=0))
+            return await client.get("envs")
+
+        with StandIn(latency=0.5) as standin:
+            start = time.monotonic()
+            self.assertRaises(DeadlineExceeded, asyncio.run, run())
+            self.assertLess(time.monotonic() - start, 0.45)
+
+    def test_async_wrapper_operations_return_the_parsed_content(self):
+        async def run():
+            client = AsyncClient("some.hostname.com", "API_ID", "API_KEY", http=_SlowHttp())
+            return await AsyncWrapper(None, None, None, client=client).env_get_short("1")
+
+        self.assertEqual({"url": "https://some.hostname.com/api/v3/envs/EN1"}, asyncio.run(run()))
@@ -0,0 +1,98 @@
+import concurrent.futures
+import threading
+import time
+import unittest
+from mock import Mock
+
+from ..batch import run_batch
+from ..client import Client
+from ..http import Response
+
+
+class TestRunBatch(unittest.TestCase):
+
+    def test_results_follow_the_input_order(self):
+        def send(delay, value):
+            time.sleep(delay)
+            return Response(200, value)
+
+        specs = [{"delay": 0.1 - i * 0.05, "value": i} for i in range(3)]
+
+        self.assertEqual([0, 1, 2], [r.content for r in run_batch(send, specs, max_workers=3)])
+        self.assertEqual([2, 1, 0], [r.content for r in run_batch(send, specs, max_workers=3, ordered=False)])
+
+    def test_a_given_executor_is_used_and_left_running(self):
+        with concurrent.futures.ThreadPoolExecutor(2, thread_name_prefix="caller") as executor:
+            def send(value):
+                return Response(200, (value, threading.current_thread().name.startswith("caller")))
+
+            for _ in range(2):
+                results = list(run_batch(send, [{"value": i} for i in range(4)], max_workers=2, executor=executor))
+
+                self.assertEqual([(i, True) for i in range(4)], [r.content for r in results])
+
+    def test_failures_are_reported_not_raised(self):
+        def send(n):
+            if n == 1:
+                raise ConnectionResetError()
+            return Response(500 if n == 2 else 200, None)
+
+        results = list(run_batch(send, [{"n": n} for n in range(3)]))
+
+        self.assertEqual([True, False, False], [r.ok for r in results])
+        self.assertIsInstance(results[1].error, ConnectionResetError)
+        self.assertEqual(500, results[2].status)
+        self.assertEqual([0, 1, 2], [r.index for r in results])
+
+    def test_concurrency_is_bounded_by_max_workers(self):
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def send():
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.01)
+            with lock:
+                state["running"] -= 1
+            return Response(200, None)
+
+        list(run_batch(send, [{}] * 12, max_workers=3))
+
+        self.assertEqual(3, state["peak"])
+
+    def test_rate_caps_requests_per_second(self):
+        started = time.monotonic()
+
+        list(run_batch(lambda: Response(200, None), [{}] * 5, max_workers=5, rate=40, burst=1))
+
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 40.0 * 0.9)
+
+    def test_specs_are_read_lazily_and_closing_early_cancels_the_rest(self):
+        send = Mock(return_value=Response(200, None))
+
+        def specs():
+            for i in range(1000):
+                yield {}
+
+        results = run_batch(send, specs(), max_workers=2)
+        next(results)
+        results.close()
+
+        self.assertLessEqual(send.call_count, 2 * 4)
+
+
+class TestClientRequestMany(unittest.TestCase):
+
+    def test_requests_go_through_the_client(self):
+        http = Mock()
+        http.request = Mock(side_effect=lambda *a, **kw: Response(200, b'{"id": "CL1234567"}'))
+        client = Client("use.cloudshare.com", "API_ID", "API_KEY", http=http)
+
+        results = list(client.request_many([{"method": "POST", "path": "class", "content": {"name": "c%d" % i}}
+                                            for i in range(4)], max_workers=2))
+
+        self.assertEqual([{"id": "CL1234567"}] * 4, [r.content for r in results])
+        self.assertEqual(4, http.request.call_count)
+        self.assertEqual(set(('{"name":"c%d"}' % i).encode() for i in range(4)),
+                         set(c[0][3] for c in http.request.call_args_list))
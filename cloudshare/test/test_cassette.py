@@ -0,0 +1,96 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from mock import Mock
+
+from ..cassette import CassetteMiss, RecordingHttp, ReplayHttp
+from ..client import Client
+from ..http import Response
+from ..standin import StandIn
+
+BASE = "https://use.cloudshare.com/api/v3/"
+
+
+class TestCassette(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "session.jsonl")
+
+    def _record(self, responses):
+        http = Mock()
+        http.request = Mock(side_effect=responses)
+        recorder = RecordingHttp(http, self.path)
+        return recorder
+
+    def test_recorded_requests_have_their_credentials_redacted(self):
+        recorder = self._record([Response(200, b'[]')])
+
+        recorder.request("GET", BASE + "envs", {"Authorization": "cs_sha1 userapiid:ID;hmac:H"}, None)
+        recorder.close()
+
+        with open(self.path) as f:
+            entry = json.loads(f.readline())
+        self.assertEqual("<redacted>", entry["request"]["headers"]["Authorization"])
+        self.assertNotIn("hmac:H", open(self.path).read())
+
+    def test_replay_matches_query_and_body_in_any_order(self):
+        recorder = self._record([Response(200, b'{"id": "EN1"}'), Response(200, b'{"id": "CL1"}')])
+        recorder.request("GET", BASE + "envs/actions/getextended?envId=EN1&x=1", {}, None)
+        recorder.request("POST", BASE + "class", {}, b'{"name":"c","projectId":"PR1"}')
+        recorder.close()
+
+        replay = ReplayHttp(self.path)
+
+        self.assertEqual(b'{"id": "EN1"}',
+                         replay.request("GET", "http://other/api/v3/envs/actions/getextended?x=1&envId=EN1", {}, None).body)
+        self.assertEqual(b'{"id": "CL1"}', replay.request("POST", BASE + "class", {}, b'{"projectId":"PR1","name":"c"}').body)
+        self.assertRaises(CassetteMiss, replay.request, "GET", BASE + "envs", {}, None)
+
+    def test_repeated_requests_replay_in_recorded_order(self):
+        recorder = self._record([Response(200, b'"Suspending"'), Response(200, b'"Suspended"')])
+        for _ in range(2):
+            recorder.request("GET", BASE + "envs/EN1", {}, None)
+        recorder.close()
+
+        replay = ReplayHttp(self.path)
+
+        self.assertEqual([b'"Suspending"', b'"Suspended"', b'"Suspending"'],
+                         [replay.request("GET", BASE + "envs/EN1", {}, None).body for _ in range(3)])
+
+    def test_recorded_latency_can_be_played_back(self):
+        recorder = self._record([Response(200, b'[]')])
+        recorder.clock = Mock(side_effect=[1.0, 1.5])
+        recorder.request("GET", BASE + "envs", {}, None)
+        recorder.close()
+        sleep = Mock()
+
+        ReplayHttp(self.path, latency=2.0, sleep=sleep).request("GET", BASE + "envs", {}, None)
+
+        sleep.assert_called_once_with(1.0)
+
+    def test_closing_a_client_closes_its_cassette(self):
+        http = Mock()
+        client = Client("use.cloudshare.com", "API_ID", "API_KEY", record=self.path, circuit_breaker=Mock(), http=http)
+        recorder = client.http.http.http
+
+        client.close()
+
+        self.assertIsInstance(recorder, RecordingHttp)
+        self.assertTrue(recorder._file.closed)
+        http.close.assert_not_called()
+
+    def test_a_client_session_replays_without_the_server(self):
+        with StandIn(seed=1) as standin:
+            client = Client(standin.url, "API_ID", "API_KEY", record=self.path)
+            self.addCleanup(client.close)
+            envs = list(client.iter_items("envs"))
+            extended = client.get("envs/actions/getextended", {"envId": envs[0]["id"]}).content
+
+        client = Client("use.cloudshare.com", "API_ID", "API_KEY", replay=self.path)
+
+        self.assertEqual(envs, list(client.iter_items("envs")))
+        self.assertEqual(extended, client.get("envs/actions/getextended", {"envId": envs[0]["id"]}).content)
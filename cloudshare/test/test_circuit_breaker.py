@@ -0,0 +1,107 @@
+import unittest
+from mock import Mock
+
+from ..circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakingHttp, CircuitOpenError
+from ..client import Client
+from ..http import Response
+from ..retry import RetryPolicy
+
+BASE = "https://use.cloudshare.com/api/v3/"
+EXTENDED = "envs/actions/getextended?envId"
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window=10, open_for=30, clock=self.clock)
+
+    def _calls(self, *outcomes):
+        for failed in outcomes:
+            self.breaker.record(EXTENDED, failed, self.breaker.before(EXTENDED))
+
+    def test_opens_at_the_error_rate_once_there_are_enough_calls(self):
+        self._calls(True, True, True)
+        self.assertEqual(CLOSED, self.breaker.state(EXTENDED))
+
+        self._calls(False)
+        self.assertEqual(OPEN, self.breaker.state(EXTENDED))
+        with self.assertRaises(CircuitOpenError) as e:
+            self.breaker.before(EXTENDED)
+        self.assertEqual(30, e.exception.retry_in)
+
+    def test_the_error_rate_is_taken_over_the_last_window_calls(self):
+        self._calls(*([False] * 6 + [True] * 4))
+
+        self.assertEqual({"state": CLOSED, "calls": 10, "failures": 4, "opened": 0, "rejected": 0},
+                         self.breaker.states()[EXTENDED])
+
+        self._calls(True)
+        self.assertEqual(OPEN, self.breaker.state(EXTENDED))
+
+    def test_a_probe_is_let_through_after_open_for_and_closes_the_circuit(self):
+        self._calls(True, True, True, True)
+        self.clock.now += 30
+
+        probe = self.breaker.before(EXTENDED)
+        self.assertTrue(probe)
+        self.assertEqual(HALF_OPEN, self.breaker.state(EXTENDED))
+        self.assertRaises(CircuitOpenError, self.breaker.before, EXTENDED)
+        self.breaker.record(EXTENDED, False, probe)
+
+        self.assertEqual(CLOSED, self.breaker.state(EXTENDED))
+        self.assertFalse(self.breaker.before(EXTENDED))
+
+    def test_a_failed_probe_reopens_the_circuit(self):
+        self._calls(True, True, True, True)
+        self.clock.now += 30
+
+        self._calls(True)
+
+        self.assertEqual(OPEN, self.breaker.state(EXTENDED))
+        self.assertEqual(2, self.breaker.states()[EXTENDED]["opened"])
+
+    def test_endpoints_have_their_own_circuits(self):
+        self._calls(True, True, True, True)
+
+        self.assertFalse(self.breaker.before("envs"))
+
+
+class TestCircuitBreakingHttp(unittest.TestCase):
+
+    def test_errors_5xx_and_slow_calls_count_as_failures(self):
+        http = Mock()
+        http.request = Mock(side_effect=[ConnectionResetError(), Response(503, b""), Response(200, b""),
+                                         Response(404, b"")])
+        times = iter([0, 0, 0, 0, 5, 0, 0])
+        breaker = CircuitBreaker(min_calls=100, slow_call=1)
+        guarded = CircuitBreakingHttp(http, breaker, clock=lambda: next(times))
+
+        self.assertRaises(ConnectionResetError, guarded.request, "GET", BASE + "class", {}, None)
+        for _ in range(3):
+            guarded.request("GET", BASE + "class", {}, None)
+
+        self.assertEqual(3, breaker.states()["class"]["failures"])
+
+    def test_an_open_circuit_fails_fast_without_retries(self):
+        http = Mock()
+        http.request = Mock(return_value=Response(500, b""))
+        breaker = CircuitBreaker(min_calls=2, open_for=60)
+        client = Client("use.cloudshare.com", "API_ID", "API_KEY", http=http, circuit_breaker=breaker,
+                        retry_policy=RetryPolicy(total=3, backoff_factor=0))
+
+        self.assertRaises(CircuitOpenError, client.get, "class")
+
+        self.assertEqual(2, http.request.call_count)
+        self.assertEqual(OPEN, client.metrics()["circuits"]["class"]["state"])
+        self.assertRaises(CircuitOpenError, client.get, "class")
+        self.assertEqual(2, http.request.call_count)
@@ -0,0 +1,339 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+from ..client import Client
+from ..standin import StandIn
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, ROOT)
+
+try:
+    import mxcloudshare
+except ImportError:
+    # The command line needs typer and rich; the SDK does not.
+    mxcloudshare = None
+
+
+@unittest.skipIf(mxcloudshare is None, "mxcloudshare.py dependencies not installed")
+class _CliTest(unittest.TestCase):
+
+    def setUp(self):
+        saved = dict(mxcloudshare.globalconf)
+        self.addCleanup(mxcloudshare.globalconf.update, saved)
+        mxcloudshare.globalconf.update(client=None, console=None, limit=None, page=1, parallel=4,
+                                       outputformat=mxcloudshare.OutFormat.ndjson_fmt)
+
+    def use_standin(self, **kwargs):
+        standin = StandIn(**kwargs).start()
+        self.addCleanup(standin.stop)
+        mxcloudshare.globalconf["client"] = Client(standin.url, "API_ID", "API_KEY")
+        return standin
+
+    def output(self, command, *args, **kwargs):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            command(*args, **kwargs)
+        return out.getvalue()
+
+
+class TestEnvCreate(_CliTest):
+
+    def test_unnamed_environments_are_each_created(self):
+        standin = self.use_standin()
+        blueprint = standin.state.blueprints[standin.state.projects[0]["id"]][0]["id"]
+        before = len(standin.state.envs)
+
+        lines = self.output(mxcloudshare.env_create, blueprint_id=blueprint, count=3).splitlines()
+
+        self.assertEqual(3, len(lines))
+        self.assertEqual(before + 3, len(standin.state.envs))
+
+    def test_failed_creates_are_not_retried(self):
+        standin = self.use_standin()
+        blueprint = standin.state.blueprints[standin.state.projects[0]["id"]][0]["id"]
+        before = len(standin.state.envs)
+        standin.fail_next(503, path="envs/actions/create?blueprintId")
+
+        lines = self.output(mxcloudshare.env_create, blueprint_id=blueprint, count=3).splitlines()
+
+        self.assertEqual(1, sum('"error"' in line for line in lines))
+        self.assertEqual(before + 2, len(standin.state.envs))
+        self.assertEqual(3, standin.requests)
+
+
+class TestWithStatus(_CliTest):
+
+    def setUp(self):
+        super(TestWithStatus, self).setUp()
+        self.standin = self.use_standin()
+        self.cs_many = mock.Mock(wraps=mxcloudshare.cs_many)
+        patcher = mock.patch.object(mxcloudshare, "cs_many", self.cs_many)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def brief_listing(self):
+        # The brief listing has no statusText: every status has to be looked up.
+        return enumerate(mxcloudshare.get_client().iter_items("envs/"), start=1)
+
+    def test_missing_statuses_are_looked_up_parallel_times_four_at_a_time(self):
+        mxcloudshare.globalconf["parallel"] = 2
+
+        envs = list(mxcloudshare.with_status(self.brief_listing()))
+
+        self.assertEqual([8, 8, 4], [len(c[0][0]) for c in self.cs_many.call_args_list])
+        self.assertEqual(list(range(1, 21)), [e["index"] for e in envs])
+        self.assertEqual({"Ready"}, set(e["status"] for e in envs))
+
+    def test_the_listing_status_is_used_when_it_has_one(self):
+        listing = enumerate(mxcloudshare.get_client().iter_items("envs/", {"brief": "false"}), start=1)
+
+        envs = list(mxcloudshare.with_status(listing))
+
+        self.cs_many.assert_not_called()
+        self.assertEqual([e["statusText"] for e in envs], [e["status"] for e in envs])
+
+    def test_a_failed_lookup_reports_its_error_as_the_status(self):
+        env = {"id": "EN0000000000"}
+
+        envs = list(mxcloudshare.with_status([(1, env)]))
+
+        self.assertIn("404", envs[0]["status"])
+
+    def test_a_lookup_without_a_json_object_leaves_the_status_empty(self):
+        self.cs_many.side_effect = lambda specs: [None, {"statusText": "Ready"}]
+        items = [(1, {"id": "EN1"}), (2, {"id": "EN2"})]
+
+        with self.assertLogs(mxcloudshare.logger, "WARNING"):
+            envs = list(mxcloudshare.with_status(items))
+
+        self.assertEqual([None, "Ready"], [e["status"] for e in envs])
+
+    def test_fields_are_the_only_keys_kept_in_their_order(self):
+        envs = list(mxcloudshare.with_status(self.brief_listing(), lookup=False, fields=["name", "index", "nope"]))
+
+        self.assertEqual([["name", "index"]] * 20, [list(e) for e in envs])
+
+    def test_env_show_all_skips_the_lookup_when_status_is_not_shown(self):
+        requests = self.standin.requests
+
+        lines = self.output(mxcloudshare.env_show_all, field=["index", "name"]).splitlines()
+
+        self.cs_many.assert_not_called()
+        self.assertEqual(1, self.standin.requests - requests)
+        self.assertEqual(["index", "name"], list(json.loads(lines[0])))
+
+
+class TestFitWidths(_CliTest):
+
+    def test_widths_that_fit_are_kept(self):
+        self.assertEqual([10, 20], mxcloudshare.fit_widths([10, 20], 33, [2, 2]))
+
+    def test_the_widest_columns_are_shrunk_first(self):
+        self.assertEqual([10, 12, 12], mxcloudshare.fit_widths([10, 30, 12], 40, [2, 2, 2]))
+
+    def test_no_column_is_shrunk_below_its_header(self):
+        self.assertEqual([20, 5, 9], mxcloudshare.fit_widths([30, 5, 9], 40, [4, 5, 9]))
+
+    def test_columns_that_cannot_fit_are_left_out_from_the_last(self):
+        self.assertEqual([13, 14], mxcloudshare.fit_widths([40, 20, 8], 30, [10, 10, 8]))
+
+    def test_the_first_column_is_always_kept(self):
+        self.assertEqual([12], mxcloudshare.fit_widths([12, 5], 4, [12, 5]))
+
+
+class TestStreamTable(_CliTest):
+
+    def table(self, records, width=40, **kwargs):
+        mxcloudshare.globalconf["tablewidth"] = width
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            count = mxcloudshare.stream_table(records, **kwargs)
+        return count, out.getvalue().splitlines()
+
+    def test_records_are_printed_under_their_flattened_columns(self):
+        count, lines = self.table([{"id": "EN1", "owner": {"name": "ann"}}, {"id": "EN2", "owner": {"name": "bo"}}])
+
+        self.assertEqual(2, count)
+        self.assertEqual(["id", "owner.name"], lines[0].split())
+        self.assertEqual([["EN1", "ann"], ["EN2", "bo"]], [line.split() for line in lines[2:]])
+
+    def test_columns_are_never_cut_below_their_header(self):
+        records = [{"name": "x" * 30, "description": "y" * 30, "index": i} for i in range(3)]
+
+        with self.assertLogs(mxcloudshare.logger, "INFO") as logs:
+            _, lines = self.table(records, width=24)
+
+        self.assertEqual(["name", "description"], lines[0].split())
+        self.assertLessEqual(max(len(line) for line in lines), 24)
+        self.assertIn("index", logs.output[0])
+
+    def test_long_cells_are_cut_with_an_ellipsis(self):
+        _, lines = self.table([{"id": 1, "name": "z" * 60}])
+
+        self.assertTrue(lines[2].rstrip().endswith("z…"))
+        self.assertLessEqual(len(lines[2]), 40)
+
+    def test_keys_first_seen_after_the_sample_are_not_shown(self):
+        count, lines = self.table([{"id": 1}, {"id": 2, "late": "x"}], sample_size=1)
+
+        self.assertEqual(2, count)
+        self.assertEqual(["id"], lines[0].split())
+        self.assertEqual(["2"], lines[3].split())
+
+    def test_nothing_is_printed_without_records(self):
+        self.assertEqual((0, []), self.table([]))
+
+
+class TestPaginate(_CliTest):
+
+    def test_everything_without_a_limit(self):
+        self.assertEqual(list(range(10)), list(mxcloudshare.paginate(range(10))))
+
+    def test_the_page_of_limit_records(self):
+        mxcloudshare.globalconf.update(limit=4, page=2)
+
+        self.assertEqual([4, 5, 6, 7], list(mxcloudshare.paginate(iter(range(10)))))
+
+    def test_the_last_page_may_be_short_and_pages_start_at_one(self):
+        mxcloudshare.globalconf.update(limit=4, page=3)
+        self.assertEqual([8, 9], list(mxcloudshare.paginate(range(10))))
+
+        mxcloudshare.globalconf.update(page=0)
+        self.assertEqual([0, 1, 2, 3], list(mxcloudshare.paginate(range(10))))
+
+
+class TestFlattenRecord(_CliTest):
+
+    def test_nested_dicts_become_dotted_keys(self):
+        record = {"id": 1, "owner": {"name": "ann", "team": {"id": 7}}}
+
+        self.assertEqual({"id": 1, "owner.name": "ann", "owner.team.id": 7}, mxcloudshare.flatten_record(record))
+
+    def test_lists_and_empty_dicts_are_kept_as_values(self):
+        record = {"vms": [{"id": 1}], "tags": {}}
+
+        self.assertEqual(record, mxcloudshare.flatten_record(record))
+
+
+class TestWriters(_CliTest):
+
+    records = [
+        {"id": "EN1", "owner": {"name": "ann"}, "vms": [{"id": "MC1"}], "note": None},
+        {"id": "EN2", "owner": {"name": "bo"}, "vms": []},
+    ]
+
+    def csv(self, records, **kwargs):
+        out = io.StringIO()
+        count = mxcloudshare.write_csv(records, out=out, **kwargs)
+        return count, out.getvalue().splitlines()
+
+    def test_csv_flattens_nested_objects_and_writes_lists_as_json(self):
+        count, lines = self.csv(self.records)
+
+        self.assertEqual(2, count)
+        self.assertEqual(["id,owner.name,vms,note",
+                          'EN1,ann,"[{""id"":""MC1""}]",',
+                          "EN2,bo,[],"], lines)
+
+    def test_csv_columns_missing_from_a_record_are_empty(self):
+        _, lines = self.csv([{"id": 1, "name": "a"}, {"id": 2}, {"name": "c", "tag": "x"}])
+
+        self.assertEqual(["id,name,tag", "1,a,", "2,,", ",c,x"], lines)
+
+    def test_csv_keys_first_seen_after_the_sample_are_left_out(self):
+        _, lines = self.csv([{"id": 1}, {"id": 2, "late": "x"}], sample_size=1)
+
+        self.assertEqual(["id", "1", "2"], lines)
+
+    def test_csv_columns_are_the_fields_in_their_order(self):
+        _, lines = self.csv(self.records, fields=["vms", "owner.name", "id", "missing"])
+
+        self.assertEqual(["vms,owner.name,id,missing", '"[{""id"":""MC1""}]",ann,EN1,', "[],bo,EN2,"], lines)
+
+    def test_csv_field_naming_a_nested_object_gets_it_whole(self):
+        _, lines = self.csv(self.records, fields=["id", "owner"])
+
+        self.assertEqual(["id,owner", 'EN1,"{""name"":""ann""}"', 'EN2,"{""name"":""bo""}"'], lines)
+
+    def test_csv_of_nothing_writes_nothing(self):
+        self.assertEqual((0, []), self.csv([]))
+
+    def test_ndjson_writes_one_compact_line_per_record(self):
+        out = io.StringIO()
+
+        count = mxcloudshare.write_ndjson(iter(self.records), out=out)
+
+        self.assertEqual(2, count)
+        self.assertEqual(self.records, [json.loads(line) for line in out.getvalue().splitlines()])
+        self.assertNotIn(": ", out.getvalue())
+
+    def test_ndjson_keeps_non_ascii_text(self):
+        out = io.StringIO()
+
+        mxcloudshare.write_ndjson([{"name": "Zoë"}], out=out)
+
+        self.assertEqual('{"name":"Zoë"}\n', out.getvalue())
+
+
+class TestCards(_CliTest):
+
+    def test_each_record_is_a_card_of_keys_and_values(self):
+        mxcloudshare.globalconf["tablewidth"] = 40
+        records = [{"id": "EN1", "owner": {"name": "ann"}, "description": "d" * 60}, {"id": "EN2"}]
+
+        out = self.output(mxcloudshare.print_results, records, mxcloudshare.OutFormat.card_fmt)
+        lines = out.splitlines()
+
+        self.assertEqual([["id", "EN1"], ["owner.name", "ann"]], [line.split() for line in lines[:2]])
+        self.assertEqual("description", lines[2].split()[0])
+        self.assertTrue(lines[2].endswith("d…"))
+        self.assertEqual(["id", "EN2"], lines[4].split())
+        self.assertEqual(2, sum(set(line) == {"─"} for line in lines))
+        self.assertLessEqual(max(len(line) for line in lines), 40)
+
+
+class TestClassChanges(_CliTest):
+
+    def setUp(self):
+        super(TestClassChanges, self).setUp()
+        self.standin = self.use_standin()
+        self.events = []
+        cs_iter = mxcloudshare.cs_iter
+
+        def listing(*args, **kwargs):
+            for item in cs_iter(*args, **kwargs):
+                yield item
+            self.events.append("listed")
+
+        for name, fn in (("cs_iter", listing),
+                         ("cs_put", self.recorded("changed", mxcloudshare.cs_put)),
+                         ("cs_delete", self.recorded("changed", mxcloudshare.cs_delete))):
+            patcher = mock.patch.object(mxcloudshare, name, fn)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def recorded(self, event, fn):
+        def call(*args, **kwargs):
+            self.events.append(event)
+            return fn(*args, **kwargs)
+        return call
+
+    def test_classes_are_listed_in_full_before_any_is_deleted(self):
+        self.assertTrue(self.standin.state.classes)
+
+        self.output(mxcloudshare.class_delete, class_pattern=".")
+
+        self.assertEqual("listed", self.events[0])
+        self.assertEqual({}, self.standin.state.classes)
+
+    def test_classes_are_listed_in_full_before_any_status_changes(self):
+        count = len(self.standin.state.classes)
+
+        self.output(mxcloudshare.class_setstatus, class_pattern=".", status="SUSPENDED")
+
+        self.assertEqual(["listed"] + ["changed"] * count, self.events)
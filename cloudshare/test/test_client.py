@@ -0,0 +1,95 @@
+import threading
+import unittest
+from mock import Mock
+
+from .. import Client, _get_requester
+from ..http import Response
+from ..standin import StandIn
+from ..wrapper_cls import Wrapper
+
+
+class TestClient(unittest.TestCase):
+
+    def _client(self):
+        http = Mock()
+        http.request = Mock(return_value=Response(status=200, content=b'{"id": "EN1"}'))
+        return Client("some.hostname.com", "API_ID", "API_KEY", http=http), http
+
+    def test_request_uses_the_client_hostname_and_credentials(self):
+        client, http = self._client()
+
+        res = client.request("GET", "envs/EN1")
+
+        url = http.request.call_args[0][1]
+        headers = http.request.call_args[0][2]
+        self.assertEqual("https://some.hostname.com/api/v3/envs/EN1", url)
+        self.assertRegex(headers["Authorization"], r"^cs_sha1 userapiid:API_ID;")
+        self.assertEqual({"id": "EN1"}, res.content)
+
+    def test_the_object_graph_is_built_once_per_client(self):
+        client, _ = self._client()
+        requester = client.requester
+
+        client.get("envs")
+        client.put("envs/actions/suspend", {"envId": "EN1"})
+
+        self.assertIs(requester, client.requester)
+
+    def test_client_can_be_shared_across_threads(self):
+        client, http = self._client()
+        errors = []
+
+        def work(n):
+            try:
+                # Distinct paths, so no two concurrent GETs get coalesced.
+                for i in range(50):
+                    client.get("envs/EN%d_%d" % (n, i))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(400, http.request.call_count)
+
+    def test_req_runs_on_one_shared_requester(self):
+        self.assertIs(_get_requester(), _get_requester())
+
+    def test_wrapper_runs_on_the_given_client(self):
+        client, http = self._client()
+        wrapper = Wrapper(None, None, None, client=client)
+
+        result = wrapper.env_get_short("EN1")
+
+        self.assertEqual({"id": "EN1"}, result)
+        self.assertEqual("https://some.hostname.com/api/v3/envs/EN1", http.request.call_args[0][1])
+
+    def test_identical_create_actions_each_create_an_environment(self):
+        with StandIn() as standin:
+            client = Client(standin.url, "API_ID", "API_KEY", micro_cache_ttl=0.25)
+            before = len(standin.state.envs)
+            spec = {"method": "GET", "path": "envs/actions/create", "queryParams": {"name": "lab"}}
+
+            results = list(client.request_many([spec] * 4, max_workers=4))
+
+            self.assertTrue(all(r.ok for r in results))
+            self.assertEqual(4, len(set(r.content["environmentId"] for r in results)))
+            self.assertEqual(before + 4, len(standin.state.envs))
+
+    def test_gets_sent_as_not_idempotent_are_never_shared(self):
+        with StandIn() as standin:
+            client = Client(standin.url, "API_ID", "API_KEY", micro_cache_ttl=60)
+            env_id = next(iter(standin.state.envs))
+            spec = {"method": "GET", "path": "envs/actions/getextended", "queryParams": {"envId": env_id},
+                    "idempotent": False}
+            requests = standin.requests
+
+            results = list(client.request_many([spec] * 4, max_workers=4))
+
+            self.assertTrue(all(r.ok for r in results))
+            self.assertEqual(4, standin.requests - requests)
+            self.assertEqual(0, client.coalescing.coalesced + client.coalescing.hits)
@@ -0,0 +1,204 @@
+import threading
+import unittest
+from mock import Mock
+
+from ..coalescing import CoalescingHttp
+from ..http import Response
+
+BASE = "https://use.cloudshare.com/api/v3/"
+AUTH = {"Authorization": "cs_sha1 userapiid:API_ID;timestamp:1;token:T;hmac:H"}
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _SlowTransport(object):
+
+    def __init__(self, result):
+        self.result = result
+        self.release = threading.Event()
+        self.calls = 0
+
+    def request(self, method, url, headers, content, **kwargs):
+        self.calls += 1
+        self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return Response(200, self.result)
+
+
+def _get(http, path, headers=AUTH):
+    return http.request("GET", BASE + path, dict(headers), None)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def _gather(self, http, paths):
+        results = [None] * len(paths)
+
+        def call(i, path):
+            try:
+                results[i] = _get(http, path)
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=call, args=(i, p)) for i, p in enumerate(paths)]
+        for t in threads:
+            t.start()
+        while http.coalesced < len(paths) - 1 and any(t.is_alive() for t in threads):
+            threading.Event().wait(0.001)
+        http.http.release.set()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_concurrent_identical_gets_share_one_request(self):
+        http = CoalescingHttp(_SlowTransport(b'{"statusText": "Ready"}'))
+
+        results = self._gather(http, ["envs/EN1234567"] * 5)
+
+        self.assertEqual(1, http.http.calls)
+        self.assertEqual(4, http.coalesced)
+        self.assertTrue(all(r.body == b'{"statusText": "Ready"}' for r in results))
+        self.assertEqual(5, len(set(id(r) for r in results)))
+
+    def test_read_only_actions_are_coalesced(self):
+        http = CoalescingHttp(_SlowTransport(b'{"statusText": "Ready"}'))
+
+        results = self._gather(http, ["envs/actions/getextended?envId=EN1234567"] * 4)
+
+        self.assertEqual(1, http.http.calls)
+        self.assertEqual(3, http.coalesced)
+        self.assertEqual([b'{"statusText": "Ready"}'] * 4, [r.body for r in results])
+
+    def test_changing_actions_are_never_coalesced(self):
+        transport = _SlowTransport(b'{"environmentId": "EN1234567"}')
+        transport.release.set()
+        http = CoalescingHttp(transport, ttl=1)
+        threads = [threading.Thread(target=_get, args=(http, "envs/actions/create?name=lab")) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(4, transport.calls)
+        self.assertEqual(0, http.coalesced)
+        self.assertEqual(0, http.hits)
+
+    def test_followers_get_the_leaders_exception(self):
+        http = CoalescingHttp(_SlowTransport(ConnectionResetError()))
+
+        results = self._gather(http, ["envs"] * 3)
+
+        self.assertEqual(1, http.http.calls)
+        self.assertTrue(all(isinstance(r, ConnectionResetError) for r in results))
+
+    def test_different_credentials_are_not_coalesced(self):
+        transport = Mock()
+        transport.request = Mock(return_value=Response(200, b"[]"))
+        http = CoalescingHttp(transport, ttl=1)
+
+        _get(http, "envs")
+        _get(http, "envs", {"Authorization": "cs_sha1 userapiid:OTHER;timestamp:1;token:T;hmac:H"})
+
+        self.assertEqual(2, transport.request.call_count)
+
+
+class TestMicroCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.transport = Mock()
+        self.transport.request = Mock(side_effect=lambda *a, **kw: Response(200, b'{"statusText": "Ready"}'))
+        self.http = CoalescingHttp(self.transport, ttl=0.25, clock=self.clock)
+
+    def test_repeats_within_the_ttl_are_served_from_memory(self):
+        _get(self.http, "envs/EN1234567")
+        self.clock.now += 0.2
+        _get(self.http, "envs/EN1234567")
+        self.clock.now += 0.1
+        _get(self.http, "envs/EN1234567")
+
+        self.assertEqual(2, self.transport.request.call_count)
+        self.assertEqual(1, self.http.hits)
+
+    def test_callers_can_change_what_they_get_without_affecting_the_cache(self):
+        first = _get(self.http, "envs")
+        first.headers["x"] = "changed"
+
+        self.assertNotIn("x", _get(self.http, "envs").headers)
+
+    def test_conditional_gets_always_reach_the_server(self):
+        _get(self.http, "envs/EN1234567")
+        _get(self.http, "envs/EN1234567", dict(AUTH, **{"If-None-Match": '"v1"'}))
+
+        self.assertEqual(2, self.transport.request.call_count)
+
+    def test_errors_are_not_cached(self):
+        self.transport.request = Mock(return_value=Response(503, b""))
+
+        _get(self.http, "envs")
+        _get(self.http, "envs")
+
+        self.assertEqual(2, self.transport.request.call_count)
+
+    def test_a_change_drops_cached_responses_for_the_same_resource_only(self):
+        _get(self.http, "envs/EN1234567")
+        _get(self.http, "envs/EN7654321")
+
+        self.http.request("PUT", BASE + "envs/actions/suspend?envId=EN1234567", dict(AUTH), None)
+        _get(self.http, "envs/EN1234567")
+        _get(self.http, "envs/EN7654321")
+
+        self.assertEqual(4, self.transport.request.call_count)
+
+    def test_read_only_actions_are_cached_and_drop_nothing(self):
+        _get(self.http, "envs/EN1234567")
+
+        _get(self.http, "envs/actions/getextended?envId=EN1234567")
+        _get(self.http, "envs/actions/getextended?envId=EN1234567")
+        _get(self.http, "envs/EN1234567")
+
+        self.assertEqual(2, self.transport.request.call_count)
+        self.assertEqual(2, self.http.hits)
+
+    def test_changing_action_gets_and_request_change_drop_the_cached_resource(self):
+        _get(self.http, "envs/EN1234567")
+
+        _get(self.http, "envs/actions/Suspend?envId=EN1234567")
+        _get(self.http, "envs/EN1234567")
+        self.http.request_change("GET", BASE + "envs/actions/getextended?envId=EN1234567", dict(AUTH), None)
+        _get(self.http, "envs/EN1234567")
+
+        self.assertEqual(5, self.transport.request.call_count)
+        self.assertEqual(0, self.http.hits)
+
+    def test_a_change_to_a_member_drops_the_cached_collection(self):
+        _get(self.http, "class")
+
+        self.http.request("DELETE", BASE + "class/CL1234567", dict(AUTH), None)
+        _get(self.http, "class")
+
+        self.assertEqual(3, self.transport.request.call_count)
+
+    def test_a_get_in_flight_during_a_change_is_not_cached(self):
+        http = self.http
+
+        def request(method, url, headers, content, **kwargs):
+            if method == "GET" and request.first:
+                request.first = False
+                http.invalidate(BASE + "envs/actions/suspend?envId=EN1234567")
+            return Response(200, b"{}")
+        request.first = True
+        self.transport.request = Mock(side_effect=request)
+
+        _get(http, "envs/EN1234567")
+        _get(http, "envs/EN1234567")
+
+        self.assertEqual(2, self.transport.request.call_count)
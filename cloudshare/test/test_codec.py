@@ -0,0 +1,101 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from mock import Mock
+
+from ..codec import JsonCodec, get_codec
+from ..http import Http
+from ..requester import Requester
+
+PAYLOAD = {"name": "Clase de introducción", "students": [{"email": "zoë@example.com"}], "count": 3}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.server.content_length = int(self.headers["Content-Length"])
+        self.server.body = self.rfile.read(self.server.content_length)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCodecs(unittest.TestCase):
+
+    def test_every_installed_codec_round_trips_to_utf8_bytes(self):
+        for name in ("json", "orjson", "ujson"):
+            try:
+                codec = get_codec(name)
+            except ImportError:
+                continue
+            data = codec.dumps(PAYLOAD)
+
+            self.assertIsInstance(data, bytes, name)
+            self.assertEqual(PAYLOAD, codec.loads(data), name)
+            self.assertEqual(PAYLOAD, codec.loads(data.decode('utf-8')), name)
+
+    def test_every_installed_codec_encodes_what_json_encodes(self):
+        payload = {1: "int key", None: "null key", "quota": 2 ** 70, "negative": -2 ** 64, "ok": 2 ** 63 - 1}
+        for name in ("json", "orjson", "ujson"):
+            try:
+                codec = get_codec(name)
+            except ImportError:
+                continue
+
+            self.assertEqual({"1": "int key", "null": "null key", "quota": 2 ** 70, "negative": -2 ** 64,
+                              "ok": 2 ** 63 - 1}, json.loads(codec.dumps(payload)), name)
+
+    def test_default_codec_is_the_first_one_installed(self):
+        self.assertIn(get_codec().name, ("orjson", "ujson", "json"))
+        self.assertIs(get_codec(), get_codec())
+
+    def test_invalid_json_is_parsed_as_none(self):
+        for codec in (JsonCodec(), get_codec()):
+            requester = Requester(Mock(), Mock(), codec=codec)
+
+            self.assertIsNone(requester._try_to_parse_json(b"<html>"))
+            self.assertIsNone(requester._try_to_parse_json(b""))
+
+
+class TestSingleEncodePass(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = "http://127.0.0.1:%d/class" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_content_length_counts_bytes_not_characters(self):
+        body = JsonCodec().dumps(PAYLOAD)
+
+        Http().request("POST", self.url, {}, body)
+
+        self.assertEqual(len(body), self.server.content_length)
+        self.assertEqual(PAYLOAD, JsonCodec().loads(self.server.body))
+
+    def test_str_bodies_are_still_encoded_for_older_callers(self):
+        Http().request("POST", self.url, {}, '{"name": "é"}')
+
+        self.assertEqual(len('{"name": "é"}'.encode('utf-8')), self.server.content_length)
+
+    def test_requester_encodes_content_once_with_its_codec(self):
+        codec = Mock()
+        codec.dumps = Mock(return_value=b"{}")
+        http = Mock()
+        requester = Requester(http, Mock(), codec=codec)
+
+        requester.cs_request("some.hostname.com", "POST", "API_ID", "API_KEY", "class", content=PAYLOAD)
+
+        codec.dumps.assert_called_once_with(PAYLOAD)
+        self.assertIs(codec.dumps.return_value, http.request.call_args[0][3])
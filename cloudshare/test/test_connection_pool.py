@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ..connection_pool import ConnectionPool
+from ..http import Http
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.ports.add(self.client_address[1])
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/close":
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        # "/drop" hangs up without announcing it, like an idle timeout on the server.
+        if self.path in ("/close", "/drop"):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.ports = set()
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_consecutive_requests_reuse_one_connection(self):
+        pool = ConnectionPool()
+        http = Http(pool)
+
+        results = [http.request("GET", self.url + "/envs", {}, None) for _ in range(5)]
+
+        self.assertEqual([200] * 5, [r.status for r in results])
+        self.assertEqual(b'{"ok": true}', results[-1].content)
+        self.assertEqual(1, len(self.server.ports))
+        self.assertEqual(1, pool.created)
+        self.assertEqual(4, pool.reused)
+
+    def test_connection_close_from_server_is_not_pooled(self):
+        pool = ConnectionPool()
+        http = Http(pool)
+
+        http.request("GET", self.url + "/close", {}, None)
+
+        self.assertEqual(0, pool.idle_count())
+
+    def test_idle_connections_past_the_timeout_are_evicted(self):
+        pool = ConnectionPool(idle_timeout=0.05)
+        http = Http(pool)
+
+        http.request("GET", self.url + "/envs", {}, None)
+        time.sleep(0.1)
+        http.request("GET", self.url + "/envs", {}, None)
+
+        self.assertEqual(2, pool.created)
+        self.assertEqual(2, len(self.server.ports))
+
+    def test_connections_closed_by_the_server_are_detected_as_stale(self):
+        pool = ConnectionPool()
+        http = Http(pool)
+
+        http.request("GET", self.url + "/drop", {}, None)
+        time.sleep(0.1)
+        res = http.request("GET", self.url + "/envs", {}, None)
+
+        self.assertEqual(200, res.status)
+        self.assertEqual(2, pool.created)
+        self.assertEqual(0, pool.reused)
+
+    def test_pool_keeps_at_most_maxsize_idle_connections_per_host(self):
+        pool = ConnectionPool(maxsize=2)
+        for _ in range(4):
+            pool.put(pool.new_connection("http", "127.0.0.1", 8080))
+
+        self.assertEqual(2, pool.idle_count("http", "127.0.0.1", 8080))
+
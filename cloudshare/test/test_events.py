@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from mock import Mock
+
+from ..async_http import AsyncHttp
+from ..async_requester import AsyncRequester
+from ..events import LoggingListener, path_template
+from ..http import Http, Response
+from ..requester import Requester
+from ..retry import RetryPolicy
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"[]")
+
+    def log_message(self, *args):
+        pass
+
+
+class _Transport(object):
+
+    def __init__(self, responses):
+        self.responses = iter(responses)
+        self.calls = []
+
+    def request(self, method, url, headers, content, **kwargs):
+        self.calls.append(kwargs)
+        if "timings" in kwargs:
+            kwargs["timings"].update(ttfb=0.01, download=0.02)
+        return next(self.responses)
+
+
+def _requester(transport, policy=None):
+    authParamProvider = Mock()
+    authParamProvider.get = Mock(return_value="SECRET")
+    return Requester(transport, authParamProvider, policy, sleep=lambda delay: None)
+
+
+class TestPathTemplate(unittest.TestCase):
+
+    def test_ids_are_replaced_and_only_query_names_kept(self):
+        self.assertEqual("envs/{id}", path_template("https://h/api/v3/envs/ENa1b2c3d4e5f6"))
+        self.assertEqual("envs/actions/getextended?envId",
+                         path_template("https://h/api/v3/envs/actions/getextended?envId=ENa1b2c3d4e5f6"))
+        self.assertEqual("class/{id}/students?isFull",
+                         path_template("https://h/api/v3/class/CL12ab34cd56/students?isFull=true"))
+        self.assertEqual("envs", path_template("https://h/api/v3/envs"))
+
+
+class TestRequestEvents(unittest.TestCase):
+
+    def test_without_listeners_the_transport_is_not_asked_for_timings(self):
+        transport = _Transport([Response(200, b"{}")])
+
+        _requester(transport).cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs")
+
+        self.assertEqual([{}], transport.calls)
+
+    def test_every_attempt_is_reported_with_its_phases(self):
+        transport = _Transport([Response(503, b"", wire_bytes=0), Response(200, b'{"a": 1}', wire_bytes=8)])
+        requester = _requester(transport, RetryPolicy(jitter=False))
+        events = []
+        requester.listeners.add(events.append)
+
+        requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs/EN1234567890")
+
+        self.assertEqual([(503, 0), (200, 1)], [(e.status, e.retries) for e in events])
+        self.assertEqual("envs/{id}", events[1].path)
+        self.assertEqual(8, events[1].wire_bytes)
+        self.assertIn("parse", events[1].timings)
+        self.assertNotIn("parse", events[0].timings)
+        self.assertTrue(all(set(["ttfb", "download", "total"]) <= set(e.timings) for e in events))
+
+    def test_transport_errors_are_reported_before_being_raised(self):
+        transport = Mock()
+        transport.request = Mock(side_effect=ConnectionRefusedError())
+        requester = _requester(transport)
+        events = []
+        requester.listeners.add(events.append)
+
+        with self.assertRaises(ConnectionRefusedError):
+            requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs")
+
+        self.assertIsInstance(events[0].error, ConnectionRefusedError)
+
+    def test_a_failing_listener_does_not_break_the_request(self):
+        requester = _requester(_Transport([Response(200, b"{}")]))
+        requester.listeners.add(Mock(side_effect=RuntimeError()))
+
+        with self.assertLogs("cloudshare.events", logging.ERROR):
+            res = requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs")
+
+        self.assertEqual(200, res.status)
+
+    def test_the_authorization_header_is_never_logged(self):
+        requester = _requester(_Transport([Response(200, b"{}")]))
+        requester.listeners.add(LoggingListener(logging.getLogger("cloudshare.test")))
+
+        with self.assertLogs("cloudshare", logging.DEBUG) as logs:
+            requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs")
+
+        self.assertFalse(any("SECRET" in line for line in logs.output))
+        self.assertTrue(any("GET envs -> 200" in line for line in logs.output))
+
+    def test_async_requester_reports_events_too(self):
+        class _AsyncTransport(object):
+            async def request(self, method, url, headers, content, timings=None):
+                timings["ttfb"] = 0.01
+                return Response(200, b"{}")
+
+        requester = AsyncRequester(_AsyncTransport(), Mock())
+        events = []
+        requester.listeners.add(events.append)
+
+        asyncio.run(requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs"))
+
+        self.assertEqual(["ttfb", "parse", "total"], list(events[0].timings))
+
+
+class TestTransportTimings(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = "http://localhost:%d/api/v3/envs" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_new_connections_report_dns_and_connect_reused_ones_do_not(self):
+        http = Http()
+        first, second = {}, {}
+
+        http.request("GET", self.url, {}, None, timings=first)
+        http.request("GET", self.url, {}, None, timings=second)
+
+        self.assertEqual(["dns", "connect", "send", "ttfb", "download"], list(first))
+        self.assertEqual(["send", "ttfb", "download"], list(second))
+        self.assertTrue(all(v >= 0 for v in first.values()))
+
+    def test_async_transport_reports_phases(self):
+        timings = {}
+
+        asyncio.run(AsyncHttp().request("GET", self.url, {}, None, timings=timings))
+
+        self.assertEqual(["connect", "send", "ttfb", "download"], list(timings))
@@ -0,0 +1,157 @@
+import socket
+import threading
+import time
+import unittest
+from mock import Mock
+
+from ..client import Client
+from ..hedging import Hedger, LatencyHistogram
+from ..http import Response
+from ..retry import RetryPolicy
+from ..standin import StandIn
+
+URL = "https://use.cloudshare.com/api/v3/envs/actions/getextended?envId=EN1234567"
+
+
+def _trained(hedger, seconds=0.01, count=20):
+    for _ in range(count):
+        hedger.histogram.add("envs/actions/getextended?envId", seconds)
+    return hedger
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_quantiles_need_enough_samples(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.add("envs", ms / 1000.0)
+
+        self.assertEqual(0.096, histogram.quantile("envs", 0.95))
+        self.assertIsNone(histogram.quantile("envs", 0.95, min_samples=101))
+        self.assertIsNone(histogram.quantile("class", 0.95))
+        self.assertEqual({"count": 100, "p50": 0.051, "p95": 0.096, "p99": 0.1}, histogram.summary()["envs"])
+
+    def test_only_the_latest_window_counts(self):
+        histogram = LatencyHistogram(window=10)
+        for _ in range(10):
+            histogram.add("envs", 5.0)
+        for _ in range(10):
+            histogram.add("envs", 0.1)
+
+        self.assertEqual(0.1, histogram.quantile("envs", 0.99))
+        self.assertEqual(20, histogram.summary()["envs"]["count"])
+
+
+class TestHedger(unittest.TestCase):
+
+    def test_a_slow_get_is_hedged_with_new_headers_and_the_fastest_answer_wins(self):
+        release = threading.Event()
+        calls = []
+
+        def transport(method, url, headers, body):
+            calls.append(headers)
+            if len(calls) == 1:
+                release.wait(5)
+                return Response(200, b"slow")
+            return Response(200, b"fast")
+
+        hedger = _trained(Hedger(enabled=True))
+        res = hedger.send(transport, "GET", URL, {"Authorization": "first"}, lambda: {"Authorization": "second"}, None)
+        release.set()
+
+        self.assertEqual(b"fast", res.body)
+        self.assertEqual([{"Authorization": "first"}, {"Authorization": "second"}], calls)
+        self.assertEqual((1, 1), (hedger.hedged, hedger.hedge_wins))
+
+    def test_hedges_go_through_the_hedge_transport(self):
+        release = threading.Event()
+        transport = Mock(side_effect=lambda *a: release.wait(5) and Response(200, b"primary"))
+        hedge_transport = Mock(return_value=Response(200, b"hedge"))
+        hedger = _trained(Hedger(enabled=True))
+
+        res = hedger.send(transport, "GET", URL, {}, dict, None, hedge_transport=hedge_transport)
+        release.set()
+
+        self.assertEqual(b"hedge", res.body)
+        self.assertEqual((1, 1), (transport.call_count, hedge_transport.call_count))
+
+    def test_fast_answers_and_other_methods_are_not_hedged(self):
+        transport = Mock(return_value=Response(200, b""))
+        hedger = _trained(Hedger(enabled=True), seconds=1.0)
+
+        hedger.send(transport, "GET", URL, {}, Mock(), None)
+        hedger.send(transport, "PUT", URL, {}, Mock(), None)
+
+        self.assertEqual(2, transport.call_count)
+        self.assertEqual(0, hedger.hedged)
+
+    def test_nothing_is_hedged_before_the_endpoint_has_enough_samples_or_when_disabled(self):
+        transport = Mock(side_effect=lambda *a: time.sleep(0.02) or Response(200, b""))
+
+        Hedger(enabled=True).send(transport, "GET", URL, {}, Mock(), None)
+        _trained(Hedger()).send(transport, "GET", URL, {}, Mock(), None)
+
+        self.assertEqual(2, transport.call_count)
+
+    def test_a_failed_attempt_leaves_the_answer_to_the_other(self):
+        release = threading.Event()
+        calls = []
+
+        def transport(method, url, headers, body):
+            calls.append(headers)
+            if len(calls) == 1:
+                release.wait(5)
+                return Response(200, b"primary")
+            raise ConnectionResetError()
+
+        hedger = _trained(Hedger(enabled=True))
+        threading.Timer(0.05, release.set).start()
+
+        self.assertEqual(b"primary", hedger.send(transport, "GET", URL, {}, dict, None).body)
+
+    def test_hedges_in_flight_are_capped(self):
+        release = threading.Event()
+        transport = Mock(side_effect=lambda *a: release.wait(5) and Response(200, b""))
+        hedger = _trained(Hedger(enabled=True, max_hedges=1))
+        threads = [threading.Thread(target=hedger.send, args=(transport, "GET", URL, {}, dict, None)) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(1, hedger.hedged)
+        self.assertEqual(4, transport.call_count)
+
+
+class TestClientTimeouts(unittest.TestCase):
+
+    def test_a_stalled_server_times_out_instead_of_hanging(self):
+        with StandIn(latency=0.5) as standin:
+            client = Client(standin.url, "API_ID", "API_KEY", timeout=0.05, retry_policy=RetryPolicy(total=0))
+
+            self.assertRaises(socket.timeout, client.get, "envs")
+
+    def test_hedging_cuts_the_tail_against_the_stand_in(self):
+        def latency(rng):
+            # The fourth GET of the environment stalls; the hedges sent after it do not.
+            latency.calls += 1
+            return 0.5 if latency.calls == 4 else 0.001
+        latency.calls = 0
+
+        with StandIn(latency={"envs/{id}": latency, "*": 0.0}, seed=1) as standin:
+            # Default settings: the hedge must not join the primary's request in the coalescer.
+            client = Client(standin.url, "API_ID", "API_KEY", hedge=True)
+            client.hedger.min_samples = 3
+            env = client.get("envs").content[0]["id"]
+            start = time.monotonic()
+            for _ in range(12):
+                client.get("envs/" + env)
+            elapsed = time.monotonic() - start
+            metrics = client.metrics()
+
+        self.assertLess(elapsed, 0.5)
+        self.assertGreaterEqual(metrics["hedge_wins"], 1)
+        self.assertEqual(12, metrics["endpoints"]["envs/{id}"]["count"])
+        self.assertEqual(1, metrics["endpoints"]["envs"]["count"])
@@ -0,0 +1,113 @@
+import asyncio
+import gzip
+import threading
+import unittest
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ..async_http import AsyncHttp
+from ..http import ContentDecoder, Http
+
+PAYLOAD = b'[' + b','.join(b'{"id": "EN%d", "statusText": "Running"}' % i for i in range(500)) + b']'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.accept_encoding = self.headers.get("Accept-Encoding")
+        if self.path == "/gzip":
+            body, encoding = gzip.compress(PAYLOAD), "gzip"
+        elif self.path == "/deflate":
+            body, encoding = zlib.compress(PAYLOAD), "deflate"
+        elif self.path == "/raw-deflate":
+            compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+            body, encoding = compressor.compress(PAYLOAD) + compressor.flush(), "deflate"
+        else:
+            body, encoding = PAYLOAD, None
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpCompression(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_request_asks_for_gzip_and_deflate(self):
+        Http().request("GET", self.url + "/plain", {}, None)
+
+        self.assertEqual("gzip, deflate", self.server.accept_encoding)
+
+    def test_gzip_bodies_are_decoded_and_byte_counts_reported(self):
+        res = Http().request("GET", self.url + "/gzip", {}, None)
+
+        self.assertEqual(PAYLOAD, res.content)
+        self.assertEqual(len(gzip.compress(PAYLOAD)), res.wire_bytes)
+        self.assertEqual(len(PAYLOAD), res.decoded_bytes)
+        self.assertEqual("gzip", res.headers["content-encoding"])
+
+    def test_zlib_and_raw_deflate_bodies_are_decoded(self):
+        http = Http()
+
+        self.assertEqual(PAYLOAD, http.request("GET", self.url + "/deflate", {}, None).content)
+        self.assertEqual(PAYLOAD, http.request("GET", self.url + "/raw-deflate", {}, None).content)
+
+    def test_identity_bodies_report_equal_wire_and_decoded_bytes(self):
+        res = Http().request("GET", self.url + "/plain", {}, None)
+
+        self.assertEqual(len(PAYLOAD), res.wire_bytes)
+        self.assertEqual(len(PAYLOAD), res.decoded_bytes)
+
+    def test_streamed_body_is_decoded_incrementally_and_the_connection_reused(self):
+        http = Http()
+
+        with http.stream("GET", self.url + "/gzip", {}, None) as res:
+            chunks = list(res.iter_content())
+        http.request("GET", self.url + "/plain", {}, None)
+
+        self.assertEqual(PAYLOAD, b"".join(chunks))
+        self.assertEqual(len(PAYLOAD), res.decoded_bytes)
+        self.assertEqual(1, http.pool.reused)
+
+    def test_stream_closed_early_does_not_return_the_connection(self):
+        http = Http()
+
+        with http.stream("GET", self.url + "/plain", {}, None):
+            pass
+
+        self.assertEqual(0, http.pool.idle_count())
+
+    def test_async_transport_decodes_gzip_too(self):
+        res = asyncio.run(AsyncHttp().request("GET", self.url + "/gzip", {}, None))
+
+        self.assertEqual(PAYLOAD, res.content)
+        self.assertLess(res.wire_bytes, res.decoded_bytes)
+
+
+class TestContentDecoder(unittest.TestCase):
+
+    def test_gzip_is_decoded_across_arbitrary_chunk_boundaries(self):
+        compressed = gzip.compress(PAYLOAD)
+        decoder = ContentDecoder("gzip")
+
+        data = b"".join(decoder.decompress(compressed[i:i + 7]) for i in range(0, len(compressed), 7))
+        data += decoder.flush()
+
+        self.assertEqual(PAYLOAD, data)
+        self.assertEqual(len(compressed), decoder.wire_bytes)
@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import unittest
+from mock import Mock
+
+from ..client import Client
+from ..http import Response
+from ..http_cache import CACHE_HEADER, CachingHttp, HttpCache
+
+BASE = "https://use.cloudshare.com/api/v3/"
+AUTH = {"Authorization": "cs_sha1 userapiid:API_ID;timestamp:1;token:T;hmac:H"}
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCachingHttp(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.clock = _Clock()
+        self.cache = HttpCache(os.path.join(self.dir, "cache.db"), clock=self.clock)
+        self.http = Mock()
+        self.caching = CachingHttp(self.http, self.cache)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    def _get(self, path, headers=AUTH):
+        return self.caching.request("GET", BASE + path, dict(headers), None)
+
+    def test_reference_data_is_served_without_a_round_trip_while_fresh(self):
+        self.http.request = Mock(return_value=Response(200, b'[{"id": "RE1"}]'))
+
+        self._get("regions")
+        res = self._get("regions")
+
+        self.assertEqual(1, self.http.request.call_count)
+        self.assertEqual(b'[{"id": "RE1"}]', res.body)
+        self.assertEqual("hit", res.headers[CACHE_HEADER])
+
+    def test_stale_entries_are_revalidated_with_their_validators(self):
+        self.http.request = Mock(side_effect=[
+            Response(200, b'[{"id": "PR1"}]', {"etag": '"v1"', "last-modified": "Wed, 21 Oct 2015 07:28:00 GMT"}),
+            Response(304, b"", {}),
+        ])
+
+        self._get("projects")
+        self.clock.now += 3601
+        res = self._get("projects")
+
+        headers = self.http.request.call_args[0][2]
+        self.assertEqual('"v1"', headers["If-None-Match"])
+        self.assertEqual("Wed, 21 Oct 2015 07:28:00 GMT", headers["If-Modified-Since"])
+        self.assertEqual(200, res.status)
+        self.assertEqual(b'[{"id": "PR1"}]', res.body)
+        self.assertEqual("revalidated", res.headers[CACHE_HEADER])
+
+    def test_ttls_expire(self):
+        self.http.request = Mock(return_value=Response(200, b"[]"))
+
+        self._get("projects/PRa1b2c3d4e5/blueprints")
+        self.clock.now += 3601
+        self._get("projects/PRa1b2c3d4e5/blueprints")
+
+        self.assertEqual(2, self.http.request.call_count)
+
+    def test_responses_without_validators_or_ttl_are_not_kept(self):
+        self.http.request = Mock(return_value=Response(200, b"[]"))
+
+        self._get("envs")
+        self._get("envs")
+
+        self.assertEqual(2, self.http.request.call_count)
+        self.assertEqual(0, self.cache.size())
+
+    def test_only_reference_data_or_max_age_responses_are_kept(self):
+        self.http.request = Mock(side_effect=[
+            Response(200, b"[]", {"etag": '"v1"', "last-modified": "Wed, 21 Oct 2015 07:28:00 GMT"}),
+            Response(200, b"[]", {"etag": '"v1"', "cache-control": "max-age=0"}),
+            Response(200, b"[]", {"cache-control": "private, max-age=30"}),
+        ])
+
+        self._get("envs")
+        self._get("envs")
+        self.assertEqual(0, self.cache.size())
+        self._get("envs")
+        res = self._get("envs")
+
+        self.assertEqual(3, self.http.request.call_count)
+        self.assertEqual("hit", res.headers[CACHE_HEADER])
+
+    def test_no_store_and_max_age_are_honoured(self):
+        self.http.request = Mock(side_effect=[Response(200, b"[]", {"cache-control": "no-store"}),
+                                              Response(200, b"[]", {"cache-control": "max-age=10"}),
+                                              Response(200, b"[]", {})])
+
+        self._get("regions")
+        self._get("regions")
+        self.clock.now += 11
+        self._get("regions")
+
+        self.assertEqual(3, self.http.request.call_count)
+
+    def test_each_api_id_has_its_own_entries(self):
+        self.http.request = Mock(return_value=Response(200, b"[]"))
+
+        self._get("regions")
+        self._get("regions", {"Authorization": "cs_sha1 userapiid:OTHER;timestamp:1;token:T;hmac:H"})
+
+        self.assertEqual(2, self.http.request.call_count)
+
+    def test_entries_survive_a_new_cache_on_the_same_file(self):
+        self.http.request = Mock(return_value=Response(200, b"[]"))
+        self._get("regions")
+
+        other = CachingHttp(self.http, HttpCache(self.cache.path, clock=self.clock))
+        other.request("GET", BASE + "regions", dict(AUTH), None)
+
+        self.assertEqual(1, self.http.request.call_count)
+
+    def test_least_recently_used_entries_are_evicted_over_the_size_cap(self):
+        self.cache.max_bytes = 250
+        self.http.request = Mock(side_effect=lambda *a, **kw: Response(200, b"x" * 100))
+
+        self._get("regions")
+        self.clock.now += 1
+        self._get("projects")
+        self.clock.now += 1
+        self._get("regions")
+        self.clock.now += 1
+        self._get("templates")
+        calls = self.http.request.call_count
+        self._get("regions")
+        self._get("projects")
+
+        self.assertEqual(calls + 1, self.http.request.call_count)
+        self.assertLessEqual(self.cache.size(), 250)
+
+    def test_invalidation_drops_a_path_and_everything_below_it(self):
+        self.cache.default_ttl = 60
+        self.http.request = Mock(return_value=Response(200, b"[]"))
+        for path in ("projects", "projects/PR1234567/policies", "projects_x", "regions"):
+            self._get(path)
+
+        self.assertEqual(2, self.cache.invalidate("projects/"))
+        self.assertEqual(2, self.cache.invalidate())
+
+    def test_changes_invalidate_the_cached_entries_of_the_same_resource(self):
+        self.http.request = Mock(return_value=Response(200, b"[]"))
+        self._get("projects/PR1234567/policies")
+
+        self.caching.request("POST", BASE + "projects/PR1234567/policies", dict(AUTH), b"{}")
+        self._get("projects/PR1234567/policies")
+
+        self.assertEqual(3, self.http.request.call_count)
+
+    def test_client_decodes_cached_bodies(self):
+        self.http.request = Mock(return_value=Response(200, b'[{"id": "RE1"}]'))
+        client = Client("use.cloudshare.com", "API_ID", "API_KEY", http=self.http, http_cache=self.cache)
+
+        client.get("regions")
+        res = client.get("regions")
+
+        self.assertEqual([{"id": "RE1"}], res.content)
+        self.assertEqual(1, self.http.request.call_count)
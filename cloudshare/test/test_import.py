@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+
+class TestImport(unittest.TestCase):
+
+    def run_python(self, code):
+        return subprocess.check_output([sys.executable, "-c", code], cwd=ROOT, universal_newlines=True).split()
+
+    def test_import_leaves_asyncio_and_sqlite3_out(self):
+        loaded = self.run_python("import sys, cloudshare; print(' '.join(m for m in ('asyncio', 'sqlite3') if m in sys.modules))")
+        self.assertEqual([], loaded)
+
+    def test_async_client_is_imported_on_first_use(self):
+        self.assertEqual(["AsyncClient", "True"], self.run_python(
+            "import sys; from cloudshare import AsyncClient; print(AsyncClient.__name__, 'asyncio' in sys.modules)"))
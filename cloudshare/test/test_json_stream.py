@@ -0,0 +1,91 @@
+import json
+import unittest
+from mock import Mock
+
+from ..json_stream import iter_array
+from ..requester import Requester, ResponseError
+
+DOCUMENT = json.dumps([{"id": "EN%d" % i, "name": "café %d" % i, "vms": [1, 2.5, None]} for i in range(20)]
+                      + [12345, "a,]b", True, None, -0.5e3]).encode('utf-8')
+
+
+def _chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class _FakeStream(object):
+
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    def iter_content(self):
+        return iter(_chunked(self.body, 5))
+
+    def read(self):
+        return self.body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class TestIterArray(unittest.TestCase):
+
+    def test_yields_the_same_items_as_json_loads_for_every_chunk_size(self):
+        expected = json.loads(DOCUMENT)
+
+        for size in (1, 2, 3, 7, 64, len(DOCUMENT)):
+            self.assertEqual(expected, list(iter_array(_chunked(DOCUMENT, size))), size)
+
+    def test_items_are_yielded_before_the_body_is_complete(self):
+        consumed = []
+
+        def chunks():
+            for chunk in _chunked(DOCUMENT, 16):
+                consumed.append(chunk)
+                yield chunk
+
+        first = next(iter_array(chunks()))
+
+        self.assertEqual("EN0", first["id"])
+        self.assertLess(sum(len(c) for c in consumed), len(DOCUMENT))
+
+    def test_empty_array_yields_nothing(self):
+        self.assertEqual([], list(iter_array([b" [ ", b" ] "])))
+
+    def test_non_array_document_is_yielded_whole(self):
+        self.assertEqual([{"message": "not found"}], list(iter_array([b'{"message": ', b'"not found"}'])))
+
+    def test_truncated_array_raises(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_array([b'[{"id": 1}, {"id"']))
+
+
+class TestRequesterIterItems(unittest.TestCase):
+
+    def test_iter_items_streams_a_get_of_the_signed_url(self):
+        http = Mock()
+        http.stream = Mock(return_value=_FakeStream(200, b'[{"id": "EN1"}, {"id": "EN2"}]'))
+        authParamProvider = Mock()
+        authParamProvider.get = Mock(return_value="AUTH_PARAM")
+        requester = Requester(http, authParamProvider)
+
+        items = list(requester.iter_items("some.hostname.com", "API_ID", "API_KEY", "envs"))
+
+        self.assertEqual([{"id": "EN1"}, {"id": "EN2"}], items)
+        self.assertEqual("GET", http.stream.call_args[0][0])
+        self.assertEqual("https://some.hostname.com/api/v3/envs", http.stream.call_args[0][1])
+
+    def test_iter_items_raises_response_error_on_failure(self):
+        http = Mock()
+        http.stream = Mock(return_value=_FakeStream(401, b'{"message": "unauthorized"}'))
+        requester = Requester(http, Mock())
+
+        with self.assertRaises(ResponseError) as ctx:
+            list(requester.iter_items("some.hostname.com", "API_ID", "API_KEY", "envs"))
+
+        self.assertEqual(401, ctx.exception.status)
+        self.assertEqual({"message": "unauthorized"}, ctx.exception.content)
@@ -0,0 +1,166 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from ..client import Client
+from ..polling import ConditionalGet, PollPolicy, TransitionHistory, poll, poll_many
+from ..standin import StandIn
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestPollPolicy(unittest.TestCase):
+
+    def test_waits_grow_from_the_floor_to_the_ceiling(self):
+        policy = PollPolicy(floor=2, ceiling=10, factor=2, jitter=0)
+
+        self.assertEqual([2, 4, 8, 10, 10], [policy.delay(n) for n in range(5)])
+
+    def test_jitter_stays_within_the_bounds(self):
+        policy = PollPolicy(floor=2, ceiling=10, factor=2, jitter=0.5)
+        rng = random.Random(1)
+        delays = [policy.delay(2, rng=rng) for _ in range(200)]
+
+        self.assertTrue(all(4 <= d <= 10 for d in delays))
+        self.assertGreater(len(set(delays)), 100)
+
+    def test_waits_stop_at_the_expected_completion(self):
+        policy = PollPolicy(floor=2, ceiling=30, factor=2, jitter=0)
+
+        self.assertEqual(5, policy.delay(4, eta=5))
+        self.assertEqual(2, policy.delay(4, eta=0.5))
+        self.assertEqual(30, policy.delay(4, eta=0))
+
+
+class TestPoll(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.history = TransitionHistory(os.path.join(self.directory, "transitions.json"))
+        self.clock = _Clock()
+        self.policy = PollPolicy(floor=1, ceiling=8, factor=2, jitter=0, deadline=60)
+
+    def run_poll(self, states, **kwargs):
+        states = iter(states)
+        reports = []
+        status = poll(lambda: next(states), lambda pending: pending, "resume", policy=self.policy,
+                      history=self.history, report=reports.append, clock=self.clock,
+                      sleep=self.clock.sleep, **kwargs)
+        return status, reports
+
+    def test_reports_what_is_pending_until_done(self):
+        status, reports = self.run_poll([["vm1", "vm2"], ["vm2"], []])
+
+        self.assertTrue(status.done)
+        self.assertEqual(3, status.polls)
+        self.assertEqual([["vm1", "vm2"], ["vm2"]], [r.pending for r in reports])
+        self.assertEqual([1, 2], self.clock.sleeps)
+
+    def test_gives_up_at_the_deadline(self):
+        status, _ = self.run_poll([["vm1"]] * 100, deadline=10)
+
+        self.assertFalse(status.done)
+        self.assertEqual(["vm1"], status.pending)
+        self.assertEqual(10, status.elapsed)
+        self.assertEqual([1, 2, 4, 3], self.clock.sleeps)
+
+    def test_completed_operations_are_recorded(self):
+        self.run_poll([["vm1"], ["vm1"], []])
+
+        self.assertEqual(3, self.history.eta("resume"))
+        self.assertIsNone(self.history.eta("delete"))
+
+    def test_waits_stop_at_the_eta_from_past_transitions(self):
+        self.history.record("resume", 5)
+        _, reports = self.run_poll([["vm1"], ["vm1"], ["vm1"], []])
+
+        self.assertEqual([5, 4, 2], [r.eta for r in reports])
+        self.assertEqual([1, 2, 2], self.clock.sleeps)
+
+    def test_history_keeps_the_latest_durations(self):
+        history = TransitionHistory(os.path.join(self.directory, "nested", "h.json"), keep=3)
+        for seconds in (100, 1, 2, 3):
+            history.record("suspend", seconds)
+
+        self.assertEqual(2, TransitionHistory(history.path).eta("suspend"))
+
+
+class TestPollMany(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.history = TransitionHistory(os.path.join(self.directory, "transitions.json"))
+        self.clock = _Clock()
+        self.policy = PollPolicy(floor=1, ceiling=8, factor=2, jitter=0, deadline=60)
+
+    def run_poll(self, states, **kwargs):
+        fetches = dict((key, iter(values).__next__) for key, values in states.items())
+        reports = []
+        statuses = poll_many(fetches, lambda pending: pending, "suspend", policy=self.policy,
+                             history=self.history, report=lambda s: reports.append(dict(s)), clock=self.clock,
+                             sleep=self.clock.sleep, **kwargs)
+        return statuses, reports
+
+    def test_one_wait_per_round_for_every_key(self):
+        statuses, reports = self.run_poll({"env1": [["vm1"], []], "env2": [["vm1"], ["vm2"], []], "env3": [[]]})
+
+        self.assertTrue(all(s.done for s in statuses.values()))
+        self.assertEqual({"env1": 2, "env2": 3, "env3": 1}, dict((k, s.polls) for k, s in statuses.items()))
+        self.assertEqual([1, 2], self.clock.sleeps)
+        self.assertEqual([["env1", "env2"], ["env2"]],
+                         [sorted(k for k, s in r.items() if not s.done) for r in reports])
+        self.assertEqual(1, self.history.eta("suspend"))
+
+    def test_a_batch_is_one_sample_of_the_history(self):
+        self.history.record("suspend", 30)
+        self.run_poll(dict(("env%d" % i, [["vm1"]] * (i % 3) + [[]]) for i in range(30)))
+
+        with open(self.history.path) as f:
+            self.assertEqual([30, 1], json.load(f)["suspend"])
+
+    def test_failed_fetches_stay_pending_until_the_deadline(self):
+        def fail():
+            raise IOError("connection reset")
+
+        statuses = poll_many({"env1": fail, "env2": lambda: []}, lambda pending: pending, "suspend",
+                             policy=self.policy, deadline=5, clock=self.clock, sleep=self.clock.sleep)
+
+        self.assertTrue(statuses["env2"].done)
+        self.assertFalse(statuses["env1"].done)
+        self.assertEqual(["connection reset"], statuses["env1"].pending)
+        self.assertIsInstance(statuses["env1"].content, IOError)
+        self.assertEqual(5, statuses["env1"].elapsed)
+
+
+class TestConditionalGet(unittest.TestCase):
+
+    def test_unchanged_resources_come_back_as_304(self):
+        with StandIn(etags=True) as standin:
+            client = Client(standin.url, "API_ID", "API_KEY", coalesce=False)
+            env_id = client.get("envs").content[0]["id"]
+            fetch = ConditionalGet(client, "envs/actions/getextended", {"envId": env_id})
+
+            first = fetch()
+            self.assertEqual(first, fetch())
+            self.assertEqual(1, fetch.not_modified)
+
+            client.put("envs/actions/suspend", {"envId": env_id})
+            self.assertEqual("Suspended", fetch()["statusText"])
+            self.assertEqual(1, fetch.not_modified)
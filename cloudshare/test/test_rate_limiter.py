@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from mock import Mock
+
+from ..http import Http
+from ..rate_limiter import FileTokenBucket, SqliteTokenBucket, TokenBucket, rate_limiter
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _take(args):
+    path, count = args
+    bucket = rate_limiter(0.01, burst=10, path=path)
+    return sum(1 for _ in range(count) if bucket.reserve() == 0)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_goes_out_immediately_then_requests_are_spaced_by_the_rate(self):
+        clock = _Clock()
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+
+        waits = [bucket.reserve() for _ in range(5)]
+
+        self.assertEqual([0, 0, 0, 0.5, 1.0], waits)
+
+    def test_tokens_refill_over_time_up_to_the_burst(self):
+        clock = _Clock()
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+        for _ in range(3):
+            bucket.reserve()
+
+        clock.now += 100
+
+        self.assertEqual([0, 0, 0, 0.5], [bucket.reserve() for _ in range(4)])
+
+    def test_acquire_sleeps_for_the_reserved_wait(self):
+        clock = _Clock()
+        sleep = Mock()
+        bucket = TokenBucket(rate=4, burst=1, clock=clock, sleep=sleep)
+
+        bucket.acquire()
+        bucket.acquire()
+
+        sleep.assert_called_once_with(0.25)
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+class TestSharedTokenBuckets(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _assert_budget_is_shared(self, make):
+        clock = _Clock()
+        first, second = make(clock), make(clock)
+
+        waits = [first.reserve(), second.reserve(), first.reserve(), second.reserve()]
+        first.close()
+        second.close()
+
+        self.assertEqual([0, 0, 1.0, 2.0], waits)
+
+    def test_file_buckets_on_the_same_path_share_one_budget(self):
+        path = os.path.join(self.dir, "rate")
+        self._assert_budget_is_shared(lambda clock: FileTokenBucket(path, rate=1, burst=2, clock=clock))
+
+    def test_sqlite_buckets_on_the_same_database_share_one_budget(self):
+        path = os.path.join(self.dir, "rate.db")
+        self._assert_budget_is_shared(lambda clock: SqliteTokenBucket(path, rate=1, burst=2, clock=clock))
+
+    def test_factory_picks_the_backend_from_the_path(self):
+        self.assertIsInstance(rate_limiter(1), TokenBucket)
+        self.assertIsInstance(rate_limiter(1, path=os.path.join(self.dir, "r")), FileTokenBucket)
+        self.assertIsInstance(rate_limiter(1, path=os.path.join(self.dir, "r.db")), SqliteTokenBucket)
+
+    def test_processes_never_exceed_the_burst_together(self):
+        for name in ("rate", "rate.db"):
+            path = os.path.join(self.dir, name)
+            with multiprocessing.get_context("spawn").Pool(3) as pool:
+                immediate = sum(pool.map(_take, [(path, 8)] * 3))
+
+            self.assertEqual(10, immediate, name)
+
+
+class TestHttpRateLimiting(unittest.TestCase):
+
+    def test_every_request_takes_a_token_before_it_is_sent(self):
+        limiter = Mock()
+        pool = Mock()
+        pool.get = Mock(side_effect=RuntimeError("sent"))
+        http = Http(pool, rate_limiter=limiter)
+
+        with self.assertRaises(RuntimeError):
+            http.request("GET", "https://some.hostname.com/api/v3/envs", {}, None)
+
+        limiter.acquire.assert_called_once_with()
@@ -0,0 +1,65 @@
+import unittest
+from mock import Mock
+
+from ..codec import JsonCodec
+from ..http import Response
+from ..requester import Requester
+
+
+class TestResponse(unittest.TestCase):
+
+    def test_responses_have_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            Response(200, b"{}").__dict__
+
+    def test_content_is_the_body_until_a_codec_is_attached(self):
+        res = Response(200, b'{"id": "EN1"}')
+
+        self.assertEqual(b'{"id": "EN1"}', res.content)
+        res.codec = JsonCodec()
+        self.assertEqual({"id": "EN1"}, res.content)
+        self.assertEqual(b'{"id": "EN1"}', res.body)
+
+    def test_json_is_parsed_on_first_access_only(self):
+        codec = Mock()
+        codec.loads = Mock(return_value={"id": "EN1"})
+        res = Response(200, b'{"id": "EN1"}', codec=codec)
+
+        self.assertFalse(res.parsed)
+        codec.loads.assert_not_called()
+        res.content
+        res.content
+        codec.loads.assert_called_once_with(b'{"id": "EN1"}')
+        self.assertTrue(res.parsed)
+
+    def test_bodies_that_are_not_json_decode_to_none(self):
+        self.assertIsNone(Response(502, b"<html>Bad gateway</html>", codec=JsonCodec()).content)
+        self.assertIsNone(Response(204, b"", codec=JsonCodec()).content)
+
+    def test_copies_share_the_body_but_not_the_decoded_content(self):
+        res = Response(200, b'{"vms": []}', {"etag": "1"}, codec=JsonCodec())
+        res.content["vms"].append("VM1")
+
+        other = res.copy()
+        other.content["vms"].append("VM2")
+        other.headers["etag"] = "2"
+
+        self.assertIs(res.body, other.body)
+        self.assertEqual({"vms": ["VM1"]}, res.content)
+        self.assertEqual({"vms": ["VM1", "VM2"]}, other.content)
+        self.assertEqual("1", res.headers["etag"])
+
+
+class TestRequesterResponses(unittest.TestCase):
+
+    def test_the_transport_response_is_returned_without_parsing_it(self):
+        transport_response = Response(200, b'{"id": "EN1"}')
+        http = Mock()
+        http.request = Mock(return_value=transport_response)
+        requester = Requester(http, Mock(), codec=JsonCodec())
+
+        res = requester.cs_request("some.hostname.com", "DELETE", "API_ID", "API_KEY", "envs/EN1")
+
+        self.assertIs(transport_response, res)
+        self.assertFalse(res.parsed)
+        self.assertEqual({"id": "EN1"}, res.content)
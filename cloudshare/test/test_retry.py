@@ -0,0 +1,142 @@
+import asyncio
+import socket
+import unittest
+from mock import Mock
+
+from ..async_requester import AsyncRequester
+from ..http import Response
+from ..requester import DeadlineExceeded, Requester
+from ..retry import RetryPolicy
+
+
+def _requester(responses, policy=None):
+    http = Mock()
+    http.request = Mock(side_effect=responses)
+    authParamProvider = Mock()
+    authParamProvider.get = Mock(side_effect=["SIG%d" % i for i in range(10)])
+    sleeps = []
+    requester = Requester(http, authParamProvider, policy or RetryPolicy(jitter=False), sleep=sleeps.append)
+    return requester, http, sleeps
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_backoff_grows_exponentially_up_to_the_cap(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+
+        self.assertEqual([1, 2, 4, 5, 5], [policy.backoff(n) for n in range(5)])
+
+    def test_jittered_backoff_stays_within_the_exponential_bound(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=30)
+
+        delays = [policy.backoff(3) for _ in range(200)]
+
+        self.assertTrue(all(0 <= d <= 8 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_retry_after_seconds_and_dates_are_understood(self):
+        self.assertEqual(7.0, RetryPolicy().backoff(0, "7"))
+        self.assertEqual(0.0, RetryPolicy().backoff(0, "Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertEqual(120.0, RetryPolicy().backoff(0, "3600"))
+
+    def test_only_idempotent_methods_are_retried_unless_opted_in(self):
+        policy = RetryPolicy()
+
+        self.assertTrue(policy.allows("GET", None, 0))
+        self.assertTrue(policy.allows("DELETE", None, 0))
+        self.assertFalse(policy.allows("POST", None, 0))
+        self.assertTrue(policy.allows("POST", True, 0))
+        self.assertTrue(RetryPolicy(retry_post=True).allows("POST", None, 0))
+        self.assertFalse(policy.allows("GET", None, 3))
+
+
+class TestRequesterRetries(unittest.TestCase):
+
+    def test_throttled_get_is_retried_and_the_count_reported(self):
+        requester, http, sleeps = _requester([Response(429, b"", {"retry-after": "2"}),
+                                              Response(503, b""),
+                                              Response(200, b'{"id": 1}')])
+
+        res = requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs")
+
+        self.assertEqual(200, res.status)
+        self.assertEqual({"id": 1}, res.content)
+        self.assertEqual(2, res.retries)
+        self.assertEqual([2.0, 1.0], sleeps)
+
+    def test_every_attempt_is_signed_again(self):
+        requester, http, _ = _requester([Response(503, b""), Response(200, b"{}")])
+
+        requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs")
+
+        signatures = [c[0][2]["Authorization"] for c in http.request.call_args_list]
+        self.assertEqual(["cs_sha1 SIG0", "cs_sha1 SIG1"], signatures)
+
+    def test_post_is_not_retried_by_default(self):
+        requester, http, _ = _requester([Response(503, b""), Response(200, b"{}")])
+
+        res = requester.cs_request("some.hostname.com", "POST", "API_ID", "API_KEY", "class", content={})
+
+        self.assertEqual(503, res.status)
+        self.assertEqual(0, res.retries)
+
+    def test_post_is_retried_when_the_caller_opts_in(self):
+        requester, http, _ = _requester([Response(503, b""), Response(200, b"{}")])
+
+        res = requester.cs_request("some.hostname.com", "POST", "API_ID", "API_KEY", "class", content={},
+                                   idempotent=True)
+
+        self.assertEqual(200, res.status)
+
+    def test_connection_errors_are_retried_then_raised_when_attempts_run_out(self):
+        requester, http, sleeps = _requester([ConnectionResetError()] * 4, RetryPolicy(total=3, jitter=False))
+
+        with self.assertRaises(ConnectionResetError):
+            requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs")
+
+        self.assertEqual(4, http.request.call_count)
+        self.assertEqual(3, len(sleeps))
+
+    def test_client_errors_are_returned_without_retrying(self):
+        requester, http, _ = _requester([Response(404, b'{"message": "nope"}')])
+
+        res = requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs/EN1")
+
+        self.assertEqual(404, res.status)
+        self.assertEqual(1, http.request.call_count)
+
+    def test_the_deadline_bounds_each_attempt_and_the_retries(self):
+        requester, http, sleeps = _requester([socket.timeout(), socket.timeout(), Response(200, b"{}")],
+                                             RetryPolicy(backoff_factor=1, jitter=False))
+        now = [0.0]
+        requester.clock = lambda: now[0]
+        requester.sleep = lambda delay: now.__setitem__(0, now[0] + delay)
+
+        with self.assertRaises(DeadlineExceeded):
+            requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs", timeout=30, deadline=2.5)
+
+        self.assertEqual([2.5, 1.5], [c[1]["timeout"] for c in http.request.call_args_list])
+
+    def test_a_retryable_response_is_returned_when_no_time_is_left(self):
+        requester, http, sleeps = _requester([Response(503, b""), Response(200, b"{}")])
+        requester.clock = lambda: 0.0
+
+        res = requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs", deadline=0.1)
+
+        self.assertEqual(503, res.status)
+        self.assertEqual([], sleeps)
+
+    def test_async_requester_retries_too(self):
+        responses = iter([Response(503, b""), Response(200, b"{}")])
+
+        class _Http(object):
+            async def request(self, method, url, headers, content):
+                return next(responses)
+
+        async def no_sleep(delay):
+            pass
+
+        requester = AsyncRequester(_Http(), Mock(), RetryPolicy(), sleep=no_sleep)
+        res = asyncio.run(requester.cs_request("some.hostname.com", "GET", "API_ID", "API_KEY", "envs"))
+
+        self.assertEqual(1, res.retries)
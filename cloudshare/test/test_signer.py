@@ -0,0 +1,52 @@
+import threading
+import unittest
+from mock import Mock, patch
+
+from ..authentication_parameter_provider import AuthenticationParameterProvider
+from ..hmacer import HMACer
+from ..signer import Signer
+from ..token_generator import TokenGenerator
+
+
+class TestSigner(unittest.TestCase):
+
+    def test_signature_matches_the_authentication_parameter_provider(self):
+        tokenGenerator = Mock()
+        tokenGenerator.generate = Mock(return_value="TOKEN12345")
+        signer = Signer(tokenGenerator, clock=lambda: 1700000000.5)
+        provider = AuthenticationParameterProvider(tokenGenerator, HMACer())
+
+        for apiKey, url in [("API_KEY", "https://somehost.com/api/v3/callme"),
+                            ("OTHER_KEY", "https://somehost.com/api/v3/envs?name=caf%C3%A9"),
+                            ("API_KEY", "https://somehost.com/api/v3/class")]:
+            with patch("time.time", return_value=1700000000.5):
+                expected = provider.get(apiId="API_ID", apiKey=apiKey, url=url)
+
+            self.assertEqual(expected, signer.get(apiId="API_ID", apiKey=apiKey, url=url))
+
+    def test_seeded_keys_are_bounded(self):
+        signer = Signer(max_keys=2)
+
+        for i in range(5):
+            signer.get(apiId="API_ID", apiKey="KEY%d" % i, url="https://somehost.com/api/v3/envs")
+
+        self.assertLessEqual(len(signer._seeded), 2)
+
+
+class TestTokenGeneratorThreads(unittest.TestCase):
+
+    def test_threads_sharing_a_generator_never_get_the_same_token(self):
+        generator = TokenGenerator()
+        tokens = []
+
+        def work():
+            tokens.extend(generator.generate() for _ in range(2000))
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(16000, len(set(tokens)))
+        self.assertTrue(all(len(t) == 10 and t.isalnum() for t in tokens))
@@ -0,0 +1,108 @@
+import time
+import unittest
+
+from ..client import Client
+from ..retry import RetryPolicy
+from ..standin import StandIn, StandInState
+
+
+class TestStandIn(unittest.TestCase):
+
+    def setUp(self):
+        self.standin = StandIn(seed=1).start()
+        self.addCleanup(self.standin.stop)
+        self.client = Client(self.standin.url, "API_ID", "API_KEY", retry_policy=RetryPolicy(total=0))
+
+    def test_serves_the_seeded_account(self):
+        projects = self.client.get("projects").content
+        blueprints = self.client.get("projects/%s/blueprints" % projects[0]["id"]).content
+        envs = self.client.get("envs").content
+
+        self.assertEqual(2, len(projects))
+        self.assertEqual(5, len(blueprints))
+        self.assertEqual(20, len(envs))
+        self.assertNotIn("vms", envs[0])
+        self.assertEqual(3, len(self.client.get("envs/actions/getextended", {"envId": envs[0]["id"]}).content["vms"]))
+
+    def test_actions_change_the_state(self):
+        env = self.client.get("envs").content[0]
+
+        res = self.client.put("envs/actions/suspend", {"envId": env["id"]})
+        extended = self.client.get("envs/actions/getextended", {"envId": env["id"]}).content
+
+        self.assertEqual(204, res.status)
+        self.assertEqual("Suspended", extended["statusText"])
+        self.assertEqual(set(["Suspended"]), set(vm["statusText"] for vm in extended["vms"]))
+
+    def test_classes_can_be_created_and_deleted(self):
+        created = self.client.post("class", {"name": "New class"}).content
+
+        self.assertEqual("New class", self.client.get("class/" + created["id"]).content["name"])
+        self.assertEqual(204, self.client.delete("class/" + created["id"]).status)
+        self.assertEqual(404, self.client.get("class/" + created["id"]).status)
+
+    def test_collection_routes_that_are_not_modelled_answer_empty(self):
+        self.assertEqual([], self.client.get("teams").content)
+        self.assertEqual(404, self.client.get("nothing/here").status)
+
+    def test_requests_need_a_signature(self):
+        res = self.client.http.request("GET", self.standin.url + "/api/v3/envs", {}, None)
+
+        self.assertEqual(401, res.status)
+
+    def test_injected_failures_are_retried_by_the_client(self):
+        client = Client(self.standin.url, "API_ID", "API_KEY",
+                        retry_policy=RetryPolicy(total=3, backoff_factor=0))
+        self.standin.retry_after = 0
+        self.standin.fail_next(None, path="regions")
+        self.standin.fail_next(429, path="regions")
+        self.standin.fail_next(503, path="regions")
+
+        res = client.get("regions")
+
+        self.assertEqual(200, res.status)
+        self.assertEqual(3, res.retries)
+        self.assertEqual(3, self.standin.injected)
+
+    def test_latency_is_applied_per_endpoint(self):
+        self.standin.latency = {"regions": 0.05, "*": 0.0}
+
+        start = time.monotonic()
+        self.client.get("projects")
+        fast = time.monotonic() - start
+        start = time.monotonic()
+        self.client.get("regions")
+
+        self.assertLess(fast, 0.05)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_large_payloads_are_gzipped(self):
+        standin = StandIn(state=StandInState(scale=10, padding=500)).start()
+        self.addCleanup(standin.stop)
+
+        res = Client(standin.url, "API_ID", "API_KEY").get("envs")
+
+        self.assertEqual(200, len(res.content))
+        self.assertLess(res.wire_bytes, res.decoded_bytes)
+
+
+class TestStandInState(unittest.TestCase):
+
+    def test_status_changes_take_the_transition_time(self):
+        now = [0.0]
+        state = StandInState(transition_time=10, clock=lambda: now[0])
+        env_id = next(iter(state.envs))
+
+        self.assertEqual("Preparing", state.handle("GET", "envs/" + env_id, {}, None)[1]["statusText"])
+        now[0] = 10
+        self.assertEqual("Ready", state.handle("GET", "envs/" + env_id, {}, None)[1]["statusText"])
+        state.handle("DELETE", "envs/" + env_id, {}, None)
+        now[0] = 20
+        vms = state.handle("GET", "envs/actions/getextended", {"envId": env_id}, None)[1]["vms"]
+        self.assertEqual([None] * 3, [vm["internalIp"] for vm in vms])
+
+    def test_only_the_detailed_listing_has_the_status(self):
+        state = StandInState(scale=1)
+
+        self.assertTrue(all("statusText" not in e for e in state.handle("GET", "envs", {}, None)[1]))
+        self.assertTrue(all(e["statusText"] == "Ready" for e in state.handle("GET", "envs", {"brief": "false"}, None)[1]))
@@ -0,0 +1,144 @@
+import unittest
+from unittest import mock
+
+from ..client import Client
+from ..standin import StandIn
+from ..watch import GONE, EnvWatcher, TimeWheel
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTimeWheel(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.wheel = TimeWheel(tick=1.0, clock=self.clock)
+
+    def test_keys_come_due_in_order(self):
+        self.wheel.schedule("c", 3)
+        self.wheel.schedule("a", 0)
+        self.wheel.schedule("b", 1.5)
+
+        self.assertEqual(["a"], self.wheel.due())
+        self.clock.now = 5
+        self.assertEqual(["b", "c"], self.wheel.due())
+        self.assertEqual([], self.wheel.due())
+        self.assertEqual(0, len(self.wheel))
+
+    def test_spread_keys_are_evenly_spaced(self):
+        for i in range(30):
+            self.wheel.schedule(i, 0, spread=10)
+
+        per_tick = []
+        for _ in range(10):
+            per_tick.append(len(self.wheel.due()))
+            self.clock.sleep(self.wheel.next_tick())
+        self.assertEqual([3] * 10, per_tick)
+        self.assertEqual([1.0] * 10, self.clock.sleeps)
+
+
+class TestEnvWatcher(unittest.TestCase):
+
+    def watcher(self, standin, **kwargs):
+        self.clock = _Clock()
+        client = Client(standin.url, "API_ID", "API_KEY", coalesce=False, micro_cache_ttl=0)
+        watcher = EnvWatcher(client, steady_interval=10, transition_interval=1, list_interval=100, tick=1,
+                             max_workers=4, clock=self.clock, sleep=self.clock.sleep, **kwargs)
+        self.addCleanup(watcher.close)
+        return watcher
+
+    def advance(self, watcher, seconds):
+        # Steps through the ticks in [now, now + seconds).
+        deltas = []
+        until = self.clock.now + seconds
+        while self.clock.now + watcher.wheel.next_tick() < until:
+            self.clock.sleep(watcher.wheel.next_tick())
+            deltas.extend(watcher.step())
+        self.clock.now = until
+        return deltas
+
+    def test_reports_every_environment_then_only_changes(self):
+        with StandIn() as standin:
+            watcher = self.watcher(standin)
+            initial = watcher.refresh()
+            self.assertEqual(20, len(initial))
+            self.assertEqual({(None, "Ready")}, set((d["previous"], d["status"]) for d in initial))
+
+            env_id = initial[0]["id"]
+            watcher.client.put("envs/actions/suspend", {"envId": env_id})
+            deltas = self.advance(watcher, 10)
+
+            self.assertEqual([(env_id, "Ready", "Suspended")], [(d["id"], d["previous"], d["status"]) for d in deltas])
+            self.assertEqual(20, watcher.polls)
+
+    def test_polls_are_spread_over_the_interval(self):
+        with StandIn() as standin:
+            watcher = self.watcher(standin)
+            watcher.refresh()
+            per_tick = []
+            for _ in range(20):
+                polls = watcher.polls
+                self.advance(watcher, 1)
+                per_tick.append(watcher.polls - polls)
+
+            self.assertEqual([2] * 20, per_tick)
+
+    def test_the_polling_threads_last_as_long_as_the_watcher(self):
+        with StandIn() as standin:
+            watcher = self.watcher(standin)
+            watcher.refresh()
+            watcher.step()
+            executor = watcher._executor
+            self.assertIsNotNone(executor)
+
+            self.advance(watcher, 20)
+
+            self.assertIs(executor, watcher._executor)
+            watcher.close()
+            self.assertIsNone(watcher._executor)
+
+    def test_idle_ticks_send_nothing(self):
+        with StandIn() as standin:
+            watcher = self.watcher(standin)
+            watcher.refresh()
+            self.advance(watcher, 10)
+            watcher.step()
+            requests = standin.requests
+
+            with mock.patch("cloudshare.watch.run_batch") as run_batch:
+                self.clock.now += 0.1
+                self.assertEqual([], watcher.step())
+
+            run_batch.assert_not_called()
+            self.assertEqual(requests, standin.requests)
+
+    def test_environments_in_transition_are_polled_faster(self):
+        with StandIn(transition_time=60) as standin:
+            watcher = self.watcher(standin)
+            self.advance(watcher, 30)
+
+            self.assertEqual({"Preparing"}, set(watcher.statuses().values()))
+            self.assertGreaterEqual(watcher.polls, 20 * 29)
+
+    def test_removed_environments_are_reported_gone(self):
+        with StandIn() as standin:
+            watcher = self.watcher(standin)
+            env_id = watcher.refresh()[0]["id"]
+            del standin.state.envs[env_id]
+
+            deltas = self.advance(watcher, 10)
+
+            self.assertEqual([(env_id, "Ready", GONE)], [(d["id"], d["previous"], d["status"]) for d in deltas])
+            self.assertEqual(19, len(watcher))
@@ -11,13 +11,42 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import random
+import os
 import string
+import threading
+
+TOKEN_LENGTH = 10
+# Random bytes drawn from the OS per refill, enough for ~400 tokens.
+_BATCH_SIZE = 4096
 
 
 class TokenGenerator(object):
+    """
+    Thread-safe random tokens, cut from os.urandom() bytes fetched in bulk.
+    """
 
     alphabet = string.ascii_lowercase + string.ascii_uppercase + string.digits
 
+    # Byte b maps to alphabet[b % 62]; bytes from 248 up are dropped so every
+    # character stays equally likely.
+    _limit = 256 - 256 % len(alphabet)
+    _table = bytes.maketrans(bytes(range(_limit)), (alphabet * 5)[:_limit].encode('ascii'))
+    _rejected = bytes(range(_limit, 256))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = ""
+        self._pos = 0
+
     def generate(self):
-        return ''.join(random.choice(TokenGenerator.alphabet) for _ in range(10))
+        with self._lock:
+            end = self._pos + TOKEN_LENGTH
+            if end > len(self._buffer):
+                self._buffer = self._buffer[self._pos:] + self._draw()
+                self._pos, end = 0, TOKEN_LENGTH
+            token = self._buffer[self._pos:end]
+            self._pos = end
+            return token
+
+    def _draw(self):
+        return os.urandom(_BATCH_SIZE).translate(self._table, self._rejected).decode('ascii')
@@ -0,0 +1,230 @@
+# Copyright 2015 CloudShare Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import concurrent.futures
+import logging
+import math
+import time
+
+from .batch import run_batch
+from .polling import ConditionalGet
+
+logger = logging.getLogger(__name__)
+
+# Statuses an environment stays in until someone acts on it; any other one is
+# a transition (Preparing, Resuming, Suspending, Deleting...) and polled faster.
+STEADY_STATUSES = frozenset(["Ready", "Suspended", "Deleted", "Error", "Expired"])
+
+# Status reported for an environment that left the listing.
+GONE = "Gone"
+
+DELTA_FIELDS = ("time", "id", "name", "previous", "status")
+
+
+class TimeWheel(object):
+    """
+    Keys due at given times, bucketed in slots of `tick` seconds: scheduling a
+    key and taking the due ones cost the same whatever the number of keys.
+    With spread, a key goes to the emptiest slot within that many seconds
+    after its due time, so that many keys on the same interval end up evenly
+    spaced instead of due together.
+    """
+
+    def __init__(self, tick=0.5, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self._slots = {}
+        self._current = int(clock() // tick)
+
+    def __len__(self):
+        return sum(len(keys) for keys in self._slots.values())
+
+    def schedule(self, key, delay, spread=0.0):
+        slot = max(self._current, int(math.ceil((self.clock() + delay) / self.tick)))
+        if spread > 0:
+            window = range(slot, slot + max(1, int(spread / self.tick)))
+            slot = min(window, key=lambda s: len(self._slots.get(s, ())))
+        self._slots.setdefault(slot, []).append(key)
+
+    def due(self):
+        """
+        Takes the keys whose time has come, earliest first.
+        """
+        now = int(self.clock() // self.tick)
+        keys = []
+        while self._current <= now:
+            keys.extend(self._slots.pop(self._current, ()))
+            self._current += 1
+        return keys
+
+    def next_tick(self):
+        """
+        Seconds until the next slot is due.
+        """
+        return max(0.0, self._current * self.tick - self.clock())
+
+
+class _Watched(object):
+
+    __slots__ = ("id", "name", "status", "fetch", "generation")
+
+    def __init__(self, env_id, name, fetch):
+        self.id = env_id
+        self.name = name
+        self.status = None
+        self.fetch = fetch
+        self.generation = 0
+
+
+class EnvWatcher(object):
+    """
+    Watches every environment of the account over one client. Each one is
+    polled (a conditional getextended, see polling.ConditionalGet) every
+    steady_interval seconds, or every transition_interval while its status
+    is not in STEADY_STATUSES. Polls are spread over a TimeWheel so the
+    request rate stays flat, and the ones due together run on up to
+    max_workers threads. The environment listing (brief=false) is read
+    again every list_interval seconds to pick up new environments and the
+    ones that went away.
+
+    refresh() and step() return the status changes they saw as deltas:
+    dicts with DELTA_FIELDS, "previous" being None for an environment seen
+    for the first time. The polling threads live as long as the watcher:
+    close() stops them.
+    """
+
+    def __init__(self, client, steady_interval=60.0, transition_interval=5.0, list_interval=300.0, tick=0.5,
+                 max_workers=8, clock=time.monotonic, sleep=time.sleep, wall_clock=time.time):
+        self.client = client
+        self.steady_interval = steady_interval
+        self.transition_interval = transition_interval
+        self.list_interval = list_interval
+        self.max_workers = max_workers
+        self.clock = clock
+        self.sleep = sleep
+        self.wall_clock = wall_clock
+        self.polls = 0
+        self.wheel = TimeWheel(tick, clock)
+        self._envs = {}
+        self._listed_at = None
+        self._executor = None
+
+    def __len__(self):
+        return len(self._envs)
+
+    def statuses(self):
+        return dict((env.id, env.status) for env in self._envs.values())
+
+    def refresh(self):
+        deltas = []
+        seen = set()
+        for item in self.client.iter_items("envs/", {"brief": "false"}):
+            env = self._envs.get(item["id"])
+            if env is None:
+                env = self._envs[item["id"]] = _Watched(
+                    item["id"], item.get("name"),
+                    ConditionalGet(self.client, "envs/actions/getextended", {"envId": item["id"]}))
+                self._schedule(env, 0.0, spread=self.steady_interval)
+            seen.add(env.id)
+            if item.get("statusText"):
+                self._update(env, item["statusText"], deltas)
+        for env_id in set(self._envs) - seen:
+            self._update(self._envs.pop(env_id), GONE, deltas)
+        self._listed_at = self.clock()
+        return deltas
+
+    def step(self):
+        """
+        Polls the environments now due; reads the listing again first when
+        list_interval has elapsed.
+        """
+        deltas = []
+        if self._listed_at is None or self.clock() - self._listed_at >= self.list_interval:
+            deltas.extend(self.refresh())
+        due = []
+        for env_id, generation in self.wheel.due():
+            env = self._envs.get(env_id)
+            if env is not None and env.generation == generation:
+                due.append(env)
+        if not due:
+            return deltas
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers,
+                                                                   thread_name_prefix="cloudshare-watch")
+        for result in run_batch(_poll, [{"env": env} for env in due], max_workers=self.max_workers,
+                                executor=self._executor):
+            env = result.spec["env"]
+            self.polls += 1
+            if result.error is not None:
+                status = getattr(result.error, "status", None)
+                if status == 404 and self._envs.pop(env.id, None) is not None:
+                    self._update(env, GONE, deltas)
+                    continue
+                logger.warning("Polling %s failed: %s", env.id, result.error)
+            else:
+                self._update(env, result.response, deltas)
+            if env.id in self._envs:
+                self._schedule(env, self._interval(env))
+        return deltas
+
+    def run(self, duration=None):
+        """
+        Yields the deltas of step() tick after tick, for duration seconds or
+        until closed.
+        """
+        until = self.clock() + duration if duration is not None else None
+        while True:
+            for delta in self.step():
+                yield delta
+            if until is not None and self.clock() >= until:
+                return
+            self.sleep(self.wheel.next_tick())
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _interval(self, env):
+        return self.steady_interval if env.status in STEADY_STATUSES else self.transition_interval
+
+    def _schedule(self, env, delay, spread=0.0):
+        # A newer schedule of the same environment voids the older wheel entries.
+        env.generation += 1
+        self.wheel.schedule((env.id, env.generation), delay, spread)
+
+    def _update(self, env, status, deltas):
+        if status == env.status:
+            return
+        previous, env.status = env.status, status
+        deltas.append({
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.wall_clock())),
+            "id": env.id,
+            "name": env.name,
+            "previous": previous,
+            "status": status,
+        })
+        if status not in STEADY_STATUSES and (previous is None or previous in STEADY_STATUSES) \
+                and env.id in self._envs:
+            # Caught by the listing while polled at the steady pace: follow it closely from now on.
+            self._schedule(env, self.transition_interval)
+
+
+def _poll(env):
+    return env.fetch()["statusText"]
@@ -2,9 +2,27 @@
 import sys
 import os
 import sys
-from .ioc import get_requester
+from .client import Client
+from .requester import ResponseError
+from .ioc import get_connection_pool
 import re
 import copy
+import threading
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Client(hostname=os.environ.get('CLOUDSHARE_HOSTNAME', "use.cloudshare.com"),
+                             api_id=os.environ.get('CLOUDSHARE_API_ID'),
+                             api_key=os.environ.get('CLOUDSHARE_API_KEY'),
+                             pool=get_connection_pool())
+        return _client
+
 
 def memoize(f):
     memo = {}
@@ -275,16 +293,9 @@ def put(path, queryParams=None, content=None):
 
 
 def request(method, path, queryParams=None, content=None):
-    res = get_requester().cs_request(hostname=os.environ.get('CLOUDSHARE_HOSTNAME', "use.cloudshare.com"),
-                                     method=method,
-                                     apiId=os.environ.get('CLOUDSHARE_API_ID'),
-                                     apiKey=os.environ.get('CLOUDSHARE_API_KEY'),
-                                     path=path,
-                                     queryParams=queryParams,
-                                     content=content)
+    res = get_client().request(method, path, queryParams=queryParams, content=content)
 
     if res.status // 100 != 2:
-        print(res.status, res.content)
-        raise Exception('Error')
+        raise ResponseError(res.status, res.content)
 
     return res.content
@@ -2,7 +2,9 @@
 import sys
 import os
 import sys
-from .ioc import get_requester
+from .client import Client
+from .requester import ResponseError
+from .ioc import get_connection_pool
 import re
 import copy
 
@@ -19,10 +21,14 @@ def memoize(f):
 
 
 class Wrapper(object):
-    def __init__(self, hostname, api_id, api_key):
+    def __init__(self, hostname, api_id, api_key, client=None, http_cache=None):
         self.hostname = hostname or os.environ.get('CLOUDSHARE_HOSTNAME', "use.cloudshare.com")
         self.api_id = api_id or os.environ.get('CLOUDSHARE_API_ID')
         self.api_key = api_key or os.environ.get('CLOUDSHARE_API_KEY')
+        # http_cache keeps project/blueprint/policy/region lists on disk, so
+        # get_obj_id() does not download them again in every new process.
+        self.client = client or Client(self.hostname, self.api_id, self.api_key,
+                                        pool=get_connection_pool(), http_cache=http_cache)
 
     @memoize
     def get_obj_id(self, url, obj_name):
@@ -277,16 +283,9 @@ class Wrapper(object):
         return self.request('DELETE', path)
 
     def request(self, method, path, queryParams=None, content=None):
-        res = get_requester().cs_request(hostname=self.hostname,
-                                         method=method,
-                                         apiId=self.api_id,
-                                         apiKey=self.api_key,
-                                         path=path,
-                                         queryParams=queryParams,
-                                         content=content)
+        res = self.client.request(method, path, queryParams=queryParams, content=content)
 
         if res.status // 100 != 2:
-            print(res.status, res.content)
-            raise Exception('Error')
+            raise ResponseError(res.status, res.content)
 
         return res.content
@@ -6,11 +6,16 @@ if [ ! -f "./mxcloudshare.py" ]; then
     echo "Error: mxcloudshare.py script not found in the current directory."
     exit 1
 fi
-# Check if the user provided an environment ID
+# Check if the user selected environments
 if [ -z "$1" ]; then
-    echo "Resume a suspended environment in the cloudshare service."
+    echo "Resume suspended environments in the cloudshare service."
     echo "Usage: $0 <environment_id>"
+    echo "       $0 --envid <id> [--envid <id>...] [--name <regex>] [--id-file <file>]"
     exit 1
 fi
-#./mxcloudshare.py --loglevel debug --outformat table --keyfile ./cloudshare.keys env-resume --envid "$1"
-./mxcloudshare.py --outformat table --keyfile ./cloudshare.keys env-resume --envid "$1"
+# A lone argument is an environment ID; anything else is passed on as options.
+if [ $# -eq 1 ] && [ "${1#-}" = "$1" ]; then
+    set -- --envid "$1"
+fi
+#./mxcloudshare.py --loglevel debug --outformat table --keyfile ./cloudshare.keys env-resume "$@"
+./mxcloudshare.py --outformat table --keyfile ./cloudshare.keys env-resume "$@"
@@ -2,9 +2,11 @@
 
 #
 
+import itertools
 import json
 import logging
 import os
+import sys
 import time
 from collections import namedtuple
 from enum import Enum
@@ -13,13 +15,9 @@ from enum import Enum
 from typing import List, Optional
 
 # from traceback import print_tb
-import attr
-import pandas as pd
+# rich and dotenv are imported by the output formats and code paths
+# using them: every invocation of the env-*.sh wrappers pays for module load.
 import typer
-from dotenv import load_dotenv
-from rich import box, print, print_json
-from rich.console import Console
-from rich.table import Table
 from typing_extensions import Annotated
 
 import cloudshare
@@ -41,21 +39,116 @@ class OutFormat(str, Enum):
     json_fmt = "json"
     table_fmt = "table"
     card_fmt = "card"
+    ndjson_fmt = "ndjson"
 
 
-def print_results(results, output_format):
+# Tables take their columns from this many records, then print this many rows at a time.
+TABLE_SAMPLE = 50
+TABLE_CHUNK = 200
+# Room for the longest environment status ("Taking Snapshot").
+STATUS_WIDTH = 15
+
+
+def print_results(results, output_format, enrich=None, fields=None):
+    """Print results (a dict, a list or any iterable, read once) and return how
+    many records were printed. Lists and iterables go through --limit/--page
+    first; enrich(records) maps the iterable of records kept to the records to
+    print, so records on other pages cost nothing more and the ones kept can be
+    looked up in batches. fields, when given, are the CSV columns."""
+    if isinstance(results, dict):
+        records = [results]
+    else:
+        records = paginate(results)
+    if enrich is not None:
+        records = enrich(records)
+
     if output_format == OutFormat.table_fmt:
-        print_as_table(results)
+        return stream_table(records)
     elif output_format == OutFormat.json_fmt:
-        import json
-
-        json_results = json.dumps(results)
-        print_json(json_results)
+        if isinstance(results, dict):
+            print_json(next(iter(records)))
+            return 1
+        records = list(records)
+        print_json(records)
+        return len(records)
     elif output_format == OutFormat.csv_fmt:
-        logger.info("Csv not implemented yet")
+        return write_csv(records, fields)
+    elif output_format == OutFormat.ndjson_fmt:
+        return write_ndjson(records)
     elif output_format == OutFormat.card_fmt:
-        for r in results:
-            print_as_table(r)
+        count = 0
+        for r in records:
+            print_card(r)
+            count += 1
+        return count
+
+
+def write_ndjson(records, out=None):
+    """One compact JSON line per record, written as soon as it is produced."""
+    out = out or sys.stdout
+    count = 0
+    for r in records:
+        out.write(json.dumps(r, separators=(",", ":"), ensure_ascii=False) + "\n")
+        out.flush()
+        count += 1
+    return count
+
+
+def write_csv(records, fields=None, out=None, sample_size=TABLE_SAMPLE):
+    """Stream records as CSV, nested keys flattened into "parent.child"
+    columns. The header is fields or, without them, the keys of the first
+    sample_size records; keys first seen later are left out. Lists and dicts
+    are written as JSON."""
+    import csv
+
+    out = out or sys.stdout
+    records = iter(records)
+    if fields:
+        columns = list(fields)
+        sample = []
+    else:
+        sample = list(itertools.islice(records, sample_size))
+        if not sample:
+            return 0
+        columns = sample_columns(flatten_record(r) if isinstance(r, dict) else {"value": r} for r in sample)
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(columns)
+    count = 0
+    for r in itertools.chain(sample, records):
+        flat = flatten_record(r) if isinstance(r, dict) else {"value": r}
+        # A selected field naming a nested object gets the whole object.
+        writer.writerow([csv_value(flat[c] if c in flat else r.get(c) if isinstance(r, dict) else None)
+                         for c in columns])
+        out.flush()
+        count += 1
+    return count
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return value
+
+
+def paginate(records):
+    """The records of the --page (from 1) of --limit records, or all of them without --limit."""
+    limit = globalconf["limit"]
+    if not limit:
+        return iter(records)
+    start = (max(globalconf["page"], 1) - 1) * limit
+    return itertools.islice(records, start, start + limit)
+
+
+def print_json(data):
+    if sys.stdout.isatty():
+        # Highlighting is only worth importing rich for a terminal.
+        from rich import print_json as rich_print_json
+
+        rich_print_json(json.dumps(data))
+    else:
+        sys.stdout.write(json.dumps(data, indent=2, ensure_ascii=False) + "\n")
 
 
 globalconf = {
@@ -63,6 +156,27 @@ globalconf = {
     "tablewidth": 80,
     "API_ID": None,
     "API_KEY": None,
+    "retries": 3,
+    "rate": None,
+    "burst": None,
+    "rate_file": None,
+    "timings": False,
+    "http_cache": None,
+    "micro_cache_ms": 250,
+    "parallel": 4,
+    "hostname": "use.cloudshare.com",
+    "record": None,
+    "replay": None,
+    "replay_latency": 0.0,
+    "timeout": 60.0,
+    "deadline": None,
+    "hedge": False,
+    "circuit_breaker": True,
+    "limit": None,
+    "page": 1,
+    "wait_deadline": None,
+    "client": None,
+    "console": None,
 }
 
 app = typer.Typer(add_completion=False, pretty_exceptions_enable=False, name="mxCloudShare", help="Cloudshare automation tool")
@@ -184,18 +298,74 @@ def cs_post(path, content=None):
 def cs_get(path, queryParams=None):
     return cs_request("GET", path, queryParams=queryParams)
 
-def cs_put(path, queryParams=None):
-    return cs_request("PUT", path, queryParams=queryParams)
+def cs_put(path, queryParams=None, decode=True):
+    return cs_request("PUT", path, queryParams=queryParams, decode=decode)
+
+def cs_delete(path, queryParams=None, decode=True):
+    return cs_request("DELETE", path, queryParams=queryParams, decode=decode)
+
 
-def cs_delete(path, queryParams=None):
-    return cs_request("DELETE", path, queryParams=queryParams)
+def cs_iter(path, queryParams=None):
+    # Streams the elements of a list endpoint instead of loading the whole body.
+    try:
+        for item in get_client().iter_items(path, queryParams=queryParams):
+            yield item
+    except cloudshare.ResponseError as e:
+        message = e.content.get("message") if isinstance(e.content, dict) else e.content
+        raise Exception("{} {}".format(e.status, message))
 
 
-def cs_request(method, path, queryParams=None, content=None):
-    res = cloudshare.req(hostname="use.cloudshare.com", method=method, apiId=globalconf["API_ID"], apiKey=globalconf["API_KEY"], path=path, queryParams=queryParams, content=content)
+def cs_many(specs, parallel=None):
+    # Runs Client.request() for each spec concurrently, returning the decoded
+    # bodies in order; failures are logged and reported in place of their result.
+    results = []
+    for r in get_client().request_many(specs, max_workers=parallel or globalconf["parallel"]):
+        if r.ok:
+            results.append(r.content)
+            continue
+        if r.error is not None:
+            message = str(r.error)
+        else:
+            message = "{} {}".format(r.status, r.content.get("message") if isinstance(r.content, dict) else r.content)
+        logger.error("%s %s failed: %s", r.spec["method"], r.spec["path"], message)
+        results.append({"error": message})
+    return results
+
+
+def cs_request(method, path, queryParams=None, content=None, decode=True):
+    # decode=False returns the raw body without parsing it, for calls whose result is ignored.
+    res = get_client().request(method, path, queryParams=queryParams, content=content)
     if res.status // 100 != 2:
         raise Exception("{} {}".format(res.status, res.content["message"]))
-    return res.content
+    return res.content if decode else res.body
+
+
+def get_client():
+    # Built once and shared by every call of the command, so a run pays for one
+    # connection pool and one signer instead of one per request.
+    if globalconf["client"] is None:
+        limiter = None
+        if globalconf["rate"]:
+            limiter = cloudshare.rate_limiter(globalconf["rate"], globalconf["burst"], globalconf["rate_file"])
+        globalconf["client"] = cloudshare.Client(
+            hostname=globalconf["hostname"],
+            api_id=globalconf["API_ID"],
+            api_key=globalconf["API_KEY"],
+            retry_policy=cloudshare.RetryPolicy(total=globalconf["retries"]),
+            rate_limiter=limiter,
+            http_cache=cloudshare.HttpCache(globalconf["http_cache"]) if globalconf["http_cache"] else None,
+            micro_cache_ttl=globalconf["micro_cache_ms"] / 1000.0,
+            record=globalconf["record"],
+            replay=globalconf["replay"],
+            replay_latency=globalconf["replay_latency"],
+            timeout=globalconf["timeout"],
+            deadline=globalconf["deadline"],
+            hedge=globalconf["hedge"],
+            circuit_breaker=cloudshare.CircuitBreaker() if globalconf["circuit_breaker"] else None,
+        )
+        if globalconf["timings"]:
+            globalconf["client"].add_listener(cloudshare.LoggingListener(logger))
+    return globalconf["client"]
 
 
 def get_timestamp():
@@ -203,70 +373,171 @@ def get_timestamp():
 
 
 # ################################################################################
-def df_to_table(
-    pandas_dataframe: pd.DataFrame,
-    rich_table: Table,
-    show_index: bool = False,
-    index_name: Optional[str] = None,
-) -> Table:
-    """Convert a pandas.DataFrame obj into a rich.Table obj.
-    Args:
-        pandas_dataframe (DataFrame): A Pandas DataFrame to be converted to a rich Table.
-        rich_table (Table): A rich Table that should be populated by the DataFrame values.
-        show_index (bool): Add a column with a row count to the table. Defaults to True.
-        index_name (str, optional): The column name to give to the index column. Defaults to None, showing no value.
-    Returns:
-        Table: The rich Table instance passed, populated with the DataFrame values."""
-
-    if show_index:
-        index_name = str(index_name) if index_name else ""
-        rich_table.add_column(index_name)
-
-    for column in pandas_dataframe.columns:
-        rich_table.add_column(str(column))
-
-    for index, value_list in enumerate(pandas_dataframe.values.tolist()):
-        row = [str(index)] if show_index else []
-        row += [str(x) for x in value_list]
-        rich_table.add_row(*row)
-
-    return rich_table
+def flatten_record(record, prefix="", out=None):
+    """Flatten nested dicts into a single dict with "parent.child" keys,
+    the way pandas.json_normalize names its columns. Lists are kept as values."""
+    if out is None:
+        out = {}
+    for key, value in record.items():
+        name = prefix + str(key)
+        if isinstance(value, dict) and value:
+            flatten_record(value, name + ".", out)
+        else:
+            out[name] = value
+    return out
+
+
+def sample_columns(rows):
+    """Keys of flattened rows, in order of first appearance."""
+    columns = {}
+    for r in rows:
+        for key in r:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def cell_text(value):
+    return "" if value is None else str(value)
+
+
+def fit_widths(widths, available, headers=None, gap=3, minimum=4):
+    """Widths of the columns that fit on a line of available characters, gap
+    characters between two of them. No column gets narrower than its header
+    (headers are their widths) or minimum: the last columns are left out
+    while even that does not fit, then the widest ones are shrunk, one
+    character at a time. Returns the widths of the columns kept, in order;
+    the first one is always kept."""
+    widths = list(widths)
+    floors = [min(w, max(minimum, h)) for w, h in zip(widths, headers or [0] * len(widths))]
+
+    def line_width(cells):
+        return sum(cells) + gap * (len(cells) - 1)
+
+    while len(floors) > 1 and line_width(floors) > available:
+        floors.pop()
+    widths = widths[:len(floors)]
+    while line_width(widths) > available:
+        shrinkable = [i for i, w in enumerate(widths) if w > floors[i]]
+        if not shrinkable:
+            break
+        widths[max(shrinkable, key=widths.__getitem__)] -= 1
+    return widths
+
+
+def get_console():
+    # One Console for the whole run: creating one per table (or per card) cost
+    # more than rendering the rows.
+    if globalconf["console"] is None:
+        from rich.console import Console
+
+        globalconf["console"] = Console(width=globalconf["tablewidth"])
+    return globalconf["console"]
+
+
+# Alternate table rows are written with this SGR sequence (faint) on a terminal.
+DIM = "\x1b[2m%s\x1b[0m"
+
+
+def fit_cell(text, width):
+    # One line, padded or cut with an ellipsis to width characters.
+    text = text.replace("\n", " ")
+    if len(text) > width:
+        return text[:width - 1] + "\u2026"
+    return text.ljust(width)
+
+
+def stream_table(records, title=None, sample_size=TABLE_SAMPLE, chunk_size=TABLE_CHUNK, min_widths=None):
+    """Print records (dicts, flattened into "parent.child" columns) as a table
+    while they arrive, and return how many were printed.
+
+    Columns and their widths are fixed from the first sample_size records, so
+    keys first seen later are not shown and longer cells are cut with an
+    ellipsis. Columns that do not fit in the console width, even down to
+    their header's width, are left out. Rows are formatted as plain lines and written chunk_size at a
+    time, alternate rows dimmed on a terminal, without building the whole
+    table in memory or going through rich's layout. min_widths maps columns
+    to the width they get at least, for values longer than the sample's."""
+    from rich.text import Text
+
+    console = get_console()
+    records = iter(records)
+    sample = [flatten_record(r) if isinstance(r, dict) else {"value": r}
+              for r in itertools.islice(records, sample_size)]
+    if not sample:
+        return 0
+    columns = sample_columns(sample)
+    min_widths = min_widths or {}
+    widths = [max([len(str(c)), min_widths.get(c, 0)] + [len(cell_text(r.get(c))) for r in sample])
+              for c in columns]
+    # A space before the first column and after the last one, three between columns.
+    widths = fit_widths(widths, console.width - 2, [len(str(c)) for c in columns])
+    if len(widths) < len(columns):
+        logger.info("Columns %s left out of a %d-character table: pick columns with --field or widen it with "
+                    "--tablewidth", ", ".join(str(c) for c in columns[len(widths):]), console.width)
+        columns = columns[:len(widths)]
+    line_width = sum(widths) + 3 * len(columns) - 1
+
+    def line(cells):
+        return " " + "   ".join(fit_cell(cell, width) for cell, width in zip(cells, widths)) + " "
+
+    if title:
+        console.print(title, style="italic", justify="center", width=line_width, highlight=False)
+    console.print(Text(line([str(c) for c in columns]), style="bold"), no_wrap=True, crop=False)
+    console.print("\u2500" * line_width, no_wrap=True, crop=False, highlight=False)
+
+    dim = console.color_system is not None
+
+    def flush(lines, first_index):
+        if dim:
+            lines = [DIM % text_line if i % 2 else text_line for i, text_line in enumerate(lines, start=first_index)]
+        console.file.write("\n".join(lines) + "\n")
+        console.file.flush()
+
+    rows = itertools.chain(sample, (flatten_record(r) if isinstance(r, dict) else {"value": r} for r in records))
+    count = 0
+    lines = []
+    for row in rows:
+        lines.append(line([cell_text(row.get(c)) for c in columns]))
+        count += 1
+        if len(lines) == chunk_size:
+            flush(lines, count - len(lines))
+            lines = []
+    if lines:
+        flush(lines, count - len(lines))
+    return count
 
 
 def show_results(data, title=None):
     """Display results in a formatted table using global settings
 
     Args:
-        data: Data to display (list or dict)
+        data: Data to display (list, iterable or dict)
         title: Optional title for the table
     """
-    console = Console(width=globalconf["tablewidth"])
-
     if isinstance(data, dict):
         data = [data]
+    return stream_table(data, title=title)
 
-    df = pd.json_normalize(data)
-    table = Table(show_header=True, header_style="bold", title=title)
-    table = df_to_table(df, table)
-    table.row_styles = ["none", "dim"]
-    table.box = box.SIMPLE_HEAD
 
-    console.print(table)
+def print_card(record):
+    """Print one record as a card: a line per "parent.child" key and its
+    value, values cut with an ellipsis to the console width, then a rule."""
+    from rich.text import Text
 
-    return len(data)
-
-
-def print_as_table(d):
-    df = pd.json_normalize(d)
-    # Initiate a Table instance to be modified
-    table = Table(show_header=True, header_style="bold")
-    # Modify the table instance to have the data from the DataFrame
-    table = df_to_table(df, table)
-    # Update the style of the table
-    table.row_styles = ["none", "dim"]
-    table.box = box.SIMPLE_HEAD
-    console = Console(width=globalconf["tablewidth"])
-    console.print(table)
+    console = get_console()
+    flat = flatten_record(record) if isinstance(record, dict) else {"value": record}
+    if not flat:
+        return
+    key_width = max(len(str(k)) for k in flat)
+    # A space before the key, three between key and value.
+    value_width = max(console.width - key_width - 5, 8)
+    for key, value in flat.items():
+        line = Text(" ")
+        line.append(str(key).ljust(key_width), style="bold")
+        line.append("   " + fit_cell(cell_text(value), value_width).rstrip())
+        console.print(line, no_wrap=True, crop=False)
+    console.print("\u2500" * min(console.width, key_width + value_width + 5), no_wrap=True, crop=False,
+                  highlight=False)
 
 
 
@@ -277,43 +548,105 @@ def get_vms(envid: Annotated[str, typer.Option(help="Environment Id")]):
 
 
 @app.command()
-def env_show_all():
+def env_show_all(
+    field: Annotated[Optional[List[str]], typer.Option(help="Attribute to show (repeat for multiple attributes)")] = [],
+):
     """
     Show all environments
     """
-    envs = cs_get("envs/")
-    if len(envs) == 0:
+    # The detailed listing carries statusText, saving a getextended call per environment.
+    listing = enumerate(cs_iter("envs/", {"brief": "false"}), start=1)
+    lookup = not field or "status" in field
+    printed = print_results(listing, globalconf["outputformat"], fields=field,
+                            enrich=lambda items: with_status(items, lookup, field))
+    if printed == 0:
         logger.info("No environments found")
 
-    i = 0
-    for e in envs:
-        i += 1
-        e["status"] = env_get_status(e.get('id', ''))
-        e["index"] = i
 
-    print_results(envs, globalconf["outputformat"])
+def with_status(items, lookup=True, fields=None):
+    """(index, env) pairs -> envs with their 1-based position in the full listing
+    as "index" and, with lookup, their "status": the statusText of the listing
+    when it has one, else the one of envs/actions/getextended, looked up
+    --parallel at a time. fields, when given, are the only keys kept."""
+    items = iter(items)
+    chunk_size = max(globalconf["parallel"], 1) * 4
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            return
+        looked_up = {}
+        if lookup:
+            missing = [(i, e) for i, e in chunk if not e.get("statusText")]
+            specs = [{"method": "GET", "path": "envs/actions/getextended", "queryParams": {"envId": e.get("id", "")}}
+                     for _, e in missing]
+            for (i, e), extended in zip(missing, cs_many(specs) if specs else []):
+                if not isinstance(extended, dict):
+                    # A 2xx without a JSON object: no status, but the rest of the listing still prints.
+                    logger.warning("No status in the getextended response of %s", e.get("id"))
+                    extended = {}
+                looked_up[i] = extended.get("statusText", extended.get("error"))
+        for i, e in chunk:
+            if lookup:
+                e["status"] = e.get("statusText") or looked_up[i]
+            e["index"] = i
+            yield {k: e[k] for k in fields if k in e} if fields else e
+
+
+def numbered(items):
+    # (index, record) pairs -> records with their 1-based position in the full listing.
+    for i, record in items:
+        record["index"] = i
+        yield record
 
 
-
-
-def env_wait_condition(envId: str, checks: str, delay_secs: int = 3, max_retry: int = 10):
+@app.command()
+def env_watch(
+    interval: Annotated[float, typer.Option(help="Seconds between polls of an environment in a steady status (Ready, Suspended...).")] = 60.0,
+    transition_interval: Annotated[float, typer.Option(help="Seconds between polls of an environment in transition (Resuming, Suspending...).")] = 5.0,
+    list_interval: Annotated[float, typer.Option(help="Seconds between listings that pick up new and removed environments.")] = 300.0,
+    duration: Annotated[Optional[float], typer.Option(help="Stop after this many seconds (default: until interrupted).")] = None,
+):
+    """
+    Watch all environments, printing their status changes as they happen
+    """
+    from cloudshare.watch import DELTA_FIELDS, EnvWatcher
+
+    # One process, one connection pool: polls are spread over the interval instead
+    # of a full env-show-all scan every time.
+    watcher = EnvWatcher(get_client(), steady_interval=interval, transition_interval=transition_interval,
+                         list_interval=list_interval, max_workers=globalconf["parallel"])
+    try:
+        # The first changes are the status of every environment in the listing, then one line per change.
+        initial = watcher.refresh()
+        deltas = itertools.chain(initial, watcher.run(duration))
+        output_format = globalconf["outputformat"]
+        if output_format in (OutFormat.table_fmt, OutFormat.card_fmt):
+            stream_table(deltas, sample_size=max(len(initial), 1), chunk_size=1,
+                         min_widths={"previous": STATUS_WIDTH, "status": STATUS_WIDTH})
+        elif output_format == OutFormat.csv_fmt:
+            write_csv(deltas, DELTA_FIELDS)
+        else:
+            # A JSON array cannot be printed before the watch ends: one object per line instead.
+            write_ndjson(deltas)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    logger.info("Watched %d environments with %d polls", len(watcher), watcher.polls)
+
+
+
+
+def vm_pending(checks):
     """
-    Poll an environment for a status
-    envid: environment id
-    conditions: list of dicts with conditions to check for. dict should contain:
+    pending() for cloudshare.polling: the names of the VMs of a getextended
+    result failing one of the checks, a list of dicts with:
         - property: property of vms to check for
         - check_fn: function to execute against property that must be true
-    delay_secs: seconds to wait between polls
-    max_retry: maximum number of retries
-    """
-    stillWorking = True
-    retries = 0
-    while stillWorking and retries < max_retry:
-        machines = get_vms(envId)
-        retries += 1
-        for m in machines:
-            stillWorking = False
-            # check if all conditions are met
+    """
+    def pending(extended):
+        names = []
+        for m in extended["vms"]:
             for condition in checks:
                 property_name = condition["property"]
                 check_fn = condition["check_fn"]
@@ -321,86 +654,190 @@ def env_wait_condition(envId: str, checks: str, delay_secs: int = 3, max_retry:
                     raise Exception(f"VM {m['name']} does not have property {property_name}")
 
                 if not check_fn(m[property_name]):
-                    logger.debug(f"VM {m['name']} failed condition: {property_name} is {m[property_name]}, let's wait more...")
-                    logger.debug(f"VM is {json.dumps(m, indent=2, sort_keys=True)}")
-                    stillWorking = True
-                    # stop checking at first condition failed and wait next retry
+                    logger.debug("VM %s failed condition: %s is %s, let's wait more...", m['name'], property_name, m[property_name])
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("VM is %s", json.dumps(m, indent=2, sort_keys=True))
+                    names.append(m["name"])
                     break
-            # stop checking as soon as a VM failed, and wait next retry
-            if stillWorking:
-                break
-
-        # if still working, wait for delay_secs before next retry
-        if stillWorking:
-            logger.info(f"Polling status #{retries}, waiting {delay_secs} seconds...")
-            time.sleep(delay_secs)
-
-    # When we get here, either job completed (stillWorking=False) or we timed out (stillWorking=True)
-    if stillWorking:
-        logger.debug("Timed out waiting for environment to reach desired state")
+        return names
+
+    return pending
+
+
+def env_wait_all(envIds, checks, operation: str):
+    """
+    Poll environments until every VM of each meets the checks, or the deadline
+    passes, with one poller: a round polls every environment not done yet,
+    --parallel at a time, then waits once for all of them.
+    envIds: environment ids
+    checks: see vm_pending()
+    operation: "suspend", "resume" or "delete"; sets how often and how long to
+        poll (see cloudshare.polling.POLICIES), --wait-deadline overrides the latter
+    Returns the final cloudshare.polling.PollStatus of every environment, by id.
+    """
+    from cloudshare.polling import ConditionalGet, TransitionHistory, poll_many
+
+    def fetcher(envId):
+        # Conditional GETs: while nothing changes, a poll costs a bodiless 304 where the API sends ETags.
+        fetch = ConditionalGet(get_client(), "envs/actions/getextended", {"envId": envId})
+        if operation != "delete":
+            return fetch
+
+        def fetch_deleted():
+            try:
+                return fetch()
+            except cloudshare.ResponseError as e:
+                if e.status == 404:
+                    # Already gone: nothing left to wait for.
+                    return {"vms": []}
+                raise
+        return fetch_deleted
+
+    def report(statuses):
+        waiting = [(envId, s) for envId, s in statuses.items() if not s.done]
+        etas = [s.eta for _, s in waiting if s.eta is not None]
+        eta = f", expected in ~{max(etas):.0f}s" if etas else ""
+        elapsed = max(s.elapsed for s in statuses.values())
+        if len(statuses) == 1:
+            status = waiting[0][1]
+            logger.info(f"Polling status #{status.polls} after {elapsed:.0f}s, "
+                        f"{len(status.pending)} VM(s) pending ({', '.join(status.pending)}){eta}")
+        else:
+            logger.info(f"{len(statuses) - len(waiting)}/{len(statuses)} environments done after {elapsed:.0f}s, "
+                        f"{len(waiting)} pending ({sum(len(s.pending) for _, s in waiting)} VMs){eta}")
+
+    return poll_many(dict((envId, fetcher(envId)) for envId in envIds), vm_pending(checks), operation,
+                     deadline=globalconf["wait_deadline"], history=TransitionHistory(), report=report,
+                     max_workers=globalconf["parallel"])
+
+
+def env_wait_condition(envId: str, checks: str, operation: str):
+    """
+    Poll an environment until every VM meets the checks, or the deadline passes;
+    see env_wait_all(). Returns whether it did.
+    """
+    status = env_wait_all([envId], checks, operation)[envId]
+
+    # When we get here, either job completed or we ran out of time
+    if not status.done:
+        logger.debug("Timed out waiting for environment to reach desired state, still pending: %s", ", ".join(status.pending))
         return False
     else:
-        logger.debug("Environment reached desired state")
+        logger.debug("Environment reached desired state in %.0fs (%d polls)", status.elapsed, status.polls)
         return True
 
 
-@app.command()
-def env_suspend(envId: Annotated[str, typer.Option(help="Environment Id")]):
+def select_envs(envid, name, id_file):
+    """
+    The environments given by --envid, --name (a regular expression searched in
+    their names) and --id-file (one id per line, "-" for stdin; blank lines and
+    # comments are skipped), as an {id: name} dict in that order, each once.
+    Names are only known for the --name matches.
+    """
+    import re
+
+    envs = {}
+    for envId in envid or []:
+        envs.setdefault(envId, None)
+    if id_file:
+        if id_file == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(id_file, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        for line in lines:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                envs.setdefault(line, None)
+    if name:
+        try:
+            pattern = re.compile(name)
+        except re.error as e:
+            raise typer.BadParameter(str(e), param_hint="--name")
+        for e in cs_iter("envs/"):
+            if pattern.search(e.get("name") or ""):
+                envs[e["id"]] = e.get("name")
+    if not envs:
+        raise typer.BadParameter("no environment selected", param_hint="--envid, --name or --id-file")
+    return envs
+
+
+def env_lifecycle(operation, envs, request, checks):
     """
-    Suspend an environment
+    Start operation on every environment of envs ({id: name}), request(id)
+    giving the API call (a cs_many() spec), --parallel at a time; wait for all
+    of them with env_wait_all() and print a result per environment. Exits
+    with 1 unless every environment completed.
     """
-    cs_put("/envs/actions/suspend", {"envId": envId})
-    logger.info("Suspend Started")
+    results = cs_many([request(envId) for envId in envs])
+    failed = dict((envId, r["error"]) for envId, r in zip(envs, results) if isinstance(r, dict) and "error" in r)
+    started = [envId for envId in envs if envId not in failed]
+    logger.info("%s started for %d of %d environment(s)", operation.capitalize(), len(started), len(envs))
+    statuses = env_wait_all(started, checks, operation) if started else {}
+
+    rows = []
+    named = any(name is not None for name in envs.values())
+    for envId, name in envs.items():
+        row = {"id": envId, "name": name} if named else {"id": envId}
+        status = statuses.get(envId)
+        if status is None:
+            row.update(result="failed", seconds=None, detail=failed[envId])
+        elif status.done:
+            row.update(result="completed", seconds=round(status.elapsed), detail="")
+        else:
+            row.update(result="timed out", seconds=round(status.elapsed), detail="pending: " + ", ".join(status.pending))
+        rows.append(row)
+    completed = sum(1 for r in rows if r["result"] == "completed")
+    logger.info("%s completed for %d of %d environment(s)", operation.capitalize(), completed, len(rows))
+    print_results(rows, globalconf["outputformat"])
+    if completed < len(rows):
+        raise typer.Exit(1)
+
+
+EnvIdOption = Annotated[Optional[List[str]], typer.Option("--envid", "--envId", help="Environment Id (repeat for multiple environments)")]
+EnvNameOption = Annotated[Optional[str], typer.Option("--name", help="Regular expression selecting environments by name")]
+EnvIdFileOption = Annotated[Optional[str], typer.Option("--id-file", help="File with one environment Id per line (- for stdin)")]
 
+
+@app.command()
+def env_suspend(envid: EnvIdOption = None, name: EnvNameOption = None, id_file: EnvIdFileOption = None):
+    """
+    Suspend environments
+    """
+    envs = select_envs(envid, name, id_file)
     checks = [
         {"property": "statusText", "check_fn": lambda x: x == "Suspended"}
     ]
-    completed = env_wait_condition(envId, checks, delay_secs=6, max_retry=20)
-    if completed:
-        logger.info("Suspend completed!")
-    else:
-        logger.info("Timed out waiting for environment to reach Suspended state")
-
-
-
+    env_lifecycle("suspend", envs,
+                  lambda envId: {"method": "PUT", "path": "envs/actions/suspend", "queryParams": {"envId": envId}},
+                  checks)
 
 
 @app.command()
-def env_delete(envId: Annotated[str, typer.Option(help="Environment Id")], force: Annotated[bool, typer.Option(help="Force deletion")] = False):
+def env_delete(envid: EnvIdOption = None, name: EnvNameOption = None, id_file: EnvIdFileOption = None,
+               force: Annotated[bool, typer.Option(help="Force deletion")] = False):
     """
-    Delete an environment
+    Delete environments
     """
-    cs_delete("/envs/" + str(envId) + "")
-    logger.info("Delete Started!")
-
+    envs = select_envs(envid, name, id_file)
     checks = [
         {"property": "internalIp", "check_fn": lambda x: x is None}
     ]
-    completed = env_wait_condition(envId, checks, delay_secs=6, max_retry=20)
-    if completed:
-        logger.info("Delete completed!")
-    else:
-        logger.info("Timed out waiting for environment to reach Suspended state")
-
-
+    env_lifecycle("delete", envs, lambda envId: {"method": "DELETE", "path": "envs/" + str(envId)}, checks)
 
 
 @app.command()
-def env_resume(envId: Annotated[str, typer.Option(help="Environment Id")]):
+def env_resume(envid: EnvIdOption = None, name: EnvNameOption = None, id_file: EnvIdFileOption = None):
     """
-    Resume a paused environment
+    Resume paused environments
     """
-    cs_put("/envs/actions/resume", {"envId": envId})
-    logger.info("Resume Started")
-
+    envs = select_envs(envid, name, id_file)
     checks = [
         {"property": "statusText", "check_fn": lambda x: x == "Running"}
     ]
-    completed = env_wait_condition(envId, checks, delay_secs=6, max_retry=20)
-    if completed:
-        logger.info("Resume completed!")
-    else:
-        logger.info("Timed out waiting for environment to reach Resumed state")
+    env_lifecycle("resume", envs,
+                  lambda envId: {"method": "PUT", "path": "envs/actions/resume", "queryParams": {"envId": envId}},
+                  checks)
 
 
 
@@ -427,7 +864,7 @@ def env_get_vms_info(
             for unwanted_key in unwanted:
                 del m[unwanted_key]
 
-    print_results(machines, globalconf["outputformat"])
+    print_results(machines, globalconf["outputformat"], fields=field)
 
 
 @app.command()
@@ -453,7 +890,7 @@ def env_get_info(
             for unwanted_key in unwanted:
                 del m[unwanted_key]
 
-    print_results(e, globalconf["outputformat"])
+    print_results(e, globalconf["outputformat"], fields=field)
 
 
 
@@ -478,7 +915,7 @@ def blueprint_list(
             for unwanted_key in unwanted:
                 del b[unwanted_key]
 
-    print_results(blueprints, globalconf["outputformat"])
+    print_results(blueprints, globalconf["outputformat"], fields=field)
 
 
 @app.command()
@@ -502,7 +939,7 @@ def policy_list(
             for unwanted_key in unwanted:
                 del p[unwanted_key]
 
-    print_results(policies, globalconf["outputformat"])
+    print_results(policies, globalconf["outputformat"], fields=field)
 
 
 @app.command()
@@ -516,7 +953,7 @@ def env_create(
     """
     Create one or more environments from a blueprint
     """
-    results = []
+    specs = []
     for i in range(count):
         payload = {
             "blueprintId": blueprint_id,
@@ -529,9 +966,10 @@ def env_create(
         if description:
             payload["description"] = description
 
-        result = cs_get("/envs/actions/create", payload)
-        results.append(result)
+        # Not idempotent: a retried create may create a second environment.
+        specs.append({"method": "GET", "path": "/envs/actions/create", "queryParams": payload, "idempotent": False})
 
+    results = cs_many(specs)
     print_results(results, globalconf["outputformat"])
 
 
@@ -547,9 +985,8 @@ def class_create(
     Create one or more classes with numbered suffixes
     """
     logger.info(f"Creating {count} classes")
-    results = []
+    specs = []
     for i in range(count):
-        logger.info(f"Creating class {i+1}")
         payload = {"blueprintId": blueprint_id}
         if policy_id:
             payload["policyId"] = policy_id
@@ -558,9 +995,9 @@ def class_create(
         if description:
             payload["description"] = description
 
-        result = cs_post("/class", payload)
-        results.append(result)
+        specs.append({"method": "POST", "path": "/class", "content": payload})
 
+    results = cs_many(specs)
     print_results(results, globalconf["outputformat"])
 
 
@@ -577,18 +1014,26 @@ def class_clone(
 
     # Get original class details
     original_class = cs_get(f"/class/{class_id}")
-    results = []
+    specs = []
 
     for i in range(count):
-        logger.info(f"Creating clone {i+1}")
         payload = original_class.copy()
         payload["name"] = f"{original_class['name']}{name_suffix}{i+1}"
-        result = cs_post("/class", payload)
-        results.append(result)
+        specs.append({"method": "POST", "path": "/class", "content": payload})
 
+    results = cs_many(specs)
     print_results(results, globalconf["outputformat"])
 
 
+def matching_classes(class_pattern, by_id=False):
+    # Read in full before any change: the listing stream would hold a pooled
+    # connection meanwhile, and change under iteration as classes are updated.
+    import re
+
+    pattern = re.compile(class_pattern)
+    return [c for c in cs_iter("/class") if pattern.search(c["id"] if by_id else c["name"])]
+
+
 @app.command()
 def class_setstatus(
     class_pattern: Annotated[str, typer.Option(help="Regex pattern to match class name")],
@@ -598,24 +1043,18 @@ def class_setstatus(
     """
     Suspend or resume classes matching the specified regex pattern
     """
-    import re
-
     status = status.upper()
     action = "resuming" if status == "ACTIVE" else "suspending"
     logger.info(f"{action.capitalize()} classes matching pattern: {class_pattern}")
 
-    # Get all classes
-    classes = cs_get("/class")
-    pattern = re.compile(class_pattern)
+    classes = matching_classes(class_pattern, by_id)
 
     results = []
     for class_item in classes:
-        match_field = class_item["id"] if by_id else class_item["name"]
-        if pattern.search(match_field):
-            logger.info(f"{action.capitalize()} class {class_item['id']} ({class_item['name']})")
-            payload = {"status": "active" if status else "suspended"}
-            result = cs_put(f"/class/{class_item['id']}", payload)
-            results.append(result)
+        logger.info(f"{action.capitalize()} class {class_item['id']} ({class_item['name']})")
+        payload = {"status": "active" if status else "suspended"}
+        result = cs_put(f"/class/{class_item['id']}", payload)
+        results.append(result)
 
     if not results:
         logger.info("No classes found matching the pattern")
@@ -625,17 +1064,9 @@ def class_setstatus(
 
 @app.command()
 def class_show_all():
-    classes = cs_get("class/")
-
-    if len(classes) == 0:
+    printed = print_results(enumerate(cs_iter("class/"), start=1), globalconf["outputformat"], enrich=numbered)
+    if printed == 0:
         logger.info("No classes found")
-    i = 0
-    for c in classes:
-        i += 1
-        c["status"] = env_get_status(c.get('id', ''))
-        c["index"] = i
-
-    print_results(classes, globalconf["outputformat"])
 
 @app.command()
 def class_get(class_id):
@@ -652,24 +1083,18 @@ def class_delete(
     """
     Delete classes matching the specified regex pattern (matches against names by default)
     """
-    import re
-
     logger.info(f"Deleting classes matching pattern: {class_pattern}")
 
-    # Get all classes
-    classes = cs_get("/class")
-    pattern = re.compile(class_pattern)
+    classes = matching_classes(class_pattern, by_id)
 
     results = []
     for class_item in classes:
-        match_field = class_item["id"] if by_id else class_item["name"]
-        if pattern.search(match_field):
-            if class_item.get("status") != "deleted":
-                logger.info(f"Deleting class {class_item['id']} ({class_item['name']})")
-                result = cs_delete(f"/class/{class_item['id']}")
-                results.append({"id": class_item["id"], "name": class_item["name"], "status": "deleted"})
-            else:
-                logger.info(f"Skipping class {class_item['id']} ({class_item['name']}) - already deleted")
+        if class_item.get("status") != "deleted":
+            logger.info(f"Deleting class {class_item['id']} ({class_item['name']})")
+            cs_delete(f"/class/{class_item['id']}", decode=False)
+            results.append({"id": class_item["id"], "name": class_item["name"], "status": "deleted"})
+        else:
+            logger.info(f"Skipping class {class_item['id']} ({class_item['name']}) - already deleted")
     if not results:
         logger.info("No classes found matching the pattern")
         return
@@ -686,22 +1111,26 @@ def class_list(
     """
     import re
     logger.info("Listing classes")
-    results = cs_get("/class")
     pattern = re.compile(pattern)
-    filtered_results = []
     field_list = fields.split(",")
 
-    for item in results:
-        if pattern.search(item["name"]):
-            item_filtered_fields = {field: item[field] for field in field_list if field in item}
-            filtered_results.append(item_filtered_fields)
-    print_results(filtered_results, globalconf["outputformat"])
+    filtered_results = ({field: item[field] for field in field_list if field in item}
+                        for item in cs_iter("/class") if pattern.search(item["name"]))
+    print_results(filtered_results, globalconf["outputformat"], fields=field_list)
 
 
-def env_get_status(envid: Annotated[str, typer.Option(help="Environment Id")]):
-    status = cs_get("/envs/actions/getextended", {"envId": envid})["statusText"]
-    logger.debug(f"Env status is: {status}")
-    return status
+@app.command()
+def cache_clear(
+    path: Annotated[str, typer.Option(help="Only drop cached responses under this API path, e.g. projects/")] = "",
+):
+    """
+    Drop responses kept by --http-cache
+    """
+    if not globalconf["http_cache"]:
+        logger.info("No --http-cache in use")
+        return
+    dropped = cloudshare.HttpCache(globalconf["http_cache"]).invalidate(path)
+    logger.info("Dropped %d cached responses", dropped)
 
 
 def loadKeys(envfile):
@@ -714,6 +1143,8 @@ def loadKeys(envfile):
     my_API_KEY = None
     if envfile:
         # Try loading from envfile
+        from dotenv import load_dotenv
+
         logger.info(f"Trying to load auth keys from {envfile}")
         load_dotenv(envfile)
 
@@ -724,6 +1155,8 @@ def loadKeys(envfile):
     # If not found in envfile or environment, try loading from cloudshare.env
     if my_API_ID is None or my_API_KEY is None:
         if os.path.exists('cloudshare.env'):
+            from dotenv import load_dotenv
+
             logger.info("Trying to load auth keys from cloudshare.env in current directory")
             load_dotenv('cloudshare.env')
             my_API_ID = os.getenv('CLOUDSHARE_API_ID')
@@ -749,11 +1182,30 @@ Or export them as environment variables:
 # ### App callback for common options
 @app.callback()
 def main(
-    outformat: str = typer.Option(OutFormat.json_fmt, "--outformat", "-o", help="Set output format."),
+    outformat: OutFormat = typer.Option(OutFormat.json_fmt, "--outformat", "-o", help="Set output format."),
     tablewidth: int = typer.Option(80, "--tablewidth", "-w", help="Set table output width."),
     keyfile: str = typer.Option(None, "--keyfile", "-k", help="Path to CloudShare authentication keys file."),
     loglevel: str = typer.Option("INFO", help="Set the logging level"),
     logfile: Optional[str] = typer.Option(None, help="Path to save the log file."),
+    retries: int = typer.Option(3, "--retries", help="Retries for throttled (429) or failed (5xx) API calls, with exponential backoff."),
+    rate: Optional[float] = typer.Option(None, "--rate", envvar="CLOUDSHARE_RATE", help="Max API requests per second (client-side throttling)."),
+    burst: Optional[int] = typer.Option(None, "--burst", envvar="CLOUDSHARE_BURST", help="Requests allowed back-to-back before --rate applies."),
+    rate_file: Optional[str] = typer.Option(None, "--rate-file", envvar="CLOUDSHARE_RATE_FILE", help="Share the --rate budget with other processes through this file (*.db for SQLite)."),
+    timings: bool = typer.Option(False, "--timings", help="Log DNS/connect/TLS/TTFB/download/parse timings of every API call."),
+    http_cache: Optional[str] = typer.Option(None, "--http-cache", envvar="CLOUDSHARE_HTTP_CACHE", help="Keep reference data (regions, projects, blueprints, policies, templates) in this SQLite file between runs."),
+    micro_cache_ms: int = typer.Option(250, "--micro-cache-ms", help="Reuse a GET response for identical GETs within this many milliseconds (0 disables)."),
+    parallel: int = typer.Option(4, "--parallel", help="API calls run concurrently by bulk commands."),
+    hostname: str = typer.Option("use.cloudshare.com", "--hostname", envvar="CLOUDSHARE_HOSTNAME", help="API host; http://127.0.0.1:PORT targets a local stand-in (python -m cloudshare.standin)."),
+    record: Optional[str] = typer.Option(None, "--record", help="Append every API call and its response to this JSON Lines cassette (credentials redacted)."),
+    replay: Optional[str] = typer.Option(None, "--replay", help="Answer API calls from this cassette instead of the network."),
+    replay_latency: float = typer.Option(0.0, "--replay-latency", help="With --replay, wait this many times the recorded duration of each call."),
+    timeout: float = typer.Option(60.0, "--timeout", help="Seconds a stalled connection is waited for before the call is retried."),
+    deadline: Optional[float] = typer.Option(None, "--deadline", help="Seconds each API call may take in total, retries included."),
+    hedge: bool = typer.Option(False, "--hedge", help="Resend GETs slower than their measured p95 and use the first answer."),
+    circuit_breaker: bool = typer.Option(True, "--circuit-breaker/--no-circuit-breaker", help="Fail calls at once to an endpoint that keeps failing (half its last calls), probing it again after 30s."),
+    limit: Optional[int] = typer.Option(None, "--limit", help="Show at most this many records of a listing (one page)."),
+    page: int = typer.Option(1, "--page", help="With --limit, the page of records to show, from 1."),
+    wait_deadline: Optional[float] = typer.Option(None, "--wait-deadline", help="Seconds env-suspend/resume/delete wait for the environment (default: 15/20/30 minutes)."),
 ):
     """
     Global Options
@@ -766,10 +1218,29 @@ def main(
 
     globalconf["outputformat"] = outformat
     globalconf["tablewidth"] = tablewidth
+    globalconf["retries"] = retries
+    globalconf["rate"] = rate
+    globalconf["burst"] = burst
+    globalconf["rate_file"] = rate_file
+    globalconf["timings"] = timings
+    globalconf["http_cache"] = http_cache
+    globalconf["micro_cache_ms"] = micro_cache_ms
+    globalconf["parallel"] = parallel
+    globalconf["hostname"] = hostname
+    globalconf["record"] = record
+    globalconf["replay"] = replay
+    globalconf["replay_latency"] = replay_latency
+    globalconf["timeout"] = timeout
+    globalconf["deadline"] = deadline
+    globalconf["hedge"] = hedge
+    globalconf["circuit_breaker"] = circuit_breaker
+    globalconf["limit"] = limit
+    globalconf["page"] = page
+    globalconf["wait_deadline"] = wait_deadline
 
     # Load auth keys
     _API_ID, _API_KEY = loadKeys(keyfile)
-    logger.debug(f"Loaded API_ID: {_API_ID} and API_KEY: {_API_KEY}")
+    logger.debug("Loaded API_ID: %s", _API_ID)
 
     globalconf["API_ID"] = _API_ID
     globalconf["API_KEY"] = _API_KEY
@@ -10,5 +10,6 @@ setuptools.setup(
     url='https://github.com/cloudshare/cloudshare-py-sdk',
     keywords=['cloudshare', 'cloud', 'SDK', 'REST', 'API'],
     classifiers=[],
-    python_requires='>=3.6'
+    python_requires='>=3.7',
+    extras_require={'fast': ['orjson']}
 )